@@ -254,12 +254,31 @@ class Dispatcher(object):
     to provide their own dynamic dispatch algorithm.
     """
 
+    compiled = False
+    """
+    If True, memoize the handler, virtual path, is_index flag and collapsed
+    config found for each path in the app's dispatch_cache, and reuse them
+    for later requests instead of traversing the tree again. Paths which
+    were dispatched by a _cp_dispatch method are not memoized. The cache
+    is cleared when the app is mounted or its config merged; changes to
+    the object tree or global config after that are not seen until it is
+    cleared again.
+    """
+
+    compiled_maxsize = 1000
+    """
+    The number of paths which may be memoized for each app when compiled
+    is True; the app's dispatch_cache is cleared when it is full.
+    """
+
     def __init__(self, dispatch_method_name=None,
-                 translate=punctuation_to_underscores):
+                 translate=punctuation_to_underscores, compiled=None):
         validate_translator(translate)
         self.translate = translate
         if dispatch_method_name:
             self.dispatch_method_name = dispatch_method_name
+        if compiled is not None:
+            self.compiled = compiled
 
     def __call__(self, path_info):
         """Set handler and config for the current request."""
@@ -297,6 +316,26 @@ class Dispatcher(object):
         root = app.root
         dispatch_name = self.dispatch_method_name
 
+        dynamic = False
+        if self.compiled:
+            cache = app.dispatch_cache
+            key = (self, path)
+            compiled = cache.get(key)
+            if compiled is not None:
+                func, vpath, is_index, config = compiled
+                request.config = config.copy()
+                if is_index is not None:
+                    request.is_index = is_index
+                return func, vpath[:]
+
+        def memoize(func, vpath, is_index=None):
+            """Store the result of this traversal in app.dispatch_cache."""
+            if self.compiled and not dynamic:
+                if len(cache) >= self.compiled_maxsize:
+                    cache.clear()
+                cache[key] = (func, vpath[:], is_index, request.config.copy())
+            return func, vpath
+
         # Get config for the root object/path.
         fullpath = [x for x in path.strip('/').split('/') if x] + ['index']
         fullpath_len = len(fullpath)
@@ -329,6 +368,7 @@ class Dispatcher(object):
                     index_name = iternames.pop()
                     subnode = dispatch(vpath=iternames)
                     iternames.append(index_name)
+                    dynamic = True
                 else:
                     #We didn't find a path, but keep processing in case there
                     #is a default() handler.
@@ -400,7 +440,9 @@ class Dispatcher(object):
                     request.config = set_conf()
                     # See https://bitbucket.org/cherrypy/cherrypy/issue/613
                     request.is_index = path.endswith("/")
-                    return defhandler, fullpath[fullpath_len - segleft:-1]
+                    return memoize(defhandler,
+                                   fullpath[fullpath_len - segleft:-1],
+                                   request.is_index)
 
             # Uncomment the next line to restrict positional params to "default".
             # if i < num_candidates - 2: continue
@@ -418,11 +460,12 @@ class Dispatcher(object):
                     # Note that this also includes handlers which take
                     # positional parameters (virtual paths).
                     request.is_index = False
-                return candidate, fullpath[fullpath_len - segleft:-1]
+                return memoize(candidate, fullpath[fullpath_len - segleft:-1],
+                               request.is_index)
 
         # We didn't find anything
         request.config = set_conf()
-        return None, []
+        return memoize(None, [])
 
 
 class MethodDispatcher(Dispatcher):
@@ -1,4 +1,5 @@
 
+from bisect import insort
 import os
 import sys
 import time
@@ -71,7 +72,22 @@ class Hook(object):
 
 
 class HookMap(dict):
-    """A map of call points to lists of callbacks (Hook objects)."""
+    """A map of call points to lists of callbacks (Hook objects).
+
+    Each list is kept sorted by priority as Hooks are inserted, so add
+    Hooks with attach or insert rather than appending to the lists; run
+    still sorts a list which is out of order, but only for that call.
+
+    Copies share their lists with the original until either map changes
+    the list for a given point (copy-on-write), so copying a map to which
+    nothing is then attached is cheap. Lists obtained via get, items or
+    values may be shared and must not be modified.
+    """
+
+    _copied = None
+    """
+    None if this map owns all of its lists; otherwise a dict whose keys
+    are the points for which this map has made its own copy."""
 
     def __new__(cls, points=None):
         d = dict.__new__(cls)
@@ -82,15 +98,40 @@ class HookMap(dict):
     def __init__(self, *a, **kw):
         pass
 
+    def __getitem__(self, point):
+        hooks = dict.__getitem__(self, point)
+        copied = self._copied
+        if copied is not None and point not in copied:
+            hooks = hooks[:]
+            dict.__setitem__(self, point, hooks)
+            copied[point] = None
+        return hooks
+
+    def __setitem__(self, point, hooks):
+        dict.__setitem__(self, point, hooks)
+        if self._copied is not None:
+            self._copied[point] = None
+
     def attach(self, point, callback, failsafe=None, priority=None, **kwargs):
-        """Append a new Hook made from the supplied arguments."""
-        self[point].append(Hook(callback, failsafe, priority, **kwargs))
+        """Insert a new Hook made from the supplied arguments."""
+        insort(self[point], Hook(callback, failsafe, priority, **kwargs))
+
+    def insert(self, point, hook):
+        """Insert the given Hook after any others of the same priority."""
+        insort(self[point], hook)
 
     def run(self, point):
         """Execute all registered Hooks (callbacks) for the given point."""
+        # The list is only read here, and is normally already sorted.
+        hooks = dict.__getitem__(self, point)
+        if not hooks:
+            return
+        for i in range(1, len(hooks)):
+            if hooks[i] < hooks[i - 1]:
+                # Someone appended to the list directly.
+                hooks = sorted(hooks)
+                break
         exc = None
-        hooks = self[point]
-        hooks.sort()
         for hook in hooks:
             # Some hooks are guaranteed to run even if others at
             # the same hookpoint fail. We will still log the failure,
@@ -112,11 +153,13 @@ class HookMap(dict):
             raise exc
 
     def __copy__(self):
-        newmap = self.__class__()
-        # We can't just use 'update' because we want copies of the
-        # mutable values (each is a list) as well.
-        for k, v in self.items():
-            newmap[k] = v[:]
+        newmap = dict.__new__(self.__class__)
+        dict.update(newmap, self)
+        # Both maps now share every list; each copies a list before
+        # changing it.
+        newmap._copied = {}
+        if self._copied is None or self._copied:
+            self._copied = {}
         return newmap
     copy = __copy__
 
@@ -127,6 +170,35 @@ class HookMap(dict):
 
 # Config namespace handlers
 
+class _Identity(object):
+    """Wrap an unhashable object so it can be hashed (and compared) by id."""
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __hash__(self):
+        return id(self.obj)
+
+    def __eq__(self, other):
+        return isinstance(other, _Identity) and other.obj is self.obj
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+def _config_key(config):
+    """Return a hashable key which is equal for equal request.config dicts.
+
+    Unhashable values are compared by identity.
+    """
+    items = []
+    for k, v in config.items():
+        try:
+            hash(v)
+        except TypeError:
+            v = _Identity(v)
+        items.append((k, v))
+    return frozenset(items)
+
 def hooks_namespace(k, v):
     """Attach bare hooks declared in config."""
     # Use split again to allow multiple hooks for a single
@@ -137,7 +209,7 @@ def hooks_namespace(k, v):
         v = cherrypy.lib.attributes(v)
     if not isinstance(v, Hook):
         v = Hook(v)
-    cherrypy.serving.request.hooks[hookpoint].append(v)
+    cherrypy.serving.request.hooks.insert(hookpoint, v)
 
 def request_namespace(k, v):
     """Attach request attributes declared in config."""
@@ -461,6 +533,15 @@ class Request(object):
            "tools": cherrypy.tools,
            })
 
+    reuse_config = True
+    """
+    If True, the hooks and toolmaps which result from applying
+    request.config to this request are stored in app.config_cache, and
+    copied (instead of set up again) for later requests with equal config.
+    Config for Tools whose _setup does more than attach hooks, such as
+    ErrorTools, is always applied afresh. Set this in config (as
+    'request.reuse_config') to turn it off for some URI's."""
+
     def __init__(self, local_host, remote_host, scheme="http",
                  server_protocol="HTTP/1.1"):
         """Populate a new Request object.
@@ -620,7 +701,7 @@ class Request(object):
                     self.stage = 'process_headers'
                     self.process_headers()
 
-                    # Make a copy of the class hooks
+                    # Share the class hooks until a hook is attached
                     self.hooks = self.__class__.hooks.copy()
                     self.toolmaps = {}
 
@@ -630,7 +711,7 @@ class Request(object):
                     self.body = _cpreqbody.RequestBody(
                         self.rfile, self.headers, request_params=self.params)
 
-                    self.namespaces(self.config)
+                    self.apply_config()
 
                     self.stage = 'on_start_resource'
                     self.hooks.run('on_start_resource')
@@ -675,6 +756,69 @@ class Request(object):
                 raise
             self.handle_error()
 
+    def apply_config(self):
+        """Apply self.config through self.namespaces. (Core)"""
+        cache = getattr(self.app, 'config_cache', None)
+        if (cache is None or
+                not self.config.get('request.reuse_config', self.reuse_config)):
+            self.namespaces(self.config)
+            return
+
+        key = _config_key(self.config)
+        compiled = cache.get(key)
+        if compiled is None:
+            before = self.hooks.copy()
+            self.namespaces(self.config)
+            compiled = self._compile_config(before)
+            if len(cache) >= self.app.config_cache_maxsize:
+                cache.clear()
+            cache[key] = compiled
+        elif not compiled:
+            self.namespaces(self.config)
+        else:
+            hooks, toolmaps, namespaces, config = compiled
+            for point, added in hooks:
+                for hook in added:
+                    self.hooks.insert(point, hook)
+            self.toolmaps.update(toolmaps)
+            namespaces(config)
+
+    def _compile_config(self, before):
+        """Return what applying self.config did, for apply_config to reuse.
+
+        The result is a tuple of (hooks, toolmaps, namespaces, config), where
+        hooks lists the (point, hooks) attached, and the namespaces must still
+        be called with the config on each request. If the result can't be
+        reused, return False.
+        """
+        namespaces = _cpconfig.NamespaceSet()
+        for ns, handler in self.namespaces.items():
+            if ns == "hooks":
+                continue
+            if isinstance(handler, cherrypy._cptools.Toolbox):
+                for name, settings in self.toolmaps.get(ns, {}).items():
+                    if settings.get("on", False):
+                        if not cherrypy._cptools._hooks_only(
+                                getattr(handler, name)):
+                            return False
+                continue
+            namespaces[ns] = handler
+
+        config = {}
+        for k, v in self.config.items():
+            if "." in k and k.split(".", 1)[0] in namespaces:
+                config[k] = v
+
+        hooks = []
+        for point, attached in self.hooks.items():
+            # Hooks are inserted in priority order, not appended, and
+            # compare by priority, so tell the new ones apart by identity.
+            old = dict([(id(hook), None) for hook in before.get(point, ())])
+            added = [hook for hook in attached if id(hook) not in old]
+            if added:
+                hooks.append((point, added))
+        return hooks, self.toolmaps.copy(), namespaces, config
+
     def process_query_string(self):
         """Parse the query string into Python structures. (Core)"""
         try:
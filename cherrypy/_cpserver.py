@@ -71,6 +71,30 @@ class Server(ServerAdapter):
     thread_pool_max = -1
     """The maximum size of the worker-thread pool. Use -1 to indicate no limit."""
 
+    thread_pool_autoscale = False
+    """If True, grow the worker-thread pool (up to thread_pool_max) under load
+    and shrink it (down to thread_pool) when it is underused."""
+
+    thread_pool_target_utilization = 0.75
+    """When autoscaling, the fraction of busy worker threads to aim for."""
+
+    thread_pool_cooldown = 30
+    """When autoscaling, the minimum number of seconds between resizing the
+    worker-thread pool and shrinking it again."""
+
+    accepted_queue_size = 0
+    """The maximum number of accepted connections which may wait for a worker
+    thread (0, the default, means no limit). Connections beyond it receive an
+    immediate "503 Service Unavailable" with a Retry-After header."""
+
+    accepted_queue_timeout = 0
+    """The maximum number of seconds an accepted connection may wait for a
+    worker thread (0, the default, means no limit) before it is answered with
+    "503 Service Unavailable" instead of being served."""
+
+    shed_retry_after = 5
+    """The Retry-After value, in seconds, for connections shed under load."""
+
     max_request_header_size = 500 * 1024
     """The maximum number of bytes allowable in the request headers. If exceeded,
     the HTTP server should return "413 Request Entity Too Large"."""
@@ -86,7 +110,9 @@ class Server(ServerAdapter):
     configuration options."""
 
     ssl_context = None
-    """When using PyOpenSSL, an instance of SSL.Context."""
+    """When using PyOpenSSL, an instance of SSL.Context; when using the builtin
+    ssl module, an instance of ssl.SSLContext. If None, the SSL adapter makes
+    its own context from the certificate and private key."""
 
     ssl_certificate = None
     """The filename of the SSL certificate to use."""
@@ -98,6 +124,10 @@ class Server(ServerAdapter):
     ssl_private_key = None
     """The filename of the private key to use with SSL."""
 
+    ssl_handshake_timeout = None
+    """The time, in seconds, a worker thread waits for a new client to finish
+    the SSL handshake. If None (the default), socket_timeout is used."""
+
     if py3k:
         ssl_module = 'builtin'
         """The name of a registered SSL adaptation module to use with the builtin
@@ -118,6 +148,28 @@ class Server(ServerAdapter):
     nodelay = True
     """If True (the default since 3.1), sets the TCP_NODELAY socket option."""
 
+    reuse_port = False
+    """If True, sets the SO_REUSEPORT socket option, so that several worker
+    processes (see :class:`cherrypy.process.plugins.WorkerProcesses`) may
+    listen on the same port."""
+
+    park_idle_connections = False
+    """If True, idle keep-alive connections are handed to a poller between
+    requests instead of holding a worker thread, so that thread_pool only
+    needs to cover in-flight requests rather than open sockets."""
+
+    coalesce_size = 0
+    """If nonzero, the builtin HTTP servers collect small response body chunks
+    until they add up to this many bytes, and send them together, rather than
+    making a send (and often a tiny TCP segment) per chunk. Streaming handlers
+    can yield an empty string to send what they have so far. The response
+    headers always share a send with the start of the body."""
+
+    use_sendfile = True
+    """If True (the default), static files served over plain (non-SSL)
+    sockets are sent with os.sendfile where the platform provides it,
+    rather than being read into memory in chunks."""
+
     wsgi_version = (1, 0)
     """The WSGI version tuple to use with the builtin WSGI server.
     The provided options are (1, 0) [which includes support for PEP 3333,
@@ -54,6 +54,12 @@ class Tool(object):
 
     namespace = "tools"
 
+    # True if the _setup method of this class does nothing but attach hooks
+    # (built from request.toolmaps), so that a Request may reuse the hooks
+    # for identical config. Subclasses which override _setup must say so
+    # again themselves; see _hooks_only.
+    _setup_hooks_only = True
+
     def __init__(self, point, callable, name=None, priority=50):
         self._point = point
         self.callable = callable
@@ -152,6 +158,8 @@ class HandlerTool(Tool):
     False will raise NotFound.
     """
 
+    _setup_hooks_only = True
+
     def __init__(self, callable, name=None):
         Tool.__init__(self, 'before_handler', callable, name)
 
@@ -265,6 +273,8 @@ class SessionTool(Tool):
         session data.
     """
 
+    _setup_hooks_only = True
+
     def __init__(self):
         # _sessions.init must be bound after headers are read
         Tool.__init__(self, 'before_request_body', _sessions.init)
@@ -389,6 +399,8 @@ class SessionAuthTool(HandlerTool):
 class CachingTool(Tool):
     """Caching Tool for CherryPy."""
 
+    _setup_hooks_only = True
+
     def _wrapper(self, **kwargs):
         request = cherrypy.serving.request
         if _caching.get(**kwargs):
@@ -410,6 +422,14 @@ class CachingTool(Tool):
 
 
 
+def _hooks_only(tool):
+    """Return True if the given Tool's _setup does nothing but attach hooks."""
+    for cls in type(tool).__mro__:
+        if '_setup' in cls.__dict__:
+            return cls.__dict__.get('_setup_hooks_only', False)
+    return False
+
+
 class Toolbox(object):
     """A collection of Tools.
 
@@ -44,11 +44,28 @@ class Application(object):
 
     relative_urls = False
 
+    dispatch_cache = {}
+    """A dict of handlers and config memoized by dispatchers whose 'compiled'
+    attribute is True, keyed by (dispatcher, path_info). It is cleared
+    whenever config is merged into the app, or the app is mounted."""
+
+    config_cache = {}
+    """A dict of the hooks, toolmaps and other namespace handlers which
+    result from each distinct request.config, built by Requests whose
+    'reuse_config' attribute is True. It is cleared whenever config is
+    merged into the app."""
+
+    config_cache_maxsize = 1000
+    """The number of distinct request configs which may be held in
+    config_cache; it is cleared when full."""
+
     def __init__(self, root, script_name="", config=None):
         self.log = _cplogging.LogManager(id(self), cherrypy.log.logger_root)
         self.root = root
         self.script_name = script_name
         self.wsgiapp = _cpwsgi.CPWSGIApp(self)
+        self.dispatch_cache = {}
+        self.config_cache = {}
 
         self.namespaces = self.namespaces.copy()
         self.namespaces["log"] = lambda k, v: setattr(self.log, k, v)
@@ -96,6 +113,9 @@ class Application(object):
         # Handle namespaces specified in config.
         self.namespaces(self.config.get("/", {}))
 
+        self.dispatch_cache.clear()
+        self.config_cache.clear()
+
     def find_config(self, path, key, default=None):
         """Return the most-specific value for key along path, or default."""
         trail = path or "/"
@@ -216,6 +236,8 @@ class Tree(object):
 
         if config:
             app.merge(config)
+        else:
+            app.dispatch_cache.clear()
 
         self.apps[script_name] = app
 
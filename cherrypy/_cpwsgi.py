@@ -11,8 +11,8 @@ import sys as _sys
 
 import cherrypy as _cherrypy
 from cherrypy._cpcompat import BytesIO, bytestr, ntob, ntou, py3k, unicodestr
-from cherrypy import _cperror
-from cherrypy.lib import httputil
+from cherrypy import _cperror, wsgiserver
+from cherrypy.lib import httputil, file_generator, file_generator_limited
 
 
 def downgrade_wsgi_ux_to_1x(environ):
@@ -139,6 +139,7 @@ class ExceptionTrapper(object):
 class _TrappedResponse(object):
 
     response = iter([])
+    file_wrapper = None
 
     def __init__(self, nextapp, environ, start_response, throws):
         self.nextapp = nextapp
@@ -148,6 +149,8 @@ class _TrappedResponse(object):
         self.started_response = False
         self.response = self.trap(self.nextapp, self.environ, self.start_response)
         self.iter_response = iter(self.response)
+        # Let the server see through us to a file it can send directly.
+        self.file_wrapper = getattr(self.response, 'file_wrapper', None)
 
     def __iter__(self):
         self.started_response = True
@@ -212,6 +215,10 @@ class _TrappedResponse(object):
 class AppResponse(object):
     """WSGI response iterable for CherryPy applications."""
 
+    file_wrapper = None
+    """The wsgi.file_wrapper (if any) which wraps the response body.
+    Servers may send its file directly instead of iterating over self."""
+
     def __init__(self, environ, start_response, cpapp):
         self.cpapp = cpapp
         try:
@@ -244,7 +251,7 @@ class AppResponse(object):
                 outheaders = [(k.decode('ISO-8859-1'), v.decode('ISO-8859-1'))
                               for k, v in outheaders]
 
-            self.iter_response = iter(r.body)
+            self.iter_response = iter(self.wrap_file(r.body))
             self.write = start_response(outstatus, outheaders)
         except:
             self.close()
@@ -262,8 +269,27 @@ class AppResponse(object):
 
     def close(self):
         """Close and de-reference the current request and response. (Core)"""
+        if hasattr(self.file_wrapper, 'close'):
+            self.file_wrapper.close()
         self.cpapp.release_serving()
 
+    def wrap_file(self, body):
+        """Return the given body, in a wsgi.file_wrapper if it is a file."""
+        file_wrapper = self.environ.get('wsgi.file_wrapper')
+        if file_wrapper is None:
+            return body
+
+        if isinstance(body, file_generator):
+            body = file_wrapper(body.input, body.chunkSize)
+        elif (isinstance(body, file_generator_limited)
+              and file_wrapper is wsgiserver.FileWrapper):
+            # The count argument is our own extension to wsgi.file_wrapper.
+            body = file_wrapper(body.input, body.chunk_size, body.count)
+        else:
+            return body
+        self.file_wrapper = body
+        return body
+
     def run(self):
         """Create a Request object using environ."""
         env = self.environ.get
@@ -37,6 +37,23 @@ class CPWSGIServer(wsgiserver.CherryPyWSGIServer):
                    )
         self.protocol = self.server_adapter.protocol_version
         self.nodelay = self.server_adapter.nodelay
+        self.reuse_port = getattr(self.server_adapter, 'reuse_port', False)
+        self.park_idle_connections = getattr(self.server_adapter,
+                                             'park_idle_connections', False)
+        self.use_sendfile = getattr(self.server_adapter, 'use_sendfile', True)
+        self.coalesce_size = getattr(self.server_adapter, 'coalesce_size', 0)
+        self.ssl_handshake_timeout = getattr(self.server_adapter,
+                                             'ssl_handshake_timeout', None)
+        self.accepted_queue_size = getattr(self.server_adapter,
+                                           'accepted_queue_size', 0)
+        self.accepted_queue_timeout = getattr(self.server_adapter,
+                                              'accepted_queue_timeout', 0)
+        self.shed_retry_after = getattr(self.server_adapter,
+                                        'shed_retry_after', 5)
+        if getattr(self.server_adapter, 'thread_pool_autoscale', False):
+            self.autoscaler = wsgiserver.ThreadPoolAutoscaler(
+                self, target=self.server_adapter.thread_pool_target_utilization,
+                cooldown=self.server_adapter.thread_pool_cooldown)
 
         if sys.version_info >= (3, 0):
             ssl_module = self.server_adapter.ssl_module or 'builtin'
@@ -23,18 +23,27 @@ class file_generator(object):
             raise StopIteration()
     next = __next__
 
-def file_generator_limited(fileobj, count, chunk_size=65536):
+class file_generator_limited(object):
     """Yield the given file object in chunks, stopping after `count`
     bytes has been emitted.  Default chunk size is 64kB. (Core)
     """
-    remaining = count
-    while remaining > 0:
-        chunk = fileobj.read(min(chunk_size, remaining))
-        chunklen = len(chunk)
-        if chunklen == 0:
-            return
-        remaining -= chunklen
-        yield chunk
+
+    def __init__(self, fileobj, count, chunk_size=65536):
+        self.input = fileobj
+        self.count = count
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.count > 0:
+            chunk = self.input.read(min(self.chunk_size, self.count))
+            if chunk:
+                self.count -= len(chunk)
+                return chunk
+        raise StopIteration()
+    next = __next__
 
 def set_vary_header(response, header_name):
     "Add a Vary header to a response"
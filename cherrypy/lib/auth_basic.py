@@ -16,13 +16,23 @@ as the credentials store::
     }
     app_config = { '/' : basic_auth }
 
+If checkpassword is expensive (bcrypt, an LDAP bind, a database query), pass
+a :class:`VerificationCache` as 'tools.auth_basic.cache' to remember
+successful verifications for a while::
+
+    basic_auth['tools.auth_basic.cache'] = cherrypy.lib.auth_basic.VerificationCache(ttl=300)
+
 """
 
 __author__ = 'visteya'
 __date__ = 'April 2009'
 
 import binascii
-from cherrypy._cpcompat import base64_decode
+import hmac
+import os
+import threading
+import time
+from cherrypy._cpcompat import base64_decode, ntob, sha
 import cherrypy
 
 
@@ -41,7 +51,63 @@ def checkpassword_dict(user_password_dict):
     return checkpassword
 
 
-def basic_auth(realm, checkpassword, debug=False):
+class VerificationCache(object):
+    """A bounded TTL cache of successfully verified Basic credentials.
+
+    Entries are keyed by an HMAC of the realm and the Authorization header,
+    under a key generated afresh for each process, so the cache never holds
+    passwords or anything a password could be recovered from offline.
+    Failed verifications are never cached. A changed password takes effect
+    for a client whose credentials are cached once its entry expires, so
+    keep ttl short.
+    """
+
+    ttl = 300
+    """The number of seconds a successful verification is remembered."""
+
+    maxsize = 1000
+    """The maximum number of cached verifications."""
+
+    def __init__(self, ttl=300, maxsize=1000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.entries = {}
+        self._key = os.urandom(32)
+        self._lock = threading.Lock()
+
+    def _digest(self, realm, auth_header):
+        msg = ntob('%s\n%s' % (realm, auth_header), 'utf-8')
+        return hmac.new(self._key, msg, sha).digest()
+
+    def get(self, realm, auth_header):
+        """Return the username cached for the given header, or None."""
+        entry = self.entries.get(self._digest(realm, auth_header))
+        if entry is None or entry[1] < time.time():
+            return None
+        return entry[0]
+
+    def put(self, realm, auth_header, username):
+        """Remember that the given header authenticated username."""
+        now = time.time()
+        self._lock.acquire()
+        try:
+            entries = self.entries
+            if len(entries) >= self.maxsize:
+                for k, (u, expires) in list(entries.items()):
+                    if expires < now:
+                        del entries[k]
+                while len(entries) >= self.maxsize:
+                    entries.popitem()
+            entries[self._digest(realm, auth_header)] = (username, now + self.ttl)
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        """Forget all cached verifications."""
+        self.entries.clear()
+
+
+def basic_auth(realm, checkpassword, debug=False, cache=None):
     """A CherryPy tool which hooks at before_handler to perform
     HTTP Basic Access Authentication, as specified in :rfc:`2617`.
 
@@ -61,6 +127,11 @@ def basic_auth(realm, checkpassword, debug=False):
         'authorization' header.  If authentication succeeds, checkpassword
         returns True, else it returns False.
 
+    cache
+        An optional :class:`VerificationCache`. A request whose Authorization
+        header was verified recently is then let through without calling
+        checkpassword again.
+
     """
 
     if '"' in realm:
@@ -69,6 +140,13 @@ def basic_auth(realm, checkpassword, debug=False):
 
     auth_header = request.headers.get('authorization')
     if auth_header is not None:
+        if cache is not None:
+            username = cache.get(realm, auth_header)
+            if username is not None:
+                if debug:
+                    cherrypy.log('Auth succeeded (cached)', 'TOOLS.AUTH_BASIC')
+                request.login = username
+                return
         try:
             scheme, params = auth_header.split(' ', 1)
             if scheme.lower() == 'basic':
@@ -77,6 +155,8 @@ def basic_auth(realm, checkpassword, debug=False):
                     if debug:
                         cherrypy.log('Auth succeeded', 'TOOLS.AUTH_BASIC')
                     request.login = username
+                    if cache is not None:
+                        cache.put(realm, auth_header, username)
                     return # successful authentication
         except (ValueError, binascii.Error): # split() error, base64.decodestring() error
             raise cherrypy.HTTPError(400, 'Bad Request')
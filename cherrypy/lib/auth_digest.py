@@ -16,13 +16,24 @@ of plaintext passwords as the credentials store::
                    'tools.auth_digest.key': 'a565c27146791cfb',
     }
     app_config = { '/' : digest_auth }
+
+By default any nonce this server synthesized is accepted for ten minutes,
+and a client which keeps using one after that gets a fresh challenge. Set
+'tools.auth_digest.nonces' to a :class:`NonceTable` to remember the nonces
+this process issued instead: they can then be trusted for much longer
+(saving challenge round trips) because each request's nonce count is
+checked, and a replayed request is rejected. The table is private to the
+process, so don't use it if several processes serve the same clients.
 """
 
 __author__ = 'visteya'
 __date__ = 'April 2009'
 
 
+import os
+import threading
 import time
+from collections import deque
 from cherrypy._cpcompat import parse_http_list, parse_keqv_list
 
 import cherrypy
@@ -71,6 +82,59 @@ def get_ha1_dict(user_ha1_dict):
 
     return get_ha1
 
+class HtdigestFile(object):
+    """An in-memory index of an Apache htdigest file.
+
+    The file is read once into a dict keyed by (realm, username), and read
+    again only when its modification time or size changes, so a lookup costs
+    one stat() instead of a scan of the whole file. Instances are safe to
+    share between request threads.
+    """
+
+    filename = None
+    """The path of the htdigest file."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.users = {}
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def reload(self, signature=None):
+        """Read the file into a fresh index if it changed since the last read."""
+        if signature is None:
+            st = os.stat(self.filename)
+            signature = (st.st_mtime, st.st_size)
+        self._lock.acquire()
+        try:
+            if signature == self._signature:
+                return
+            users = {}
+            f = open(self.filename, 'r')
+            try:
+                for line in f:
+                    line = line.rstrip()
+                    if not line:
+                        continue
+                    u, r, ha1 = line.split(':')
+                    # Like the linear scan this replaces, the first
+                    # matching line wins.
+                    users.setdefault((r, u), ha1)
+            finally:
+                f.close()
+            self.users = users
+            self._signature = signature
+        finally:
+            self._lock.release()
+
+    def get_ha1(self, realm, username):
+        """Return the HA1 hash for the given realm and username, or None."""
+        st = os.stat(self.filename)
+        if (st.st_mtime, st.st_size) != self._signature:
+            self.reload((st.st_mtime, st.st_size))
+        return self.users.get((realm, username))
+
+
 def get_ha1_file_htdigest(filename):
     """Returns a get_ha1 function which obtains a HA1 password hash from a
     flat file with lines of the same format as that produced by the Apache
@@ -83,19 +147,11 @@ def get_ha1_file_htdigest(filename):
     then use get_ha1_file_htdigest(my_htdigest_file) as the value for the
     get_ha1 argument to digest_auth().  It is recommended that the filename
     argument be an absolute path, to avoid problems.
-    """
-    def get_ha1(realm, username):
-        result = None
-        f = open(filename, 'r')
-        for line in f:
-            u, r, ha1 = line.rstrip().split(':')
-            if u == username and r == realm:
-                result = ha1
-                break
-        f.close()
-        return result
 
-    return get_ha1
+    The file is indexed in memory (see :class:`HtdigestFile`) and re-read
+    only when it changes on disk.
+    """
+    return HtdigestFile(filename).get_ha1
 
 
 def synthesize_nonce(s, key, timestamp=None):
@@ -124,6 +180,113 @@ def H(s):
     return md5_hex(s)
 
 
+class NonceTable(object):
+    """A bounded table of the nonces this process has issued.
+
+    Each entry records when the nonce was issued and which nonce counts
+    (the 'nc' parameter) have been used with it. Counts may arrive out of
+    order, as they do from a client sending requests in parallel, but only
+    within ``window`` of the highest count seen, and each only once.
+
+    A nonce is trusted only while it is in the table, so checking one costs
+    a dict lookup instead of a hash. When the table is full the oldest nonce
+    is dropped; a client still using it is sent a stale challenge and
+    retries with a new nonce.
+    """
+
+    max_age = 3600
+    """The number of seconds an issued nonce stays valid."""
+
+    maxsize = 10000
+    """The maximum number of nonces remembered."""
+
+    window = 64
+    """How far below the highest nonce count seen a count may arrive."""
+
+    def __init__(self, max_age=3600, maxsize=10000, window=64):
+        self.max_age = max_age
+        self.maxsize = maxsize
+        self.window = window
+        # {nonce: [issued, highest nc, bitmask of the counts seen below it]}
+        self.nonces = {}
+        self._order = deque()
+        self._serial = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.nonces)
+
+    def __contains__(self, nonce):
+        entry = self.nonces.get(nonce)
+        return entry is not None and entry[0] + self.max_age > time.time()
+
+    def _expire(self, now):
+        nonces, order = self.nonces, self._order
+        while order:
+            nonce = order[0]
+            entry = nonces.get(nonce)
+            if (entry is not None and len(nonces) < self.maxsize
+                and entry[0] + self.max_age > now):
+                break
+            order.popleft()
+            if entry is not None:
+                del nonces[nonce]
+
+    def issue(self, s, key):
+        """Synthesize a new nonce, remember it, and return it."""
+        now = time.time()
+        self._lock.acquire()
+        try:
+            self._expire(now)
+            # Every nonce must be new, even within one second, or a client
+            # told its nonce is stale could be handed the same one back.
+            self._serial += 1
+            nonce = synthesize_nonce(s, key, '%d.%d' % (now, self._serial))
+            self.nonces[nonce] = [now, 0, 0]
+            self._order.append(nonce)
+        finally:
+            self._lock.release()
+        return nonce
+
+    def use(self, nonce, nc=None):
+        """Record a request using the given nonce and nonce count.
+
+        Returns False if the nonce is unknown or expired, or if the count
+        was already used (a replay) or is malformed or too old to tell;
+        else True. Requests without a nonce count (no qop) cannot be
+        checked for replay, and pass if the nonce is valid.
+        """
+        self._lock.acquire()
+        try:
+            entry = self.nonces.get(nonce)
+            if entry is None or entry[0] + self.max_age <= time.time():
+                return False
+            if nc is None:
+                return True
+            try:
+                nc = int(nc, 16)
+            except ValueError:
+                return False
+            highest = entry[1]
+            if nc > highest:
+                shift = nc - highest
+                if shift > self.window:
+                    entry[2] = 0
+                else:
+                    # Bit i means count (highest - 1 - i) was seen.
+                    entry[2] = ((entry[2] << shift) | (1 << (shift - 1))) & ((1 << self.window) - 1)
+                entry[1] = nc
+                return True
+            offset = highest - 1 - nc
+            if (nc <= 0 or not 0 <= offset < self.window
+                or entry[2] & (1 << offset)):
+                return False
+            entry[2] |= 1 << offset
+            return True
+        finally:
+            self._lock.release()
+
+
 class HttpDigestAuthorization (object):
     """Class to parse a Digest Authorization header and perform re-calculation
     of the digest.
@@ -299,7 +462,7 @@ def www_authenticate(realm, key, algorithm='MD5', nonce=None, qop=qop_auth, stal
     return s
 
 
-def digest_auth(realm, get_ha1, key, debug=False):
+def digest_auth(realm, get_ha1, key, debug=False, nonces=None):
     """A CherryPy tool which hooks at before_handler to perform
     HTTP Digest Access Authentication, as specified in :rfc:`2617`.
 
@@ -324,6 +487,11 @@ def digest_auth(realm, get_ha1, key, debug=False):
     key
         A secret string known only to the server, used in the synthesis of nonces.
 
+    nonces
+        An optional :class:`NonceTable`. If given, only nonces issued by this
+        process and not older than its max_age are accepted, and a request
+        which repeats a nonce count is rejected.
+
     """
     request = cherrypy.serving.request
 
@@ -338,7 +506,11 @@ def digest_auth(realm, get_ha1, key, debug=False):
         if debug:
             TRACE(str(auth))
 
-        if auth.validate_nonce(realm, key):
+        if nonces is not None and auth.nonce in nonces:
+            nonce_is_valid = True
+        else:
+            nonce_is_valid = auth.validate_nonce(realm, key)
+        if nonce_is_valid:
             ha1 = get_ha1(realm, auth.username)
             if ha1 is not None:
                 # note that for request.body to be available we need to hook in at
@@ -348,8 +520,15 @@ def digest_auth(realm, get_ha1, key, debug=False):
                     if debug:
                         TRACE("digest matches auth.response")
                     # Now check if nonce is stale.
-                    # The choice of ten minutes' lifetime for nonce is somewhat arbitrary
-                    nonce_is_stale = auth.is_nonce_stale(max_age_seconds=600)
+                    if nonces is not None:
+                        # An unknown, expired or replayed nonce all earn the
+                        # client a fresh one.
+                        nonce_is_stale = not nonces.use(auth.nonce, auth.nc)
+                        if nonce_is_stale and debug:
+                            TRACE("nonce is stale or nc was replayed")
+                    else:
+                        # The choice of ten minutes' lifetime for nonce is somewhat arbitrary
+                        nonce_is_stale = auth.is_nonce_stale(max_age_seconds=600)
                     if not nonce_is_stale:
                         request.login = auth.username
                         if debug:
@@ -357,7 +536,11 @@ def digest_auth(realm, get_ha1, key, debug=False):
                         return
 
     # Respond with 401 status and a WWW-Authenticate header
-    header = www_authenticate(realm, key, stale=nonce_is_stale)
+    if nonces is not None:
+        nonce = nonces.issue(realm, key)
+    else:
+        nonce = None
+    header = www_authenticate(realm, key, nonce=nonce, stale=nonce_is_stale)
     if debug:
         TRACE(header)
     cherrypy.serving.response.headers['WWW-Authenticate'] = header
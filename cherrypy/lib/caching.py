@@ -25,7 +25,13 @@ You may use a class other than the default
 :class:`MemoryCache<cherrypy.lib.caching.MemoryCache>` by supplying the config
 entry ``cache_class``; supply the full dotted name of the replacement class
 as the config value. It must implement the basic methods ``get``, ``put``,
-``delete``, and ``clear``.
+``delete``, and ``clear``. For example, the worker processes of a
+multi-process server can share one cache::
+
+    [/]
+    tools.caching.on = True
+    tools.caching.cache_class = cherrypy.lib.caching.SharedMemoryCache
+    tools.caching.filename = "/var/run/myapp.cache"
 
 You may set any attribute, including overriding methods, on the cache
 instance by providing them in config. The above sets the
@@ -33,13 +39,25 @@ instance by providing them in config. The above sets the
 """
 
 import datetime
+import errno
+import heapq
+import mmap
+import os
+import stat
+import struct
 import sys
+import tempfile
 import threading
 import time
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 import cherrypy
 from cherrypy.lib import cptools, httputil
-from cherrypy._cpcompat import copyitems, ntob, set_daemon, sorted, Event
+from cherrypy._cpcompat import md5, ntob, pickle, set_daemon, sorted, Event
 
 
 class Cache(object):
@@ -127,6 +145,19 @@ class AntiStampedeCache(dict):
             existing.set()
 
 
+class _CacheEntry(object):
+    """Bookkeeping for one cached variant in a MemoryCache."""
+
+    def __init__(self, uri, key, size, expiration_time, serial):
+        self.uri = uri
+        self.key = key
+        self.size = size
+        self.expiration_time = expiration_time
+        self.serial = serial
+        self.last_used = serial
+        self.hits = 0
+
+
 class MemoryCache(Cache):
     """An in-memory cache for varying response content.
 
@@ -140,6 +171,10 @@ class MemoryCache(Cache):
     The items contained in ``self.store[uri]`` have keys which are tuples of
     request header values (in the same order as the names in its
     selecting_headers), and values which are the actual responses.
+
+    When the cache is full, new variants replace old ones according to
+    the ``eviction`` policy. Both expiration and eviction use heaps, so
+    their cost grows with the number of variants removed, not cached.
     """
 
     maxobjects = 1000
@@ -160,9 +195,15 @@ class MemoryCache(Cache):
     expire_freq = 0.1
     """Seconds to sleep between cache expiration sweeps."""
 
+    eviction = 'lru'
+    """Which cached objects to evict to make room for new ones when the cache
+    is full: 'lru' (least recently used, the default) or 'lfu' (least
+    frequently used, oldest first among equals)."""
+
     debug = False
 
     def __init__(self):
+        self._lock = threading.RLock()
         self.clear()
 
         # Run self.expire_cache in a separate daemon thread.
@@ -173,14 +214,26 @@ class MemoryCache(Cache):
 
     def clear(self):
         """Reset the cache to its initial, empty state."""
-        self.store = {}
-        self.expirations = {}
-        self.tot_puts = 0
-        self.tot_gets = 0
-        self.tot_hist = 0
-        self.tot_expires = 0
-        self.tot_non_modified = 0
-        self.cursize = 0
+        self._lock.acquire()
+        try:
+            self.store = {}
+            # Map (uri, key) pairs to _CacheEntry objects.
+            self.entries = {}
+            # Heaps of (expiration_time, serial, entry) and
+            # (rank, serial, entry), where serials break ties. Replaced
+            # and removed entries leave stale items behind.
+            self.expirations = []
+            self.evictions = []
+            self.serial = 0
+            self.tot_puts = 0
+            self.tot_gets = 0
+            self.tot_hist = 0
+            self.tot_expires = 0
+            self.tot_evictions = 0
+            self.tot_non_modified = 0
+            self.cursize = 0
+        finally:
+            self._lock.release()
 
     def expire_cache(self):
         """Continuously examine cached objects, expiring stale ones.
@@ -193,21 +246,64 @@ class MemoryCache(Cache):
         # See tickets #99 and #180 for more information.
         while time:
             now = time.time()
-            # Must make a copy of expirations so it doesn't change size
-            # during iteration
-            for expiration_time, objects in copyitems(self.expirations):
-                if expiration_time <= now:
-                    for obj_size, uri, sel_header_values in objects:
-                        try:
-                            del self.store[uri][tuple(sel_header_values)]
-                            self.tot_expires += 1
-                            self.cursize -= obj_size
-                        except KeyError:
-                            # the key may have been deleted elsewhere
-                            pass
-                    del self.expirations[expiration_time]
+            self._lock.acquire()
+            try:
+                expirations = self.expirations
+                while expirations and expirations[0][0] <= now:
+                    entry = heapq.heappop(expirations)[2]
+                    if self.entries.get((entry.uri, entry.key)) is entry:
+                        self._remove(entry)
+                        self.tot_expires += 1
+            finally:
+                self._lock.release()
             time.sleep(self.expire_freq)
 
+    def _rank(self, entry):
+        if self.eviction == 'lfu':
+            return (entry.hits, entry.last_used)
+        return entry.last_used
+
+    def _use(self, entry):
+        self.serial += 1
+        entry.last_used = self.serial
+        entry.hits += 1
+
+    def _remove(self, entry):
+        """Forget the given entry and its variant. Caller must hold the lock."""
+        del self.entries[(entry.uri, entry.key)]
+        self.cursize -= entry.size
+        uricache = self.store.get(entry.uri)
+        if uricache is not None:
+            uricache.pop(entry.key, None)
+            if not uricache and len(self.store) > self.maxobjects:
+                # Don't let the URI index outgrow the cache itself.
+                del self.store[entry.uri]
+
+    def _evict(self):
+        """Evict the lowest-ranked entry. Caller must hold the lock."""
+        evictions = self.evictions
+        while evictions:
+            rank, serial, entry = heapq.heappop(evictions)
+            if self.entries.get((entry.uri, entry.key)) is not entry:
+                continue
+            current = self._rank(entry)
+            if current > rank:
+                # Used since it was pushed; requeue it at its new rank.
+                heapq.heappush(evictions, (current, serial, entry))
+                continue
+            self._remove(entry)
+            self.tot_evictions += 1
+            return True
+        return False
+
+    def _compact(self):
+        """Rebuild both heaps without stale items. Caller must hold the lock."""
+        entries = list(self.entries.values())
+        self.expirations = [(e.expiration_time, e.serial, e) for e in entries]
+        heapq.heapify(self.expirations)
+        self.evictions = [(self._rank(e), e.serial, e) for e in entries]
+        heapq.heapify(self.evictions)
+
     def get(self):
         """Return the current variant if in the cache, else None."""
         request = cherrypy.serving.request
@@ -220,11 +316,18 @@ class MemoryCache(Cache):
 
         header_values = [request.headers.get(h, '')
                          for h in uricache.selecting_headers]
-        variant = uricache.wait(key=tuple(sorted(header_values)),
-                                timeout=self.antistampede_timeout,
+        key = tuple(sorted(header_values))
+        variant = uricache.wait(key=key, timeout=self.antistampede_timeout,
                                 debug=self.debug)
         if variant is not None:
             self.tot_hist += 1
+            self._lock.acquire()
+            try:
+                entry = self.entries.get((uri, key))
+                if entry is not None:
+                    self._use(entry)
+            finally:
+                self._lock.release()
         return variant
 
     def put(self, variant, size):
@@ -240,27 +343,428 @@ class MemoryCache(Cache):
                 e.value for e in response.headers.elements('Vary')]
             self.store[uri] = uricache
 
-        if len(self.store) < self.maxobjects:
-            total_size = self.cursize + size
+        # checks if there's space for the object
+        if size >= self.maxobj_size or size >= self.maxsize:
+            return
 
-            # checks if there's space for the object
-            if (size < self.maxobj_size and total_size < self.maxsize):
-                # add to the expirations list
-                expiration_time = response.time + self.delay
-                bucket = self.expirations.setdefault(expiration_time, [])
-                bucket.append((size, uri, uricache.selecting_headers))
+        header_values = [request.headers.get(h, '')
+                         for h in uricache.selecting_headers]
+        key = tuple(sorted(header_values))
 
-                # add to the cache
-                header_values = [request.headers.get(h, '')
-                                 for h in uricache.selecting_headers]
-                uricache[tuple(sorted(header_values))] = variant
-                self.tot_puts += 1
-                self.cursize = total_size
+        self._lock.acquire()
+        try:
+            # Forget any variant we replace (but leave it, or the
+            # AntiStampedeCache's Event, in place until we set ours).
+            old = self.entries.pop((uri, key), None)
+            if old is not None:
+                self.cursize -= old.size
+
+            # make room for the object
+            while self.entries and (
+                    len(self.entries) >= self.maxobjects or
+                    self.cursize + size >= self.maxsize):
+                if not self._evict():
+                    break
+            if (len(self.entries) >= self.maxobjects or
+                self.cursize + size >= self.maxsize):
+                return
+
+            self.serial += 1
+            entry = _CacheEntry(uri, key, size, response.time + self.delay,
+                                self.serial)
+            self.entries[(uri, key)] = entry
+            self.cursize += size
+            if len(self.evictions) > 2 * len(self.entries) + 100:
+                self._compact()
+            heapq.heappush(self.expirations,
+                           (entry.expiration_time, entry.serial, entry))
+            heapq.heappush(self.evictions,
+                           (self._rank(entry), entry.serial, entry))
+
+            # add to the cache
+            uricache[key] = variant
+            self.tot_puts += 1
+        finally:
+            self._lock.release()
 
     def delete(self):
         """Remove ALL cached variants of the current resource."""
         uri = cherrypy.url(qs=cherrypy.serving.request.query_string)
-        self.store.pop(uri, None)
+        self._lock.acquire()
+        try:
+            uricache = self.store.pop(uri, None)
+            if uricache is not None:
+                for key in list(uricache.keys()):
+                    entry = self.entries.pop((uri, key), None)
+                    if entry is not None:
+                        self.cursize -= entry.size
+        finally:
+            self._lock.release()
+
+
+# --------------------------- Shared Memory Cache ---------------------------- #
+
+
+_EMPTY, _VALUE, _PENDING, _URI = 0, 1, 2, 3
+
+
+class SharedMemoryCache(Cache):
+    """A cache for varying response content, shared between processes.
+
+    All caches which map the same ``filename`` share the variants stored
+    in it, so the worker processes of a server only render each response
+    once between them. The file is divided into ``maxobjects`` slots of
+    ``maxobj_size`` bytes, grouped into sets of ``ways`` slots. Each item
+    may only be stored in the set its key hashes to; when that set is
+    full, the item which expires soonest is replaced. The file is sparse,
+    so slots only take up memory or disk space once they have been used.
+
+    Each URI has a slot of its own, which holds its selecting_headers and
+    a "generation". Its variants are keyed by a hash of the URI, the
+    generation and the selecting header values, so ``delete`` only needs
+    to forget the URI's slot. Instead of the Events of the
+    AntiStampedeCache, a slot is marked as pending while one process
+    calculates its variant; the others poll it until it is filled in or
+    ``antistampede_timeout`` has passed.
+
+    The sets are guarded by ``shards`` locks, each of which is both a
+    thread lock and (where the fcntl module is available) a record lock
+    on a byte of the file. Without fcntl, only threads are synchronized.
+
+    Cached items are pickled, so whoever can write the file can run code
+    in the server. The cache won't follow a symlink to it, and refuses a
+    file which belongs to another user or which the group or others have
+    any access to.
+    """
+
+    filename = None
+    """The file to map. Caches which share content must name the same file;
+    if None, a file in a directory of the temporary directory which only
+    the current user may use is used."""
+
+    maxobjects = 1000
+    """The number of slots for URIs and their variants; defaults to 1000."""
+
+    maxobj_size = 100000
+    """The maximum size of each cached object in bytes; defaults to 100 KB."""
+
+    delay = 600
+    """Seconds until the cached content expires; defaults to 600 (10 minutes)."""
+
+    antistampede_timeout = 5
+    """Seconds to wait for other processes to calculate a pending variant."""
+
+    antistampede_poll = 0.05
+    """Seconds to sleep between checks of a pending variant."""
+
+    ways = 4
+    """The number of slots in each set."""
+
+    shards = 16
+    """The number of locks guarding the sets."""
+
+    debug = False
+
+    _magic = ntob('CPCACHE1')
+    _file_header = 64
+    _slot_format = '!B16sdI'
+    _slot_header = struct.calcsize(_slot_format)
+
+    def __init__(self):
+        self.mmap = None
+        self.fd = None
+        self._open_lock = threading.Lock()
+        self._generations = 0
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.tot_puts = 0
+        self.tot_gets = 0
+        self.tot_hist = 0
+        self.tot_non_modified = 0
+
+    def _open(self):
+        """Map the cache file, (re)initializing it if its layout differs."""
+        self._open_lock.acquire()
+        try:
+            if self.mmap is not None:
+                return
+
+            filename = self.filename
+            if filename is None:
+                filename = os.path.join(self._private_dir(), 'cherrypy-cache')
+
+            ways = int(self.ways)
+            slots = max(int(self.maxobjects) // ways, 1) * ways
+            slot_size = self._slot_header + int(self.maxobj_size)
+            length = self._file_header + slots * slot_size
+            header = struct.pack('!8sIII', self._magic, slots, slot_size, ways)
+
+            fd = os.open(filename, os.O_RDWR | os.O_CREAT |
+                         getattr(os, 'O_NOFOLLOW', 0), 384)
+            try:
+                self._check_private(os.fstat(fd), filename, stat.S_ISREG)
+                self._lockf(fd, 0)
+                try:
+                    if (os.read(fd, len(header)) != header or
+                            os.fstat(fd).st_size != length):
+                        # A new file, or one laid out for other settings.
+                        os.ftruncate(fd, 0)
+                        os.ftruncate(fd, length)
+                        os.lseek(fd, 0, 0)
+                        os.write(fd, header)
+                    self.mmap = mmap.mmap(fd, length)
+                finally:
+                    self._unlockf(fd, 0)
+            except:
+                os.close(fd)
+                raise
+
+            self.fd = fd
+            self.slots = slots
+            self.slot_size = slot_size
+            self._ways = ways
+            self._locks = [threading.Lock() for i in range(int(self.shards))]
+        finally:
+            self._open_lock.release()
+
+    def _private_dir(self):
+        """Return a directory in the temporary directory for this user only."""
+        if not hasattr(os, 'getuid'):
+            # Windows gives each user a temporary directory of their own.
+            return tempfile.gettempdir()
+        dirname = os.path.join(tempfile.gettempdir(),
+                               'cherrypy-%d' % os.getuid())
+        try:
+            os.mkdir(dirname, 448)
+        except OSError:
+            if sys.exc_info()[1].errno != errno.EEXIST:
+                raise
+        self._check_private(os.lstat(dirname), dirname, stat.S_ISDIR)
+        return dirname
+
+    def _check_private(self, st, path, is_type):
+        """Raise OSError unless st is of the given type and ours alone."""
+        if not is_type(st.st_mode):
+            raise OSError(errno.EACCES, "Not a regular file or directory",
+                          path)
+        if hasattr(os, 'getuid') and (st.st_uid != os.getuid() or
+                                      st.st_mode & 63):
+            raise OSError(errno.EACCES, "Refusing a cache file which other "
+                          "users own or have access to", path)
+
+    def _lockf(self, fd, offset):
+        if fcntl is not None:
+            fcntl.lockf(fd, fcntl.LOCK_EX, 1, offset)
+
+    def _unlockf(self, fd, offset):
+        if fcntl is not None:
+            fcntl.lockf(fd, fcntl.LOCK_UN, 1, offset)
+
+    def _digest(self, *parts):
+        return md5(ntob('\0'.join(parts), 'utf-8')).digest()
+
+    def _set(self, digest):
+        """Return the index of the first slot of the set for the given digest."""
+        sets = self.slots // self._ways
+        return (struct.unpack('!I', digest[:4])[0] % sets) * self._ways
+
+    def _acquire(self, digest):
+        if self.mmap is None:
+            self._open()
+        shard = (self._set(digest) // self._ways) % len(self._locks)
+        self._locks[shard].acquire()
+        try:
+            self._lockf(self.fd, shard + 1)
+        except:
+            self._locks[shard].release()
+            raise
+        return shard
+
+    def _release(self, shard):
+        try:
+            self._unlockf(self.fd, shard + 1)
+        finally:
+            self._locks[shard].release()
+
+    def _find(self, digest, now):
+        """Return (index, state, stamp, length) of the slot for digest.
+
+        If the digest isn't stored, return the slot to store it in
+        (which is empty or expires soonest) with a state of None.
+        Caller must hold the lock for the digest.
+        """
+        start = self._set(digest)
+        victim = None
+        for index in range(start, start + self._ways):
+            offset = self._file_header + index * self.slot_size
+            state, key, stamp, length = struct.unpack(
+                self._slot_format, self.mmap[offset:offset + self._slot_header])
+            if state != _EMPTY and key == digest:
+                return index, state, stamp, length
+            if state == _EMPTY or stamp <= now:
+                stamp = 0
+            if victim is None or stamp < victim[1]:
+                victim = (index, stamp)
+        return victim[0], None, 0, 0
+
+    def _read(self, index, length):
+        offset = (self._file_header + index * self.slot_size +
+                  self._slot_header)
+        return pickle.loads(self.mmap[offset:offset + length])
+
+    def _write(self, index, state, digest, stamp, data=ntob('')):
+        offset = self._file_header + index * self.slot_size
+        record = struct.pack(self._slot_format, state, digest,
+                             stamp, len(data)) + data
+        self.mmap[offset:offset + len(record)] = record
+
+    def _uri_record(self, uri, expiration_time=None):
+        """Return (generation, selecting_headers) for the given URI, or None.
+
+        If expiration_time is given, create the record if need be, and keep
+        it until at least that time.
+        """
+        digest = self._digest(uri)
+        shard = self._acquire(digest)
+        try:
+            now = time.time()
+            index, state, stamp, length = self._find(digest, now)
+            if state == _URI and stamp > now:
+                record = self._read(index, length)
+                if expiration_time is not None and expiration_time > stamp:
+                    self._write(index, _URI, digest, expiration_time,
+                                pickle.dumps(record, -1))
+                return record
+            if expiration_time is None:
+                return None
+
+            self._generations += 1
+            generation = '%s-%s-%s' % (os.getpid(), self._generations,
+                                       repr(time.time()))
+            response = cherrypy.serving.response
+            record = (generation,
+                      [e.value for e in response.headers.elements('Vary')])
+            self._write(index, _URI, digest, expiration_time,
+                        pickle.dumps(record, -1))
+            return record
+        finally:
+            self._release(shard)
+
+    def _variant_digest(self, uri, record):
+        generation, selecting_headers = record
+        header_values = [cherrypy.serving.request.headers.get(h, '')
+                         for h in selecting_headers]
+        return self._digest(uri, generation, *sorted(header_values))
+
+    def _wait(self, digest):
+        """Return the cached variant for the given digest, or None.
+
+        This works like AntiStampedeCache.wait, except that it polls a
+        pending slot rather than waiting on an Event, and marks the slot
+        as pending (until the timeout) when it returns None.
+        """
+        timeout = self.antistampede_timeout
+        waited = False
+        while True:
+            shard = self._acquire(digest)
+            try:
+                now = time.time()
+                index, state, stamp, length = self._find(digest, now)
+                if state == _VALUE and stamp > now:
+                    if waited and self.debug:
+                        cherrypy.log('Result!', 'TOOLS.CACHING')
+                    return self._read(index, length)
+                if state != _PENDING or stamp <= now or timeout is None:
+                    if timeout is not None:
+                        # Mark the slot so other processes wait
+                        # on this one to finish calculating the value.
+                        if self.debug:
+                            cherrypy.log('Marking pending', 'TOOLS.CACHING')
+                        self._write(index, _PENDING, digest, now + timeout)
+                    return None
+            finally:
+                self._release(shard)
+
+            if not waited and self.debug:
+                cherrypy.log('Waiting up to %s seconds' % timeout,
+                             'TOOLS.CACHING')
+            waited = True
+            time.sleep(self.antistampede_poll)
+
+    def clear(self):
+        """Reset the cache to its initial, empty state."""
+        if self.mmap is None:
+            self._open()
+        held = []
+        try:
+            for shard in range(len(self._locks)):
+                self._locks[shard].acquire()
+                held.append(shard)
+                self._lockf(self.fd, shard + 1)
+            empty = struct.pack('!B', _EMPTY)
+            for index in range(self.slots):
+                offset = self._file_header + index * self.slot_size
+                self.mmap[offset:offset + 1] = empty
+        finally:
+            for shard in held:
+                self._release(shard)
+        self._reset_stats()
+
+    def get(self):
+        """Return the current variant if in the cache, else None."""
+        request = cherrypy.serving.request
+        self.tot_gets += 1
+
+        uri = cherrypy.url(qs=request.query_string)
+        record = self._uri_record(uri)
+        if record is None:
+            return None
+
+        variant = self._wait(self._variant_digest(uri, record))
+        if variant is not None:
+            self.tot_hist += 1
+        return variant
+
+    def put(self, variant, size):
+        """Store the current variant in the cache."""
+        request = cherrypy.serving.request
+        response = cherrypy.serving.response
+
+        # checks if there's space for the object
+        if size >= self.maxobj_size:
+            return
+        data = pickle.dumps(variant, -1)
+        if self.mmap is None:
+            self._open()
+        if len(data) > self.slot_size - self._slot_header:
+            return
+
+        uri = cherrypy.url(qs=request.query_string)
+        expiration_time = response.time + self.delay
+        record = self._uri_record(uri, expiration_time)
+        digest = self._variant_digest(uri, record)
+
+        shard = self._acquire(digest)
+        try:
+            index = self._find(digest, time.time())[0]
+            self._write(index, _VALUE, digest, expiration_time, data)
+            self.tot_puts += 1
+        finally:
+            self._release(shard)
+
+    def delete(self):
+        """Remove ALL cached variants of the current resource."""
+        uri = cherrypy.url(qs=cherrypy.serving.request.query_string)
+        digest = self._digest(uri)
+        shard = self._acquire(digest)
+        try:
+            index, state = self._find(digest, time.time())[:2]
+            if state == _URI:
+                # Without the URI's generation, its variants are unreachable.
+                self._write(index, _EMPTY, digest, 0)
+        finally:
+            self._release(shard)
 
 
 def get(invalid_methods=("POST", "PUT", "DELETE"), debug=False, **kwargs):
@@ -430,9 +430,8 @@ def log_hooks(debug=False):
 
     for k in points:
         msg.append("    %s:" % k)
-        v = request.hooks.get(k, [])
-        v.sort()
-        for h in v:
+        # Hooks are kept in priority order by HookMap.insert.
+        for h in request.hooks.get(k, []):
             msg.append("        %r" % h)
     cherrypy.log('\nRequest Hooks for ' + cherrypy.url() +
                  ':\n' + '\n'.join(msg), "HTTP")
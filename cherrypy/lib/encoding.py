@@ -1,4 +1,6 @@
+import heapq
 import struct
+import threading
 import time
 
 import cherrypy
@@ -275,7 +277,111 @@ def decompress(body):
     return data
 
 
-def gzip(compress_level=5, mime_types=['text/html', 'text/plain'], debug=False):
+class GzipCache(object):
+    """A bounded, in-memory store of gzipped response bodies.
+
+    Bodies are keyed by the response's Content-MD5 header, or by its
+    (strong) ETag along with the URL, so a stable response is only
+    compressed once. When the cache is full, the least recently used
+    bodies are evicted to make room.
+    """
+
+    maxobjects = 100
+    """The maximum number of cached bodies; defaults to 100."""
+
+    maxobj_size = 100000
+    """The maximum size of each compressed body in bytes; defaults to 100 KB."""
+
+    maxsize = 10000000
+    """The maximum size of all compressed bodies in bytes; defaults to 10 MB."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Reset the cache to its initial, empty state."""
+        self._lock.acquire()
+        try:
+            # Map keys to [serial, body] lists.
+            self.store = {}
+            # A heap of (serial, key); used bodies leave stale items behind.
+            self.order = []
+            self.serial = 0
+            self.cursize = 0
+            self.hits = 0
+            self.misses = 0
+        finally:
+            self._lock.release()
+
+    def get(self, key):
+        """Return the compressed body for the given key, or None."""
+        self._lock.acquire()
+        try:
+            item = self.store.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.serial += 1
+            item[0] = self.serial
+            heapq.heappush(self.order, (self.serial, key))
+            return item[1]
+        finally:
+            self._lock.release()
+
+    def put(self, key, body):
+        """Store the compressed body for the given key."""
+        size = len(body)
+        if size > self.maxobj_size or size > self.maxsize:
+            return
+
+        self._lock.acquire()
+        try:
+            old = self.store.pop(key, None)
+            if old is not None:
+                self.cursize -= len(old[1])
+
+            while self.store and (len(self.store) >= self.maxobjects or
+                                  self.cursize + size > self.maxsize):
+                serial, k = heapq.heappop(self.order)
+                item = self.store.get(k)
+                if item is not None and item[0] == serial:
+                    del self.store[k]
+                    self.cursize -= len(item[1])
+
+            self.serial += 1
+            self.store[key] = [self.serial, body]
+            self.cursize += size
+            heapq.heappush(self.order, (self.serial, key))
+            if len(self.order) > 2 * len(self.store) + 100:
+                self.order = [(item[0], k) for k, item in self.store.items()]
+                heapq.heapify(self.order)
+        finally:
+            self._lock.release()
+
+
+gzip_cache = GzipCache()
+"""The GzipCache used by the gzip tool when its 'cache' arg is True."""
+
+
+def _gzip_cache_key(compress_level):
+    """Return a key identifying the current response body, or None."""
+    response = cherrypy.serving.response
+    md5 = response.headers.get('Content-MD5')
+    if md5:
+        return ('Content-MD5', md5, compress_level)
+    etag = response.headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        # Strong entity tags are only unique per resource.
+        request = cherrypy.serving.request
+        url = cherrypy.url(qs=request.query_string)
+        return ('ETag', url, etag, compress_level)
+    return None
+
+
+def gzip(compress_level=5, mime_types=['text/html', 'text/plain'], debug=False,
+         cache=False):
     """Try to gzip the response body if Content-Type in mime_types.
 
     cherrypy.response.headers['Content-Type'] must be set to one of the
@@ -291,7 +397,11 @@ def gzip(compress_level=5, mime_types=['text/html', 'text/plain'], debug=False):
         * No 'gzip' or 'x-gzip' is present in the Accept-Encoding header
         * No 'gzip' or 'x-gzip' with a qvalue > 0 is present
         * The 'identity' value is given with a qvalue > 0.
+        * The response already has a Content-Encoding (for example,
+          a precompressed file served by tools.staticdir).
 
+    If cache is True, bodies with a Content-MD5 or strong ETag response
+    header are compressed once and then served from ``gzip_cache``.
     """
     request = cherrypy.serving.request
     response = cherrypy.serving.response
@@ -311,6 +421,11 @@ def gzip(compress_level=5, mime_types=['text/html', 'text/plain'], debug=False):
             cherrypy.log('Not gzipping cached response', context='TOOLS.GZIP')
         return
 
+    if 'Content-Encoding' in response.headers:
+        if debug:
+            cherrypy.log('Response already encoded', context='TOOLS.GZIP')
+        return
+
     acceptable = request.headers.elements('Accept-Encoding')
     if not acceptable:
         # If no Accept-Encoding field is present in a request,
@@ -373,7 +488,21 @@ def gzip(compress_level=5, mime_types=['text/html', 'text/plain'], debug=False):
                 cherrypy.log('Gzipping', context='TOOLS.GZIP')
             # Return a generator that compresses the page
             response.headers['Content-Encoding'] = 'gzip'
-            response.body = compress(response.body, compress_level)
+            key = None
+            if cache:
+                key = _gzip_cache_key(compress_level)
+            if key is None:
+                response.body = compress(response.body, compress_level)
+            else:
+                body = gzip_cache.get(key)
+                if body is None:
+                    body = ntob('').join(compress(response.body,
+                                                  compress_level))
+                    gzip_cache.put(key, body)
+                elif debug:
+                    cherrypy.log('Compressed body found in cache',
+                                 context='TOOLS.GZIP')
+                response.body = body
             if "Content-Length" in response.headers:
                 # Delete Content-Length header so finalize() recalcs it.
                 del response.headers["Content-Length"]
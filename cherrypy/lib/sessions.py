@@ -20,6 +20,34 @@ To set data for the current session, use
 ``cherrypy.session['fieldname'] = 'fieldvalue'``;
 to get data use ``cherrypy.session.get('fieldname')``.
 
+===============
+Saving sessions
+===============
+
+Session data (for all but the RAM backend) is serialized with pickle by
+default. Set ``tools.sessions.serializer`` to ``'marshal'`` or ``'json'``
+(or to an object with ``dumps`` and ``loads`` methods) to use another
+serializer. Stored data records which serializer wrote it; a session saved
+by another serializer, or which can't be read, is logged and started afresh
+as if it had expired. Set ``tools.sessions.compress_threshold`` to a number of bytes
+to compress serialized data of at least that size with zlib. Each Session
+records the number of bytes it loaded and saved in its ``bytes_loaded`` and
+``bytes_saved`` attributes, and the totals are kept in the
+``'CherryPy Sessions'`` namespace of ``logging.statistics`` (see
+:mod:`cherrypy.lib.cpstats`).
+
+Session data is only written back to storage if it was changed through the
+session's own mapping methods (``session[key] = value``, ``del``, ``pop``,
+``update``, ``setdefault`` or ``clear``). If you change a mutable value in
+place, such as ``cherrypy.session['cart'].append(item)``, call
+``cherrypy.session.mark_dirty()`` so that it is saved; or set
+``tools.sessions.track_changes = False`` to save loaded session data on
+every request.
+
+Unchanged session data is still "touched" now and then, to push back its
+expiration time, but at most once per ``tools.sessions.touch_interval``
+seconds (60 by default, and never more than half the timeout).
+
 ================
 Locking sessions
 ================
@@ -63,8 +91,8 @@ Sharing Sessions
 If you run multiple instances of CherryPy (for example via mod_python behind
 Apache prefork), you most likely cannot use the RAM session backend, since each
 instance of CherryPy will have its own memory space. Use a different backend
-instead, and verify that all instances are pointing at the same file or db
-location. Alternately, you might try a load balancer which makes sessions
+instead (such as "sqlite", for processes on a single host), and verify that
+all instances are pointing at the same file or db location. Alternately, you might try a load balancer which makes sessions
 "sticky". Google is your friend, there.
 
 ================
@@ -90,19 +118,105 @@ Maybe FF doesn't trust system time.
 """
 import sys
 import datetime
+import errno
+import heapq
+import logging
+import marshal
 import os
+import stat
+import tempfile
 import time
 import threading
 import types
 from warnings import warn
+import zlib
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
 
 import cherrypy
-from cherrypy._cpcompat import copyitems, pickle, random20, unicodestr
+from cherrypy._cpcompat import basestring, bytestr, get_thread_ident
+from cherrypy._cpcompat import json_decode, json_encode, md5, ntob, pickle
+from cherrypy._cpcompat import random20, unicodestr
 from cherrypy.lib import httputil
 
 
 missing = object()
 
+
+# ------------------------------ Serializers ------------------------------ #
+
+class PickleSerializer(object):
+    """Serialize session data with pickle."""
+
+    def __init__(self, protocol=pickle.HIGHEST_PROTOCOL):
+        self.protocol = protocol
+
+    def dumps(self, data):
+        return pickle.dumps(data, self.protocol)
+
+    def loads(self, s):
+        return pickle.loads(s)
+
+
+class MarshalSerializer(object):
+    """Serialize session data with marshal (builtin types only)."""
+
+    def dumps(self, data):
+        return marshal.dumps(data)
+
+    def loads(self, s):
+        return marshal.loads(s)
+
+
+class JSONSerializer(object):
+    """Serialize session data as (UTF-8) JSON.
+
+    Only dicts, lists, strings, numbers, booleans and None survive the
+    round trip; tuples come back as lists, and strings as unicode.
+    """
+
+    def dumps(self, data):
+        return ntob('').join(json_encode(data))
+
+    def loads(self, s):
+        return json_decode(s.decode('utf-8'))
+
+
+serializers = {
+    'pickle': PickleSerializer(),
+    'marshal': MarshalSerializer(),
+    'json': JSONSerializer(),
+    }
+"""A map of the names of serializers (for tools.sessions.serializer) to them."""
+
+# Data from Session._dumps starts with one of these markers, followed by the
+# id of the serializer which wrote it and _ID_END. Anything else is a bare
+# pickle, as saved before serializers could be chosen.
+_RAW = ntob('r')
+_COMPRESSED = ntob('z')
+_ID_END = ntob(':')
+
+
+class _UnreadableData(ValueError):
+    """Stored session data which the session's serializer can't load."""
+
+if not hasattr(logging, 'statistics'): logging.statistics = {}
+stats = logging.statistics.setdefault('CherryPy Sessions', {})
+stats.update({
+    'Loads': 0,
+    'Saves': 0,
+    'Compressed Saves': 0,
+    'Bytes Loaded': 0,
+    'Bytes Saved': 0,
+    })
+
+
 class Session(object):
     """A CherryPy dict-like Session object (one per request)."""
 
@@ -152,6 +266,51 @@ class Session(object):
     debug = False
     "If True, log debug information."
 
+    dirty = False
+    """
+    True if the session data has changed since it was loaded, and so must
+    be saved. The mapping methods which change the data set this; call
+    mark_dirty after changing a mutable value in place."""
+
+    track_changes = True
+    """
+    If False, save loaded session data at the end of every request, whether
+    or not it has changed."""
+
+    touch_interval = 60
+    """
+    The minimum number of seconds between saves of unchanged session data,
+    which only push back its expiration time. At most half of the timeout
+    is used, so that sessions in use do not expire."""
+
+    _expiration_time = None
+    "The expiration time of the stored session data, once loaded."
+
+    serializer = 'pickle'
+    """
+    The name of the serializer (a key of sessions.serializers) used by
+    storage classes to turn session data into bytes, or an object with
+    dumps and loads methods. The name (or for an object, its ``name``
+    attribute or else its class name) is stored with the data, and data
+    stored by any other serializer is discarded when loaded."""
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+    "The protocol used by the 'pickle' serializer."
+
+    compress_threshold = None
+    """
+    Compress serialized session data (with zlib) which is at least this
+    many bytes long. If None, never compress it."""
+
+    compress_level = 6
+    "The zlib compression level, from 1 (fastest) to 9 (smallest)."
+
+    bytes_loaded = 0
+    "The number of (serialized) bytes of session data loaded."
+
+    bytes_saved = 0
+    "The number of (serialized and compressed) bytes of session data saved."
+
     # --------------------- Session management methods --------------------- #
 
     def __init__(self, id=None, **kwargs):
@@ -193,6 +352,8 @@ class Session(object):
     def regenerate(self):
         """Replace the current session (with a new id)."""
         self.regenerated = True
+        # The data must be saved again, under the new id.
+        self.dirty = True
         self._regenerate()
 
     def _regenerate(self):
@@ -241,11 +402,26 @@ class Session(object):
             if self.loaded:
                 t = datetime.timedelta(seconds = self.timeout * 60)
                 expiration_time = self.now() + t
-                if self.debug:
-                    cherrypy.log('Saving session %r with expiry %s' %
-                                 (self.id, expiration_time),
-                                 'TOOLS.SESSIONS')
-                self._save(expiration_time)
+                if self.dirty or not self.track_changes:
+                    if self.debug:
+                        cherrypy.log('Saving session %r with expiry %s' %
+                                     (self.id, expiration_time),
+                                     'TOOLS.SESSIONS')
+                    self._save(expiration_time)
+                    self.dirty = False
+                    self._expiration_time = expiration_time
+                elif self._needs_touch(expiration_time):
+                    if self.debug:
+                        cherrypy.log('Touching session %r with expiry %s' %
+                                     (self.id, expiration_time),
+                                     'TOOLS.SESSIONS')
+                    self._touch(expiration_time)
+                    self._expiration_time = expiration_time
+                else:
+                    if self.debug:
+                        cherrypy.log(
+                            'Skipping save of session %r (unchanged).' %
+                            self.id, 'TOOLS.SESSIONS')
             else:
                 if self.debug:
                     cherrypy.log(
@@ -258,20 +434,119 @@ class Session(object):
                 if self.debug:
                     cherrypy.log('Lock released after save.', 'TOOLS.SESSIONS')
 
+    def _needs_touch(self, expiration_time):
+        """Return True if the stored expiration time is due to be renewed."""
+        if self._expiration_time is None:
+            return True
+        interval = min(self.touch_interval, self.timeout * 30)
+        renewal = expiration_time - self._expiration_time
+        return renewal >= datetime.timedelta(seconds=interval)
+
+    def _touch(self, expiration_time):
+        """Push back the expiration time of the stored (unchanged) data.
+
+        By default, this saves the data again; storage classes which can
+        update the expiration time alone should override it.
+        """
+        self._save(expiration_time)
+
+    def mark_dirty(self):
+        """Mark the session data as changed, so that it is saved."""
+        self.dirty = True
+
+    def _get_serializer(self):
+        serializer = self.serializer
+        if serializer == 'pickle':
+            if self.pickle_protocol != pickle.HIGHEST_PROTOCOL:
+                return PickleSerializer(self.pickle_protocol)
+        if isinstance(serializer, basestring):
+            return serializers[serializer]
+        return serializer
+
+    def _get_serializer_id(self):
+        """Return the id which _dumps stores with the serialized data."""
+        serializer = self.serializer
+        if not isinstance(serializer, basestring):
+            serializer = getattr(serializer, 'name',
+                                 serializer.__class__.__name__)
+        return ntob(serializer) + _ID_END
+
+    def _dumps(self, data):
+        """Return the given session data serialized (and maybe compressed)."""
+        s = self._get_serializer().dumps(data)
+        raw_size = len(s)
+        serializer_id = self._get_serializer_id()
+        if (self.compress_threshold is not None
+                and raw_size >= self.compress_threshold):
+            compressed = zlib.compress(s, self.compress_level)
+            if len(compressed) < raw_size:
+                s = _COMPRESSED + serializer_id + compressed
+                stats['Compressed Saves'] += 1
+            else:
+                s = _RAW + serializer_id + s
+        else:
+            s = _RAW + serializer_id + s
+        self.bytes_saved += len(s)
+        stats['Saves'] += 1
+        stats['Bytes Saved'] += len(s)
+        if self.debug:
+            cherrypy.log('Serialized session %r: %d bytes, %d stored.' %
+                         (self.id, raw_size, len(s)), 'TOOLS.SESSIONS')
+        return s
+
+    def _loads(self, s):
+        """Return session data from the output of _dumps.
+
+        Raise _UnreadableData if our serializer didn't write it, or can't
+        load it.
+        """
+        self.bytes_loaded += len(s)
+        stats['Loads'] += 1
+        stats['Bytes Loaded'] += len(s)
+        marker = s[:1]
+        serializer_id = self._get_serializer_id()
+        if marker in (_RAW, _COMPRESSED):
+            if not s.startswith(serializer_id, 1):
+                raise _UnreadableData("it was saved by another serializer")
+            s = s[1 + len(serializer_id):]
+            loads = self._get_serializer().loads
+        elif serializer_id == ntob('pickle') + _ID_END:
+            # Saved before serializers could be chosen.
+            loads = pickle.loads
+        else:
+            raise _UnreadableData("it is a bare pickle")
+
+        try:
+            if marker == _COMPRESSED:
+                s = zlib.decompress(s)
+            return loads(s)
+        except Exception:
+            raise _UnreadableData("%s: %s" % (sys.exc_info()[0].__name__,
+                                              sys.exc_info()[1]))
+
     def load(self):
         """Copy stored session data into this session instance."""
-        data = self._load()
+        try:
+            data = self._load()
+        except _UnreadableData:
+            cherrypy.log('Discarding the data of session %r: %s.' %
+                         (self.id, sys.exc_info()[1]), 'TOOLS.SESSIONS',
+                         severity=logging.WARNING)
+            data = None
         # data is either None or a tuple (session_data, expiration_time)
         if data is None or data[1] < self.now():
             if self.debug:
                 cherrypy.log('Expired session %r, flushing data.' % self.id,
                              'TOOLS.SESSIONS')
             self._data = {}
+            # Save even an empty session, so that its id is recognized.
+            self.dirty = True
         else:
             if self.debug:
                 cherrypy.log('Data loaded for session %r.' % self.id,
                              'TOOLS.SESSIONS')
             self._data = data[0]
+            self._expiration_time = data[1]
         self.loaded = True
 
         # Stick the clean_thread in the class, not the instance.
@@ -305,10 +580,12 @@ class Session(object):
     def __setitem__(self, key, value):
         if not self.loaded: self.load()
         self._data[key] = value
+        self.dirty = True
 
     def __delitem__(self, key):
         if not self.loaded: self.load()
         del self._data[key]
+        self.dirty = True
 
     def pop(self, key, default=missing):
         """Remove the specified key and return the corresponding value.
@@ -316,6 +593,8 @@ class Session(object):
         otherwise KeyError is raised.
         """
         if not self.loaded: self.load()
+        if key in self._data:
+            self.dirty = True
         if default is missing:
             return self._data.pop(key)
         else:
@@ -340,16 +619,20 @@ class Session(object):
         """D.update(E) -> None.  Update D from E: for k in E: D[k] = E[k]."""
         if not self.loaded: self.load()
         self._data.update(d)
+        self.dirty = True
 
     def setdefault(self, key, default=None):
         """D.setdefault(k[,d]) -> D.get(k,d), also set D[k]=d if k not in D."""
         if not self.loaded: self.load()
+        # The value returned is often changed in place, so assume it is.
+        self.dirty = True
         return self._data.setdefault(key, default)
 
     def clear(self):
         """D.clear() -> None.  Remove all items from D."""
         if not self.loaded: self.load()
         self._data.clear()
+        self.dirty = True
 
     def keys(self):
         """D.keys() -> list of D's keys."""
@@ -367,30 +650,179 @@ class Session(object):
         return self._data.values()
 
 
+class _RamShard(object):
+    """One shard of a RamStore, with its own lock and expiry heap."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}
+        # A heap of (expiration_time, id). Saving a session again pushes a
+        # new entry; the old one is skipped when it reaches the top.
+        self.expirations = []
+        # id: [RLock, number of acquirers], for session locks in use.
+        self.locks = {}
+        self.free_locks = []
+
+    def put(self, id, value):
+        self.lock.acquire()
+        try:
+            self.data[id] = value
+            heapq.heappush(self.expirations, (value[1], id))
+            if len(self.expirations) > 2 * len(self.data) + 64:
+                # Drop the entries of sessions since saved again or deleted.
+                self.expirations = [
+                    (e, i) for e, i in self.expirations
+                    if i in self.data and self.data[i][1] == e]
+                heapq.heapify(self.expirations)
+        finally:
+            self.lock.release()
+
+    def expire(self, now):
+        """Delete sessions which expire at or before now; return the count."""
+        count = 0
+        self.lock.acquire()
+        try:
+            expirations = self.expirations
+            while expirations and expirations[0][0] <= now:
+                expiration_time, id = heapq.heappop(expirations)
+                value = self.data.get(id)
+                if value is not None and value[1] <= now:
+                    del self.data[id]
+                    count += 1
+        finally:
+            self.lock.release()
+        return count
+
+    def get_lock(self, id):
+        """Return the RLock for the given session id, counting its user."""
+        self.lock.acquire()
+        try:
+            entry = self.locks.get(id)
+            if entry is None:
+                if self.free_locks:
+                    lock = self.free_locks.pop()
+                else:
+                    lock = threading.RLock()
+                entry = self.locks[id] = [lock, 0]
+            entry[1] += 1
+            return entry[0]
+        finally:
+            self.lock.release()
+
+    def put_lock(self, id):
+        """Stop counting a user of the given session's (released) RLock."""
+        self.lock.acquire()
+        try:
+            entry = self.locks[id]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self.locks[id]
+                if len(self.free_locks) < RamStore.max_free_locks:
+                    self.free_locks.append(entry[0])
+        finally:
+            self.lock.release()
+
+
+class RamStore(object):
+    """A dict-like map of session ids to (data, expiration_time) tuples.
+
+    Sessions are split across a number of shards by id, each with its own
+    lock, so that concurrent requests seldom wait on one another. Each
+    shard also keeps a heap of expiration times, so that expire() only
+    does work in proportion to the sessions which have expired, and hands
+    out the per-session locks, which are reused once no request holds or
+    waits for them.
+    """
+
+    max_free_locks = 100
+    "The number of unused session locks to keep, per shard, for reuse."
+
+    def __init__(self, shards=16):
+        self.shards = [_RamShard() for i in range(shards)]
+
+    def _shard(self, id):
+        return self.shards[hash(id) % len(self.shards)]
+
+    def __getitem__(self, id):
+        return self._shard(id).data[id]
+
+    def get(self, id, default=None):
+        return self._shard(id).data.get(id, default)
+
+    def __setitem__(self, id, value):
+        self._shard(id).put(id, value)
+
+    def __delitem__(self, id):
+        del self._shard(id).data[id]
+
+    def pop(self, id, *default):
+        return self._shard(id).data.pop(id, *default)
+
+    def __contains__(self, id):
+        return id in self._shard(id).data
+
+    def __len__(self):
+        return sum([len(shard.data) for shard in self.shards])
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        keys = []
+        for shard in self.shards:
+            keys.extend(list(shard.data.keys()))
+        return keys
+
+    def items(self):
+        items = []
+        for shard in self.shards:
+            items.extend(list(shard.data.items()))
+        return items
+
+    def clear(self):
+        for shard in self.shards:
+            shard.lock.acquire()
+            try:
+                shard.data.clear()
+                del shard.expirations[:]
+            finally:
+                shard.lock.release()
+
+    def expire(self, now):
+        """Delete sessions which expire at or before now; return the count."""
+        count = 0
+        for shard in self.shards:
+            count += shard.expire(now)
+        return count
+
+    def acquire(self, id):
+        """Acquire the lock for the given session id."""
+        self._shard(id).get_lock(id).acquire()
+
+    def release(self, id):
+        """Release the lock for the given session id."""
+        shard = self._shard(id)
+        shard.locks[id][0].release()
+        shard.put_lock(id)
+
+
 class RamSession(Session):
+    """Implementation of the RAM backend for sessions.
 
-    # Class-level objects. Don't rebind these!
-    cache = {}
-    locks = {}
+    Session data is kept in the class-level RamStore, cache. To use more
+    or fewer than its 16 shards, set RamSession.cache = RamStore(shards)
+    before the first request.
+    """
+
+    # Class-level object. Don't rebind it once serving!
+    cache = RamStore()
 
     def clean_up(self):
         """Clean up expired sessions."""
-        now = self.now()
-        for id, (data, expiration_time) in copyitems(self.cache):
-            if expiration_time <= now:
-                try:
-                    del self.cache[id]
-                except KeyError:
-                    pass
-                try:
-                    del self.locks[id]
-                except KeyError:
-                    pass
-
-        # added to remove obsolete lock objects
-        for id in list(self.locks):
-            if id not in self.cache:
-                self.locks.pop(id, None)
+        count = self.cache.expire(self.now())
+        if self.debug and count:
+            cherrypy.log('Deleted %d expired sessions.' % count,
+                         'TOOLS.SESSIONS')
 
     def _exists(self):
         return self.id in self.cache
@@ -407,11 +839,11 @@ class RamSession(Session):
     def acquire_lock(self):
         """Acquire an exclusive lock on the currently-loaded session data."""
         self.locked = True
-        self.locks.setdefault(self.id, threading.RLock()).acquire()
+        self.cache.acquire(self.id)
 
     def release_lock(self):
         """Release the lock on the currently-loaded session data."""
-        self.locks[self.id].release()
+        self.cache.release(self.id)
         self.locked = False
 
     def __len__(self):
@@ -427,15 +859,32 @@ class FileSession(Session):
         will be saved as pickle.dump(data, expiration_time) in its own file;
         the filename will be self.SESSION_PREFIX + self.id.
 
+    lock_method
+        'lockfile' (the default) to lock a session by creating
+        self.SESSION_PREFIX + self.id + self.LOCK_SUFFIX, polling until
+        any other holder removes it; or 'fcntl' to wait on an flock() of
+        the session file itself, which needs the fcntl module.
+
+    hashed_dirs
+        If True, put each session file in two levels of subfolders named
+        after the md5 of its id (such as 'ab/cd/'), rather than putting
+        them all in storage_path.
+
+    Session files are written to a temporary file which is then renamed,
+    so they are never seen half-written. The cleanup only reads session
+    files last saved more than self.timeout ago.
     """
 
     SESSION_PREFIX = 'session-'
     LOCK_SUFFIX = '.lock'
-    pickle_protocol = pickle.HIGHEST_PROTOCOL
+    TEMP_PREFIX = 'tmp-'
+    lock_method = 'lockfile'
+    hashed_dirs = False
 
     def __init__(self, id=None, **kwargs):
         # The 'storage_path' arg is required for file-based sessions.
         kwargs['storage_path'] = os.path.abspath(kwargs['storage_path'])
+        self._lock_fds = []
         Session.__init__(self, id=id, **kwargs)
 
     def setup(cls, **kwargs):
@@ -450,10 +899,14 @@ class FileSession(Session):
         for k, v in kwargs.items():
             setattr(cls, k, v)
 
+        if cls.lock_method == 'fcntl':
+            if fcntl is None:
+                raise ValueError("The 'fcntl' lock_method needs the fcntl "
+                                 "module, which is not available.")
+            return
+
         # Warn if any lock files exist at startup.
-        lockfiles = [fname for fname in os.listdir(cls.storage_path)
-                     if (fname.startswith(cls.SESSION_PREFIX)
-                         and fname.endswith(cls.LOCK_SUFFIX))]
+        lockfiles = cls._listdir(cls.LOCK_SUFFIX)
         if lockfiles:
             plural = ('', 's')[len(lockfiles) > 1]
             warn("%s session lockfile%s found at startup. If you are "
@@ -462,18 +915,87 @@ class FileSession(Session):
                  % (len(lockfiles), plural, cls.storage_path))
     setup = classmethod(setup)
 
+    def _listdir(cls, suffix=None, storage_path=None, hashed_dirs=None):
+        """Return the paths of all session files (or those with suffix).
+
+        The storage_path and hashed_dirs default to those of the class;
+        instances pass their own.
+        """
+        if storage_path is None:
+            storage_path = cls.storage_path
+        if hashed_dirs is None:
+            hashed_dirs = cls.hashed_dirs
+        dirs = [storage_path]
+        if hashed_dirs:
+            for level in range(2):
+                subdirs = []
+                for d in dirs:
+                    for name in os.listdir(d):
+                        path = os.path.join(d, name)
+                        if len(name) == 2 and os.path.isdir(path):
+                            subdirs.append(path)
+                dirs = subdirs
+
+        paths = []
+        for d in dirs:
+            for fname in os.listdir(d):
+                if not fname.startswith(cls.SESSION_PREFIX):
+                    continue
+                if suffix is None:
+                    if fname.endswith(cls.LOCK_SUFFIX):
+                        continue
+                elif not fname.endswith(suffix):
+                    continue
+                paths.append(os.path.join(d, fname))
+        return paths
+    _listdir = classmethod(_listdir)
+
+    def _session_paths(self):
+        """Return the paths of all session files in this session's store."""
+        return self._listdir(None, self.storage_path, self.hashed_dirs)
+
+    def _makedirs(self, dirname):
+        """Make the hashed folder dirname, if it doesn't exist yet."""
+        if self.hashed_dirs and not os.path.isdir(dirname):
+            try:
+                os.makedirs(dirname)
+            except OSError:
+                # Another thread or process may have just made it.
+                if not os.path.isdir(dirname):
+                    raise
+
     def _get_file_path(self):
-        f = os.path.join(self.storage_path, self.SESSION_PREFIX + self.id)
+        fname = self.SESSION_PREFIX + self.id
+        if self.hashed_dirs:
+            id = self.id
+            if isinstance(id, unicodestr):
+                id = id.encode('utf-8')
+            digest = md5(id).hexdigest()
+            f = os.path.join(self.storage_path, digest[:2], digest[2:4], fname)
+        else:
+            f = os.path.join(self.storage_path, fname)
         if not os.path.abspath(f).startswith(self.storage_path):
             raise cherrypy.HTTPError(400, "Invalid session id in cookie.")
         return f
 
     def _exists(self):
         path = self._get_file_path()
-        return os.path.exists(path)
+        try:
+            # An 'fcntl' lock creates an empty file before any data is saved.
+            return os.path.getsize(path) > 0
+        except OSError:
+            return False
 
     def _load(self, path=None):
         assert self.locked, "The session load without being locked.  Check your tools' priority levels."
+        contents = self._read(path)
+        if contents is not None and isinstance(contents[0], bytestr):
+            # Data saved before serializers could be chosen isn't bytes.
+            contents = (self._loads(contents[0]), contents[1])
+        return contents
+
+    def _read(self, path=None):
+        """Return the (serialized data, expiration_time) in the file or None."""
         if path is None:
             path = self._get_file_path()
         try:
@@ -490,11 +1012,35 @@ class FileSession(Session):
 
     def _save(self, expiration_time):
         assert self.locked, "The session was saved without being locked.  Check your tools' priority levels."
-        f = open(self._get_file_path(), "wb")
+        path = self._get_file_path()
+        dirname = os.path.dirname(path)
+        self._makedirs(dirname)
+
+        fd, temppath = tempfile.mkstemp(prefix=self.TEMP_PREFIX, dir=dirname)
+        f = os.fdopen(fd, "wb")
         try:
-            pickle.dump((self._data, expiration_time), f, self.pickle_protocol)
-        finally:
-            f.close()
+            try:
+                pickle.dump((self._dumps(self._data), expiration_time), f,
+                            pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                if self.lock_method == 'fcntl':
+                    # Lock the new file before it replaces the old one (whose
+                    # lock we still hold), and hold both until release_lock.
+                    lockfd = os.dup(fd)
+                    self._lock_fds.append(lockfd)
+                    fcntl.flock(lockfd, fcntl.LOCK_EX)
+            finally:
+                f.close()
+            try:
+                os.rename(temppath, path)
+            except OSError:
+                # Windows won't rename over an existing file.
+                os.remove(path)
+                os.rename(temppath, path)
+        except:
+            if os.path.exists(temppath):
+                os.remove(temppath)
+            raise
 
     def _delete(self):
         assert self.locked, "The session deletion without being locked.  Check your tools' priority levels."
@@ -503,64 +1049,481 @@ class FileSession(Session):
         except OSError:
             pass
 
+    def _flock(self, path, blocking=True):
+        """Return a descriptor of the file at path, flock()ed; or None.
+
+        If the file is replaced (or removed) while we wait for the lock,
+        lock the new file instead. If not blocking, return None if the file
+        is locked by someone else, or is missing.
+        """
+        mode = fcntl.LOCK_EX
+        if not blocking:
+            mode |= fcntl.LOCK_NB
+        while True:
+            if blocking:
+                fd = os.open(path, os.O_RDWR | os.O_CREAT,
+                             stat.S_IRUSR | stat.S_IWUSR)
+            else:
+                try:
+                    fd = os.open(path, os.O_RDWR)
+                except OSError:
+                    return None
+            try:
+                fcntl.flock(fd, mode)
+            except IOError:
+                os.close(fd)
+                return None
+            try:
+                current = os.stat(path)
+            except OSError:
+                current = None
+            opened = os.fstat(fd)
+            if (current is not None and current.st_ino == opened.st_ino
+                    and current.st_dev == opened.st_dev):
+                return fd
+            os.close(fd)
+            if not blocking:
+                return None
+
     def acquire_lock(self, path=None):
         """Acquire an exclusive lock on the currently-loaded session data."""
         if path is None:
             path = self._get_file_path()
-        path += self.LOCK_SUFFIX
-        while True:
-            try:
-                lockfd = os.open(path, os.O_CREAT|os.O_WRONLY|os.O_EXCL)
-            except OSError:
-                time.sleep(0.1)
-            else:
-                os.close(lockfd)
-                break
+        self._makedirs(os.path.dirname(path))
+        if self.lock_method == 'fcntl':
+            self._lock_fds.append(self._flock(path))
+        else:
+            path += self.LOCK_SUFFIX
+            while True:
+                try:
+                    lockfd = os.open(path, os.O_CREAT|os.O_WRONLY|os.O_EXCL)
+                except OSError:
+                    if sys.exc_info()[1].errno != errno.EEXIST:
+                        raise
+                    # Someone else holds the lock.
+                    time.sleep(0.1)
+                else:
+                    os.close(lockfd)
+                    break
         self.locked = True
         if self.debug:
             cherrypy.log('Lock acquired.', 'TOOLS.SESSIONS')
 
     def release_lock(self, path=None):
         """Release the lock on the currently-loaded session data."""
-        if path is None:
-            path = self._get_file_path()
-        os.unlink(path + self.LOCK_SUFFIX)
+        if self.lock_method == 'fcntl':
+            if path is None:
+                path = self._get_file_path()
+            # Don't leave behind the empty file made by locking a session
+            # which was never saved.
+            try:
+                current = os.stat(path)
+                opened = os.fstat(self._lock_fds[-1])
+                if (current.st_size == 0 and current.st_ino == opened.st_ino
+                        and current.st_dev == opened.st_dev):
+                    os.unlink(path)
+            except (OSError, IndexError):
+                pass
+            # Closing the descriptors releases their locks.
+            while self._lock_fds:
+                os.close(self._lock_fds.pop())
+        else:
+            if path is None:
+                path = self._get_file_path()
+            os.unlink(path + self.LOCK_SUFFIX)
         self.locked = False
 
     def clean_up(self):
         """Clean up expired sessions."""
         now = self.now()
-        # Iterate over all session files in self.storage_path
-        for fname in os.listdir(self.storage_path):
-            if (fname.startswith(self.SESSION_PREFIX)
-                and not fname.endswith(self.LOCK_SUFFIX)):
-                # We have a session file: lock and load it and check
-                #   if it's expired. If it fails, nevermind.
-                path = os.path.join(self.storage_path, fname)
-                self.acquire_lock(path)
-                if self.debug:
-                    # This is a bit of a hack, since we're calling clean_up
-                    # on the first instance rather than the entire class,
-                    # so depending on whether you have "debug" set on the
-                    # path of the first session called, this may not run.
-                    cherrypy.log('Cleanup lock acquired.', 'TOOLS.SESSIONS')
-
+        # Files saved since this are not expired (assuming the timeout they
+        # were saved with was no shorter), so don't bother loading them.
+        cutoff = time.time() - self.timeout * 60
+        for path in self._session_paths():
+            try:
+                if os.path.getmtime(path) > cutoff:
+                    continue
+            except OSError:
+                # Deleted since we listed it.
+                continue
+
+            if self.lock_method == 'fcntl':
+                # Skip sessions locked by a request: they are in use.
+                fd = self._flock(path, blocking=False)
+                if fd is None:
+                    continue
+                self.locked = True
                 try:
-                    contents = self._load(path)
-                    # _load returns None on IOError
-                    if contents is not None:
-                        data, expiration_time = contents
-                        if expiration_time < now:
-                            # Session expired: deleting it
-                            os.unlink(path)
+                    contents = self._read(path)
+                    if contents is not None and contents[1] < now:
+                        os.unlink(path)
+                    elif contents is None and os.path.getsize(path) == 0:
+                        # Locked, but never saved.
+                        os.unlink(path)
                 finally:
-                    self.release_lock(path)
+                    self.locked = False
+                    os.close(fd)
+                continue
+
+            # We have a session file: lock and load it and check
+            #   if it's expired. If it fails, nevermind.
+            self.acquire_lock(path)
+            if self.debug:
+                # This is a bit of a hack, since we're calling clean_up
+                # on the first instance rather than the entire class,
+                # so depending on whether you have "debug" set on the
+                # path of the first session called, this may not run.
+                cherrypy.log('Cleanup lock acquired.', 'TOOLS.SESSIONS')
+
+            try:
+                contents = self._read(path)
+                # _load returns None on IOError
+                if contents is not None:
+                    data, expiration_time = contents
+                    if expiration_time < now:
+                        # Session expired: deleting it
+                        os.unlink(path)
+            finally:
+                self.release_lock(path)
 
     def __len__(self):
         """Return the number of active sessions."""
-        return len([fname for fname in os.listdir(self.storage_path)
-                    if (fname.startswith(self.SESSION_PREFIX)
-                        and not fname.endswith(self.LOCK_SUFFIX))])
+        count = 0
+        for path in self._session_paths():
+            try:
+                if os.path.getsize(path) > 0:
+                    count += 1
+            except OSError:
+                pass
+        return count
+
+
+def _timestamp(dt):
+    """Return the given datetime as seconds since the epoch (local time)."""
+    return time.mktime(dt.timetuple()) + dt.microsecond / 1000000.0
+
+
+class SqliteSession(Session):
+    """Implementation of the SQLite backend for sessions.
+
+    Sessions are kept in a table in an SQLite database, which several
+    processes on one host can share. The database is put in WAL mode, so
+    that readers and the (one at a time) writer don't block each other.
+
+    database
+        The path of the database file. If not given, 'sessions.db' in
+        storage_path is used.
+
+    Each thread uses its own connection. The thread's connection is closed
+    when it publishes 'stop_thread' (as the ThreadManager does for a thread
+    which publishes 'release_thread'), and any others are closed when the
+    engine stops. A session is locked
+    by inserting a row into the session_lock table; requests in the same
+    process wait on a lock in memory, while those in other processes poll
+    every lock_poll seconds. Locks older than lock_timeout seconds are
+    assumed to belong to a dead process, and are broken.
+    """
+
+    database = None
+
+    lock_timeout = 300
+    "The number of seconds after which a session lock may be broken."
+
+    lock_poll = 0.01
+    "The number of seconds between attempts to lock a session locked elsewhere."
+
+    clean_batch = 500
+    "The number of expired sessions to delete per statement in clean_up."
+
+    # Class-level objects. Don't rebind these!
+    connections = {}
+    "A map of {thread ident: connection} pairs."
+
+    # Only the lock methods of this store are used, to lock sessions
+    # between threads before they contend (by polling) with other processes.
+    _thread_locks = RamStore()
+
+    _subscribed = False
+    "Whether setup has subscribed stop_thread and close_all to the engine."
+
+    def setup(cls, **kwargs):
+        """Set up the storage system for SQLite-based sessions.
+
+        This should only be called once per process; this will be done
+        automatically when using sessions.init (as the built-in Tool does).
+        """
+        for k, v in kwargs.items():
+            setattr(cls, k, v)
+
+        if sqlite3 is None:
+            raise ValueError("SqliteSession needs the sqlite3 module, "
+                             "which is not available.")
+        if cls.database is None:
+            storage_path = getattr(cls, 'storage_path', None)
+            if storage_path is None:
+                raise ValueError("SqliteSession needs a database (or a "
+                                 "storage_path to put sessions.db in).")
+            cls.database = os.path.join(storage_path, 'sessions.db')
+
+        db = sqlite3.connect(cls.database, isolation_level=None)
+        try:
+            db.execute('pragma journal_mode=wal')
+            db.execute('create table if not exists session ('
+                       'id text primary key, data blob, '
+                       'expiration_time real)')
+            db.execute('create index if not exists session_expiration '
+                       'on session (expiration_time)')
+            db.execute('create table if not exists session_lock ('
+                       'id text primary key, owner text, acquired real)')
+        finally:
+            db.close()
+
+        if not cls._subscribed:
+            cherrypy.engine.subscribe('stop_thread', cls.stop_thread)
+            cherrypy.engine.subscribe('stop', cls.close_all)
+            cls._subscribed = True
+    setup = classmethod(setup)
+
+    def stop_thread(cls, index=None):
+        """Close the connection of the current thread (if any)."""
+        cls._close(get_thread_ident())
+    stop_thread = classmethod(stop_thread)
+
+    def close_all(cls):
+        """Close all connections."""
+        for ident in list(cls.connections.keys()):
+            cls._close(ident)
+    close_all = classmethod(close_all)
+
+    def _close(cls, ident):
+        db = cls.connections.pop(ident, None)
+        if db is not None:
+            db.close()
+    _close = classmethod(_close)
+
+    def _get_db(self):
+        ident = get_thread_ident()
+        db = self.connections.get(ident)
+        if db is None:
+            # close_all may close the connection from another thread.
+            db = sqlite3.connect(self.database, isolation_level=None,
+                                 check_same_thread=False)
+            self.connections[ident] = db
+        return db
+    db = property(_get_db, doc="The connection for the current thread.")
+
+    def _exists(self):
+        cursor = self.db.execute('select 1 from session where id = ?',
+                                 (self.id,))
+        return cursor.fetchone() is not None
+
+    def _load(self):
+        cursor = self.db.execute('select data, expiration_time from session '
+                                 'where id = ?', (self.id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        data, expiration_time = row
+        return (self._loads(bytestr(data)),
+                datetime.datetime.fromtimestamp(expiration_time))
+
+    def _save(self, expiration_time):
+        data = self._dumps(self._data)
+        self.db.execute('insert or replace into session '
+                        '(id, data, expiration_time) values (?, ?, ?)',
+                        (self.id, sqlite3.Binary(data),
+                         _timestamp(expiration_time)))
+
+    def _touch(self, expiration_time):
+        self.db.execute('update session set expiration_time = ? '
+                        'where id = ?', (_timestamp(expiration_time), self.id))
+
+    def _delete(self):
+        self.db.execute('delete from session where id = ?', (self.id,))
+
+    def acquire_lock(self):
+        """Acquire an exclusive lock on the currently-loaded session data."""
+        self._thread_locks.acquire(self.id)
+        owner = '%s:%s' % (os.getpid(), get_thread_ident())
+        try:
+            while True:
+                now = time.time()
+                try:
+                    self.db.execute('insert into session_lock '
+                                    '(id, owner, acquired) values (?, ?, ?)',
+                                    (self.id, owner, now))
+                    break
+                except sqlite3.IntegrityError:
+                    # Locked by another process; break the lock if stale.
+                    self.db.execute('delete from session_lock where id = ? '
+                                    'and acquired < ?',
+                                    (self.id, now - self.lock_timeout))
+                    time.sleep(self.lock_poll)
+        except:
+            self._thread_locks.release(self.id)
+            raise
+        self._lock_owner = owner
+        self.locked = True
+        if self.debug:
+            cherrypy.log('Lock acquired.', 'TOOLS.SESSIONS')
+
+    def release_lock(self):
+        """Release the lock on the currently-loaded session data."""
+        try:
+            self.db.execute('delete from session_lock '
+                            'where id = ? and owner = ?',
+                            (self.id, self._lock_owner))
+        finally:
+            self._thread_locks.release(self.id)
+            self.locked = False
+
+    def clean_up(self):
+        """Clean up expired sessions."""
+        now = _timestamp(self.now())
+        count = self.clean_batch
+        while count == self.clean_batch:
+            # Delete in batches, so as not to hold the write lock for long.
+            cursor = self.db.execute(
+                'delete from session where rowid in (select rowid from '
+                'session where expiration_time < ? limit ?)',
+                (now, self.clean_batch))
+            count = cursor.rowcount
+        self.db.execute('delete from session_lock where acquired < ?',
+                        (time.time() - self.lock_timeout,))
+
+    def __len__(self):
+        """Return the number of active sessions."""
+        return self.db.execute('select count(*) from session').fetchone()[0]
+
+
+class ClientPool(object):
+    """A bounded, thread-safe pool of clients, such as database connections.
+
+    create
+        A callable which returns a new client.
+
+    check
+        An optional callable which is passed an idle client as it is
+        checked out, and returns False if it is no longer usable.
+
+    close
+        An optional callable which disposes of a client.
+
+    maxsize
+        The greatest number of clients (idle or checked out) at once.
+        Beyond that, checkout waits for a client to be checked in.
+
+    max_idle
+        The number of seconds an idle client may be kept; older ones are
+        closed rather than checked out. If 0 or None, keep them forever.
+
+    timeout
+        The number of seconds checkout waits for a client, before raising
+        RuntimeError. If None (the default), wait forever.
+    """
+
+    def __init__(self, create, check=None, close=None, maxsize=10,
+                 max_idle=300, timeout=None):
+        self.create = create
+        self.check = check
+        self.close = close
+        self.maxsize = maxsize
+        self.max_idle = max_idle
+        self.timeout = timeout
+        # (client, time of checkin) pairs, most recently used last.
+        self.idle = []
+        # The number of clients, whether idle or checked out.
+        self.size = 0
+        self._cond = threading.Condition(threading.Lock())
+
+    def checkout(self):
+        """Return an idle client, or a new one if there are none."""
+        while True:
+            client, stale = self._take()
+            for c in stale:
+                self._close(c)
+            if client is missing:
+                try:
+                    return self.create()
+                except:
+                    self._forget()
+                    raise
+            if self.check is None or self.check(client):
+                return client
+            self.discard(client)
+
+    def _take(self):
+        """Return (an idle client or missing, a list of stale clients)."""
+        stale = []
+        deadline = None
+        self._cond.acquire()
+        try:
+            while True:
+                now = time.time()
+                if self.max_idle:
+                    while self.idle and now - self.idle[0][1] > self.max_idle:
+                        stale.append(self.idle.pop(0)[0])
+                        self.size -= 1
+                if self.idle:
+                    return self.idle.pop()[0], stale
+                if self.size < self.maxsize:
+                    # Reserve a place for a new client.
+                    self.size += 1
+                    return missing, stale
+
+                if self.timeout is None:
+                    self._cond.wait()
+                else:
+                    if deadline is None:
+                        deadline = now + self.timeout
+                    elif now >= deadline:
+                        raise RuntimeError("Timed out waiting for a client "
+                                           "from the pool.")
+                    self._cond.wait(deadline - now)
+        finally:
+            self._cond.release()
+
+    def checkin(self, client):
+        """Return the given (checked out) client to the pool."""
+        self._cond.acquire()
+        try:
+            self.idle.append((client, time.time()))
+            self._cond.notify()
+        finally:
+            self._cond.release()
+
+    def discard(self, client):
+        """Close the given (checked out) client rather than reuse it."""
+        self._forget()
+        self._close(client)
+
+    def clear(self):
+        """Close all idle clients."""
+        self._cond.acquire()
+        try:
+            idle, self.idle = self.idle, []
+            self.size -= len(idle)
+            self._cond.notify_all()
+        finally:
+            self._cond.release()
+        for client, since in idle:
+            self._close(client)
+
+    def _forget(self):
+        self._cond.acquire()
+        try:
+            self.size -= 1
+            self._cond.notify()
+        finally:
+            self._cond.release()
+
+    def _close(self, client):
+        if self.close is not None:
+            try:
+                self.close(client)
+            except Exception:
+                # The client is being thrown away, likely as broken.
+                pass
 
 
 class PostgresqlSession(Session):
@@ -569,18 +1532,38 @@ class PostgresqlSession(Session):
 
             create table session (
                 id varchar(40),
-                data text,
+                data bytea,
                 expiration_time timestamp
             )
 
-    You must provide your own get_db function.
+    The data column holds serialized (and maybe compressed) bytes, so it
+    must be binary. A table made with the 'data text' column of earlier
+    versions must be migrated, for instance with::
+
+        alter table session alter column data type bytea
+            using convert_to(data, 'UTF8');
+
+    after which its rows still load with the 'pickle' serializer (or
+    simply delete them, logging everyone out).
+
+    You must provide your own get_db function, which returns a new DB-API
+    connection. Connections are kept in a ClientPool (of pool_size, closed
+    after pool_max_idle seconds unused); each request checks one out as it
+    first uses the session, and checks it in when it releases its lock.
     """
 
-    pickle_protocol = pickle.HIGHEST_PROTOCOL
+    pool = None
+    "The class-level ClientPool of connections, made by setup."
+
+    pool_size = 10
+    "The greatest number of connections at once."
+
+    pool_max_idle = 300
+    "The number of seconds after which an unused connection is closed."
 
     def __init__(self, id=None, **kwargs):
+        self._db = None
         Session.__init__(self, id, **kwargs)
-        self.cursor = self.db.cursor()
 
     def setup(cls, **kwargs):
         """Set up the storage system for Postgres-based sessions.
@@ -591,13 +1574,45 @@ class PostgresqlSession(Session):
         for k, v in kwargs.items():
             setattr(cls, k, v)
 
-        self.db = self.get_db()
+        # A get_db function set on the class would become a method.
+        get_db = kwargs.get('get_db') or cls.get_db
+        cls.pool = ClientPool(get_db, check=cls._check_db,
+                              close=cls._close_db, maxsize=cls.pool_size,
+                              max_idle=cls.pool_max_idle)
     setup = classmethod(setup)
 
+    def _check_db(db):
+        return not getattr(db, 'closed', False)
+    _check_db = staticmethod(_check_db)
+
+    def _close_db(db):
+        db.close()
+    _close_db = staticmethod(_close_db)
+
+    def _get_cursor(self):
+        if self._db is None:
+            self._db = self.pool.checkout()
+            self._cursor = self._db.cursor()
+        return self._cursor
+    cursor = property(_get_cursor,
+                      doc="A cursor of the connection checked out for this session.")
+
+    def _checkin(self):
+        """Commit, and return the connection (if any) to the pool."""
+        db, self._db = self._db, None
+        if db is None:
+            return
+        try:
+            self._cursor.close()
+            db.commit()
+        except Exception:
+            self.pool.discard(db)
+            raise
+        self.pool.checkin(db)
+
     def __del__(self):
-        if self.cursor:
-            self.cursor.close()
-        self.db.commit()
+        if self._db is not None:
+            self._checkin()
 
     def _exists(self):
         # Select session data from table
@@ -614,15 +1629,22 @@ class PostgresqlSession(Session):
         if not rows:
             return None
 
-        pickled_data, expiration_time = rows[0]
-        data = pickle.loads(pickled_data)
-        return data, expiration_time
+        data, expiration_time = rows[0]
+        return self._loads(bytestr(data)), expiration_time
 
     def _save(self, expiration_time):
-        pickled_data = pickle.dumps(self._data, self.pickle_protocol)
+        data = self._dumps(self._data)
         self.cursor.execute('update session set data = %s, '
                             'expiration_time = %s where id = %s',
-                            (pickled_data, expiration_time, self.id))
+                            (data, expiration_time, self.id))
+        if self.cursor.rowcount == 0:
+            self.cursor.execute('insert into session (id, data, '
+                                'expiration_time) values (%s, %s, %s)',
+                                (self.id, data, expiration_time))
+
+    def _touch(self, expiration_time):
+        self.cursor.execute('update session set expiration_time = %s '
+                            'where id = %s', (expiration_time, self.id))
 
     def _delete(self):
         self.cursor.execute('delete from session where id=%s', (self.id,))
@@ -638,22 +1660,42 @@ class PostgresqlSession(Session):
 
     def release_lock(self):
         """Release the lock on the currently-loaded session data."""
-        # We just close the cursor and that will remove the lock
+        # Committing ends the transaction, which removes the lock
         #   introduced by the "for update" clause
-        self.cursor.close()
         self.locked = False
+        self._checkin()
 
     def clean_up(self):
         """Clean up expired sessions."""
-        self.cursor.execute('delete from session where expiration_time < %s',
-                            (self.now(),))
+        # This runs in the cleanup thread, so it uses a connection of its
+        # own; a request may still hold the one checked out for this session.
+        db = self.pool.checkout()
+        try:
+            cursor = db.cursor()
+            try:
+                cursor.execute('delete from session where expiration_time < %s',
+                               (self.now(),))
+            finally:
+                cursor.close()
+            db.commit()
+        except Exception:
+            self.pool.discard(db)
+            raise
+        self.pool.checkin(db)
 
 
 class MemcachedSession(Session):
 
-    # The most popular memcached client for Python isn't thread-safe.
-    # Wrap all .get and .set operations in a single lock.
-    mc_lock = threading.RLock()
+    # The most popular memcached client for Python isn't thread-safe,
+    # so each thread checks one out of a pool for each operation.
+    pool = None
+    "The class-level ClientPool of memcache.Client objects, made by setup."
+
+    pool_size = 10
+    "The greatest number of clients at once."
+
+    pool_max_idle = 300
+    "The number of seconds after which an unused client is closed."
 
     # This is a seperate set of locks per session id.
     locks = {}
@@ -670,7 +1712,12 @@ class MemcachedSession(Session):
             setattr(cls, k, v)
 
         import memcache
-        cls.cache = memcache.Client(cls.servers)
+        def create():
+            return memcache.Client(cls.servers)
+        def close(client):
+            client.disconnect_all()
+        cls.pool = ClientPool(create, close=close, maxsize=cls.pool_size,
+                              max_idle=cls.pool_max_idle)
     setup = classmethod(setup)
 
     def _get_id(self):
@@ -686,32 +1733,36 @@ class MemcachedSession(Session):
             o(value)
     id = property(_get_id, _set_id, doc="The current session ID.")
 
-    def _exists(self):
-        self.mc_lock.acquire()
+    def _call(self, method, *args):
+        """Call the given method of a pooled client with the given args."""
+        client = self.pool.checkout()
         try:
-            return bool(self.cache.get(self.id))
-        finally:
-            self.mc_lock.release()
+            result = getattr(client, method)(*args)
+        except:
+            self.pool.discard(client)
+            raise
+        self.pool.checkin(client)
+        return result
+
+    def _exists(self):
+        return bool(self._call('get', self.id))
 
     def _load(self):
-        self.mc_lock.acquire()
-        try:
-            return self.cache.get(self.id)
-        finally:
-            self.mc_lock.release()
+        contents = self._call('get', self.id)
+        if contents is not None and isinstance(contents[0], bytestr):
+            # Data saved before serializers could be chosen isn't bytes.
+            contents = (self._loads(contents[0]), contents[1])
+        return contents
 
     def _save(self, expiration_time):
         # Send the expiration time as "Unix time" (seconds since 1/1/1970)
         td = int(time.mktime(expiration_time.timetuple()))
-        self.mc_lock.acquire()
-        try:
-            if not self.cache.set(self.id, (self._data, expiration_time), td):
-                raise AssertionError("Session data for id %r not set." % self.id)
-        finally:
-            self.mc_lock.release()
+        data = self._dumps(self._data)
+        if not self._call('set', self.id, (data, expiration_time), td):
+            raise AssertionError("Session data for id %r not set." % self.id)
 
     def _delete(self):
-        self.cache.delete(self.id)
+        self._call('delete', self.id)
 
     def acquire_lock(self):
         """Acquire an exclusive lock on the currently-loaded session data."""
@@ -775,7 +1826,7 @@ def init(storage_type='ram', path=None, path_header=None, name='session_id',
     """Initialize session object (using cookies).
 
     storage_type
-        One of 'ram', 'file', 'postgresql', 'memcached'. This will be
+        One of 'ram', 'file', 'sqlite', 'postgresql', 'memcached'. This will be
         used to look up the corresponding class in cherrypy.lib.sessions
         globals. For example, 'file' will use the FileSession class.
 
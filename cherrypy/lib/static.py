@@ -18,6 +18,21 @@ import time
 import cherrypy
 from cherrypy._cpcompat import ntob, unquote
 from cherrypy.lib import cptools, httputil, file_generator_limited
+from cherrypy.lib import set_vary_header
+
+
+# Counts of requests (which accept gzip) for which tools.staticdir or
+# tools.staticfile, with precompressed on, found or lacked a fresh .gz file.
+precompressed_stats = {'hits': 0, 'misses': 0}
+
+
+def _guess_type(path):
+    """Return the Content-Type for the given path's extension, or None."""
+    ext = ""
+    i = path.rfind('.')
+    if i != -1:
+        ext = path[i:].lower()
+    return mimetypes.types_map.get(ext, None)
 
 
 def serve_file(path, content_type=None, disposition=None, name=None, debug=False):
@@ -67,11 +82,7 @@ def serve_file(path, content_type=None, disposition=None, name=None, debug=False
 
     if content_type is None:
         # Set content-type based on filename extension
-        ext = ""
-        i = path.rfind('.')
-        if i != -1:
-            ext = path[i:].lower()
-        content_type = mimetypes.types_map.get(ext, None)
+        content_type = _guess_type(path)
     if content_type is not None:
         response.headers['Content-Type'] = content_type
     if debug:
@@ -232,7 +243,54 @@ def serve_download(path, name=None):
     return serve_file(path, "application/x-download", "attachment", name)
 
 
-def _attempt(filename, content_types, debug=False):
+def _accepts_gzip():
+    """Return True if the request's Accept-Encoding prefers gzip."""
+    # The same rules as cherrypy.lib.encoding.gzip.
+    for coding in cherrypy.serving.request.headers.elements('Accept-Encoding'):
+        if coding.value == 'identity' and coding.qvalue != 0:
+            return False
+        if coding.value in ('gzip', 'x-gzip'):
+            return coding.qvalue != 0
+    return False
+
+def _serve_precompressed(path, content_type, debug=False):
+    """Serve path + '.gz' if it is acceptable and no older than path.
+
+    Return True if served, False if path itself should be served.
+    """
+    set_vary_header(cherrypy.serving.response, "Accept-Encoding")
+    if not _accepts_gzip():
+        return False
+
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    if stat.S_ISDIR(st.st_mode):
+        return False
+
+    gzpath = path + '.gz'
+    if content_type is None:
+        content_type = _guess_type(path)
+    try:
+        fresh = (content_type is not None and
+                 os.stat(gzpath).st_mtime >= st.st_mtime)
+    except OSError:
+        fresh = False
+    if not fresh:
+        if debug:
+            cherrypy.log('No fresh %r' % gzpath, 'TOOLS.STATIC')
+        precompressed_stats['misses'] += 1
+        return False
+
+    if debug:
+        cherrypy.log('Serving precompressed %r' % gzpath, 'TOOLS.STATIC')
+    precompressed_stats['hits'] += 1
+    serve_file(gzpath, content_type=content_type, debug=debug)
+    cherrypy.serving.response.headers['Content-Encoding'] = 'gzip'
+    return True
+
+def _attempt(filename, content_types, debug=False, precompressed=False):
     if debug:
         cherrypy.log('Attempting %r (content_types %r)' %
                      (filename, content_types), 'TOOLS.STATICDIR')
@@ -243,6 +301,9 @@ def _attempt(filename, content_types, debug=False):
         if content_types:
             r, ext = os.path.splitext(filename)
             content_type = content_types.get(ext[1:], None)
+        if precompressed and _serve_precompressed(filename, content_type,
+                                                  debug=debug):
+            return True
         serve_file(filename, content_type=content_type, debug=debug)
         return True
     except cherrypy.NotFound:
@@ -253,7 +314,7 @@ def _attempt(filename, content_types, debug=False):
         return False
 
 def staticdir(section, dir, root="", match="", content_types=None, index="",
-              debug=False):
+              debug=False, precompressed=False):
     """Serve a static resource from the given (root +) dir.
 
     match
@@ -271,6 +332,10 @@ def staticdir(section, dir, root="", match="", content_types=None, index="",
         serve for directory requests. For example, if the dir argument is
         '/home/me', the Request-URI is 'myapp', and the index arg is
         'index.html', the file '/home/me/myapp/index.html' will be sought.
+
+    precompressed
+        If True, and the request accepts gzip, serve the file's gzipped
+        sibling (its name plus ".gz") instead, if it exists and is no older.
     """
     request = cherrypy.serving.request
     if request.method not in ('GET', 'HEAD'):
@@ -316,16 +381,18 @@ def staticdir(section, dir, root="", match="", content_types=None, index="",
     if not os.path.normpath(filename).startswith(os.path.normpath(dir)):
         raise cherrypy.HTTPError(403) # Forbidden
 
-    handled = _attempt(filename, content_types)
+    handled = _attempt(filename, content_types, precompressed=precompressed)
     if not handled:
         # Check for an index file if a folder was requested.
         if index:
-            handled = _attempt(os.path.join(filename, index), content_types)
+            handled = _attempt(os.path.join(filename, index), content_types,
+                               precompressed=precompressed)
             if handled:
                 request.is_index = filename[-1] in (r"\/")
     return handled
 
-def staticfile(filename, root=None, match="", content_types=None, debug=False):
+def staticfile(filename, root=None, match="", content_types=None, debug=False,
+               precompressed=False):
     """Serve a static resource from the given (root +) filename.
 
     match
@@ -338,6 +405,9 @@ def staticfile(filename, root=None, match="", content_types=None, debug=False):
         a string (e.g. "gif") and 'content-type' is the value to write
         out in the Content-Type response header (e.g. "image/gif").
 
+    precompressed
+        If True, and the request accepts gzip, serve the file's gzipped
+        sibling (its name plus ".gz") instead, if it exists and is no older.
     """
     request = cherrypy.serving.request
     if request.method not in ('GET', 'HEAD'):
@@ -360,4 +430,5 @@ def staticfile(filename, root=None, match="", content_types=None, debug=False):
             raise ValueError(msg)
         filename = os.path.join(root, filename)
 
-    return _attempt(filename, content_types, debug=debug)
+    return _attempt(filename, content_types, debug=debug,
+                    precompressed=precompressed)
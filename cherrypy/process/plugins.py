@@ -400,6 +400,7 @@ class PIDFile(SimplePlugin):
         SimplePlugin.__init__(self, bus)
         self.pidfile = pidfile
         self.finalized = False
+        self.pid = None
 
     def start(self):
         pid = os.getpid()
@@ -409,9 +410,13 @@ class PIDFile(SimplePlugin):
             open(self.pidfile, "wb").write(ntob("%s\n" % pid, 'utf8'))
             self.bus.log('PID %r written to %r.' % (pid, self.pidfile))
             self.finalized = True
+            self.pid = pid
     start.priority = 70
 
     def exit(self):
+        if self.pid is not None and self.pid != os.getpid():
+            # A forked child (e.g. a worker process) must leave it alone.
+            return
         try:
             os.remove(self.pidfile)
             self.bus.log('PID file removed: %r.' % self.pidfile)
@@ -421,6 +426,229 @@ class PIDFile(SimplePlugin):
             pass
 
 
+def _cpu_count():
+    try:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+    except (ImportError, NotImplementedError):
+        return 1
+
+
+class WorkerProcesses(SimplePlugin):
+    """Serve from several forked worker processes, supervised by this one.
+
+    Use this with a Web Site Process Bus via::
+
+        cherrypy.server.reuse_port = True
+        WorkerProcesses(bus, processes=4, servers=[cherrypy.server]).subscribe()
+
+    The given servers (:class:`ServerAdapters<cherrypy.process.servers.ServerAdapter>`)
+    are unsubscribed from this (the master) process and started only in the
+    workers, which each bind the same port using SO_REUSEPORT. The workers
+    are forked when the bus starts, after the Daemonizer and PIDFile plugins
+    but before DropPrivileges; Monitor threads started before that point
+    (such as the Autoreloader) run in the master only.
+
+    The master restarts any worker which dies, and relays graceful and
+    stop/exit to the workers as SIGUSR1 and SIGTERM; a SIGHUP to the master
+    therefore restarts the whole process group (when daemonized). Workers
+    exit by themselves if the master goes away. Availability: Unix; on other
+    platforms the servers are simply started in this process.
+    """
+
+    frequency = 1
+    """The interval in seconds at which to look for dead workers (in the
+    master) or a dead master (in the workers)."""
+
+    shutdown_timeout = 5
+    """The number of seconds to wait for workers to exit before killing them."""
+
+    def __init__(self, bus, processes=None, servers=None):
+        SimplePlugin.__init__(self, bus)
+        if processes is None:
+            processes = _cpu_count()
+        self.processes = processes
+        self.servers = list(servers or [])
+        self.children = set()
+        self.master_pid = None
+        self.worker = False
+        self.thread = None
+
+    def subscribe(self):
+        """Register this object on the bus, in place of self.servers."""
+        SimplePlugin.subscribe(self)
+        for server in self.servers:
+            server.unsubscribe()
+
+    def unsubscribe(self):
+        """Unregister this object from the bus and restore self.servers."""
+        SimplePlugin.unsubscribe(self)
+        for server in self.servers:
+            server.subscribe()
+
+    def start(self):
+        """Fork the worker processes, then supervise them."""
+        if self.worker:
+            return
+        if not hasattr(os, 'fork'):
+            self.bus.log('os.fork not available; serving from a single '
+                         'process.', level=30)
+            for server in self.servers:
+                server.subscribe()
+                server.start()
+            return
+
+        self.master_pid = os.getpid()
+        while len(self.children) < self.processes:
+            if self.spawn():
+                # We are a worker; the rest of the start listeners
+                # run in this process as usual.
+                return
+
+        self.thread = BackgroundTask(self.frequency, self.reap, bus=self.bus)
+        self.thread.setName('CP WorkerProcesses')
+        self.thread.start()
+        self.bus.log('Supervising %d worker processes.' % len(self.children))
+    # After Daemonizer and PIDFile, which belong to the master,
+    # but before server.start and DropPrivileges.
+    start.priority = 72
+
+    def spawn(self):
+        """Fork a new worker. Return True in the worker, False in the master."""
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid:
+            self.children.add(pid)
+            self.bus.log('Started worker process %r.' % pid)
+            return False
+
+        self.worker = True
+        self.children = set()
+        try:
+            # Only the master restarts (via execv); it then replaces us.
+            _signal.signal(_signal.SIGHUP, _signal.SIG_IGN)
+        except (AttributeError, ValueError):
+            pass
+
+        for server in self.servers:
+            server.subscribe()
+            server.start()
+
+        self.thread = BackgroundTask(self.frequency, self.check_master,
+                                     bus=self.bus)
+        self.thread.setName('CP WorkerProcesses')
+        self.thread.start()
+        return True
+
+    def reap(self):
+        """Collect dead workers and replace them while the bus is started."""
+        for pid in list(self.children):
+            try:
+                wpid, status = os.waitpid(pid, os.WNOHANG)
+            except OSError:
+                wpid, status = pid, None
+            if not wpid:
+                continue
+
+            self.children.discard(pid)
+            if self.bus.state != self.bus.states.STARTED:
+                continue
+            self.bus.log('Worker process %r died (status %r). Restarting.' %
+                         (pid, status), level=30)
+            if self.spawn():
+                # We are a new worker, forked from the master's reaper
+                # thread (which is now our main thread). Finish starting,
+                # run until the bus exits, and never return into the
+                # master's loop.
+                try:
+                    self._start_respawned()
+                    self.bus.block()
+                finally:
+                    os._exit(0)
+
+    def _start_respawned(self):
+        """Run the start listeners which follow ours in a respawned worker.
+
+        The first workers are forked from bus.start, which goes on to run
+        them (DropPrivileges, for one) in each worker; reap forks from our
+        thread instead, so it must run them itself.
+        """
+        bus = self.bus
+        done = [self.start] + [server.start for server in self.servers]
+        items = []
+        for listener in bus.listeners.get('start', ()):
+            priority = bus._priorities.get(('start', listener),
+                                           getattr(listener, 'priority', 50))
+            if priority > self.start.priority and listener not in done:
+                items.append((priority, listener))
+        items.sort(key=lambda item: item[0])
+
+        bus.state = bus.states.STARTING
+        try:
+            for priority, listener in items:
+                listener()
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except:
+            bus.log("Shutting down due to error in start listener:",
+                    level=40, traceback=True)
+            bus.exit()
+            return
+        bus.state = bus.states.STARTED
+        bus.log('Bus STARTED')
+
+    def check_master(self):
+        """Exit this worker if the master process has gone away."""
+        if os.getppid() != self.master_pid:
+            self.bus.log('Master process %r is gone. Exiting.' %
+                         self.master_pid, level=30)
+            self.bus.exit()
+
+    def _signal_children(self, signum):
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signum)
+            except OSError:
+                self.children.discard(pid)
+
+    def stop(self):
+        """Stop our thread, then stop the workers (if we are the master)."""
+        if self.thread is not None:
+            self.thread.cancel()
+            if self.thread is not threading.currentThread():
+                self.thread.join()
+            self.thread = None
+
+        if not self.children:
+            return
+        self.bus.log('Stopping %d worker processes.' % len(self.children))
+        self._signal_children(_signal.SIGTERM)
+        endtime = time.time() + self.shutdown_timeout
+        while self.children and time.time() < endtime:
+            for pid in list(self.children):
+                try:
+                    wpid, status = os.waitpid(pid, os.WNOHANG)
+                except OSError:
+                    wpid = pid
+                if wpid:
+                    self.children.discard(pid)
+            time.sleep(.1)
+
+        for pid in list(self.children):
+            self.bus.log('Killing worker process %r.' % pid, level=30)
+            try:
+                os.kill(pid, _signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except OSError:
+                pass
+        self.children.clear()
+
+    def graceful(self):
+        """Ask the workers to reload."""
+        self._signal_children(getattr(_signal, 'SIGUSR1', _signal.SIGTERM))
+
+
 class PerpetualTimer(Timer):
     """A responsive subclass of threading.Timer whose run() method repeats.
 
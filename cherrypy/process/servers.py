@@ -163,7 +163,11 @@ class ServerAdapter(object):
             raise ValueError("No HTTP server has been created.")
 
         # Start the httpserver in a new thread.
-        if isinstance(self.bind_addr, tuple):
+        fd = self._inherited_socket()
+        if fd is not None:
+            self.httpserver.bind_fd = fd
+            self.bus.log("Taking over the listening socket (fd %s)" % fd)
+        elif isinstance(self.bind_addr, tuple) and not self._shares_port():
             wait_for_free_port(*self.bind_addr)
 
         import threading
@@ -176,6 +180,37 @@ class ServerAdapter(object):
         self.bus.log("Serving on %s" % on_what)
     start.priority = 75
 
+    def _socket_key(self):
+        """Return the key under which the bus passes our listening socket."""
+        if self.bind_addr is None or not hasattr(self.httpserver, 'bind_fd'):
+            # Only servers with a bind_fd attribute can take one over.
+            return None
+        if isinstance(self.bind_addr, tuple):
+            return "%s:%s" % self.bind_addr
+        return self.bind_addr
+
+    def _inherited_socket(self):
+        """Return the fd of the listening socket passed over execv, or None."""
+        key = self._socket_key()
+        if key is None:
+            return None
+        return self.bus.inherited_fd(key)
+
+    def _pass_socket(self):
+        """If the bus is about to execv, pass our listening socket along.
+
+        Return True if the new process will take it over.
+        """
+        key = self._socket_key()
+        sock = getattr(self.httpserver, 'socket', None)
+        if not self.bus.execv or key is None or sock is None:
+            return False
+        return self.bus.pass_fd(key, sock.fileno())
+
+    def _shares_port(self):
+        # With SO_REUSEPORT, other processes may hold the port all along.
+        return getattr(self.httpserver, 'reuse_port', False)
+
     def _get_base(self):
         if not self.httpserver:
             return ''
@@ -231,10 +266,13 @@ class ServerAdapter(object):
     def stop(self):
         """Stop the HTTP server."""
         if self.running:
+            passed = self._pass_socket()
             # stop() MUST block until the server is *truly* stopped.
             self.httpserver.stop()
-            # Wait for the socket to be truly freed.
-            if isinstance(self.bind_addr, tuple):
+            # Wait for the socket to be truly freed (unless we're keeping
+            # it open for the process which replaces us).
+            if (isinstance(self.bind_addr, tuple) and not self._shares_port()
+                and not passed):
                 wait_for_free_port(*self.bind_addr)
             self.running = False
             self.bus.log("HTTP Server %s shut down" % self.httpserver)
@@ -128,6 +128,7 @@ states.EXITING = states.State()
 try:
     import fcntl
 except ImportError:
+    fcntl = None
     max_files = 0
 else:
     try:
@@ -136,6 +137,34 @@ else:
         max_files = 1024
 
 
+# The environment variable in which _do_execv() lists the file descriptors
+# which the new process inherits, as comma-separated "fd=key" entries.
+# Keys (such as AF_UNIX socket paths) may contain ',' or '=', so they are
+# escaped with _quote_key.
+PASSED_FDS_ENV = 'CHERRYPY_PASSED_FDS'
+
+def _quote_key(key):
+    """Escape '%', ',' and '=' in the given key for PASSED_FDS_ENV."""
+    return key.replace('%', '%25').replace(',', '%2C').replace('=', '%3D')
+
+def _unquote_key(key):
+    """Undo _quote_key."""
+    return key.replace('%2C', ',').replace('%3D', '=').replace('%25', '%')
+
+def _inherited_fds():
+    """Return the {key: fd} dict which _do_execv() passed to this process."""
+    fds = {}
+    value = os.environ.pop(PASSED_FDS_ENV, '')
+    for entry in value.split(','):
+        if '=' in entry:
+            fd, key = entry.split('=', 1)
+            try:
+                fds[_unquote_key(key)] = int(fd)
+            except ValueError:
+                pass
+    return fds
+
+
 class Bus(object):
     """Process state-machine and messenger for HTTP site deployment.
 
@@ -154,10 +183,17 @@ class Bus(object):
     def __init__(self):
         self.execv = False
         self.state = states.STOPPED
+        # key: fd, to pass to the process which _do_execv() starts.
+        self.passed_fds = {}
+        # key: fd, passed to this process by the one it replaced.
+        self.inherited_fds = _inherited_fds()
         self.listeners = dict(
             [(channel, set()) for channel
              in ('start', 'stop', 'exit', 'graceful', 'log', 'main')])
         self._priorities = {}
+        # channel: (listeners set, its length, listeners sorted by priority).
+        # Rebuilt by subscribe and unsubscribe; publish only iterates it.
+        self._sorted = {}
 
     def subscribe(self, channel, callback, priority=None):
         """Add the given callback at the given channel (if not present)."""
@@ -168,6 +204,7 @@ class Bus(object):
         if priority is None:
             priority = getattr(callback, 'priority', 50)
         self._priorities[(channel, callback)] = priority
+        self._sort(channel)
 
     def unsubscribe(self, channel, callback):
         """Discard the given callback (if present)."""
@@ -175,24 +212,49 @@ class Bus(object):
         if listeners and callback in listeners:
             listeners.discard(callback)
             del self._priorities[(channel, callback)]
+            self._sort(channel)
 
-    def publish(self, channel, *args, **kwargs):
-        """Return output of all subscribers for the given channel."""
-        if channel not in self.listeners:
-            return []
+    def _sort(self, channel):
+        """Store and return a tuple of the channel's listeners, by priority.
 
-        exc = ChannelFailures()
-        output = []
-
-        items = [(self._priorities[(channel, listener)], listener)
-                 for listener in self.listeners[channel]]
+        The tuple is replaced, never mutated, so a publish in progress in
+        another thread keeps iterating the listeners it started with.
+        """
+        listeners = self.listeners.get(channel, ())
+        items = [(self._priorities.get((channel, listener),
+                                       getattr(listener, 'priority', 50)),
+                  listener)
+                 for listener in listeners]
         try:
             items.sort(key=lambda item: item[0])
         except TypeError:
             # Python 2.3 had no 'key' arg, but that doesn't matter
             # since it could sort dissimilar types just fine.
             items.sort()
-        for priority, listener in items:
+        ordered = tuple([listener for priority, listener in items])
+        self._sorted[channel] = (listeners, len(listeners), ordered)
+        return ordered
+
+    def publish(self, channel, *args, **kwargs):
+        """Return output of all subscribers for the given channel."""
+        try:
+            listeners, size, ordered = self._sorted[channel]
+        except KeyError:
+            if channel not in self.listeners:
+                return []
+            ordered = self._sort(channel)
+        else:
+            # Callers may replace or fill self.listeners[channel] directly.
+            current = self.listeners.get(channel)
+            if current is not listeners or len(current) != size:
+                if current is None:
+                    return []
+                ordered = self._sort(channel)
+
+        # Most publishes succeed; only make a ChannelFailures when one fails.
+        exc = None
+        output = []
+        for listener in ordered:
             try:
                 output.append(listener(*args, **kwargs))
             except KeyboardInterrupt:
@@ -204,6 +266,8 @@ class Bus(object):
                     e.code = 1
                 raise
             except:
+                if exc is None:
+                    exc = ChannelFailures()
                 exc.handle_exception()
                 if channel == 'log':
                     # Assume any further messages to 'log' will fail.
@@ -235,6 +299,14 @@ class Bus(object):
             self.publish('start')
             self.state = states.STARTED
             self.log('Bus STARTED')
+            # Nobody took up these; don't hold (say) their ports open.
+            for key, fd in self.inherited_fds.items():
+                self.log('Closing unused inherited fd %s (%s)' % (fd, key))
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+            self.inherited_fds.clear()
         except (KeyboardInterrupt, SystemExit):
             raise
         except:
@@ -284,6 +356,26 @@ class Bus(object):
         self.execv = True
         self.exit()
 
+    def pass_fd(self, key, fd):
+        """Keep a copy of the given fd open for the process which execv starts.
+
+        The new process finds it with inherited_fd(key). This lets a server
+        hand its listening socket over a restart, so clients queue up in its
+        backlog rather than have their connections refused. Return False
+        (passing nothing) on platforms which can't do this.
+        """
+        if fcntl is None:
+            return False
+        self.passed_fds[key] = os.dup(fd)
+        return True
+
+    def inherited_fd(self, key):
+        """Return the fd which the previous process passed as key, or None.
+
+        The caller owns the returned fd; it is only returned once.
+        """
+        return self.inherited_fds.pop(key, None)
+
     def graceful(self):
         """Advise all services to reload."""
         self.log('Bus graceful')
@@ -379,10 +471,21 @@ class Bus(object):
                 args = ['"%s"' % arg for arg in args]
 
             os.chdir(_startup_cwd)
+            if self.passed_fds:
+                self._pass_fds()
             if self.max_cloexec_files:
                 self._set_cloexec()
             os.execv(sys.executable, args)
 
+    def _pass_fds(self):
+        """Make self.passed_fds inheritable, and list them for the new process."""
+        entries = []
+        for key, fd in self.passed_fds.items():
+            flags = fcntl.fcntl(fd, fcntl.F_GETFD)
+            fcntl.fcntl(fd, fcntl.F_SETFD, flags & ~fcntl.FD_CLOEXEC)
+            entries.append('%d=%s' % (fd, _quote_key(key)))
+        os.environ[PASSED_FDS_ENV] = ','.join(entries)
+
     def _set_cloexec(self):
         """Set the CLOEXEC flag on all open files (except stdin/out/err).
 
@@ -393,8 +496,12 @@ class Bus(object):
         from persisting into the new process.
 
         Set self.max_cloexec_files to 0 to disable this behavior.
+        The descriptors in self.passed_fds are left open.
         """
+        passed = set(self.passed_fds.values())
         for fd in range(3, self.max_cloexec_files): # skip stdin/out/err
+            if fd in passed:
+                continue
             try:
                 flags = fcntl.fcntl(fd, fcntl.F_GETFD)
             except IOError:
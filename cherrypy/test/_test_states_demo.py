@@ -24,6 +24,11 @@ class Root:
         return repr(starttime)
     start.exposed = True
 
+    def late_start(self):
+        # Whether the late start listener ran in this very process.
+        return repr(os.getpid() in late_started)
+    late_start.exposed = True
+
     def exit(self):
         # This handler might be called before the engine is STARTED if an
         # HTTP worker thread handles it before the HTTP server returns
@@ -57,6 +62,12 @@ def starterror():
         zerodiv = 1 / 0
 cherrypy.engine.subscribe('start', starterror, priority=6)
 
+late_started = []
+def late_start():
+    # Runs after the servers (and any WorkerProcesses fork).
+    late_started.append(os.getpid())
+cherrypy.engine.subscribe('start', late_start, priority=90)
+
 def log_test_case_name():
     if cherrypy.config.get('test_case_name', False):
         cherrypy.log("STARTED FROM: %s" % cherrypy.config.get('test_case_name'))
@@ -405,9 +405,11 @@ log.access_file: r'%(access_log)s'
     error_log = os.path.join(thisdir, 'test.error.log')
     access_log = os.path.join(thisdir, 'test.access.log')
 
-    def __init__(self, wait=False, daemonize=False, ssl=False, socket_host=None, socket_port=None):
+    def __init__(self, wait=False, daemonize=False, ssl=False, socket_host=None, socket_port=None,
+                 workers=None):
         self.wait = wait
         self.daemonize = daemonize
+        self.workers = workers
         self.ssl = ssl
         self.host = socket_host or cherrypy.server.socket_host
         self.port = socket_port or cherrypy.server.socket_port
@@ -454,6 +456,9 @@ server.ssl_private_key: r'%s'
         if self.daemonize:
             args.append('-d')
 
+        if self.workers:
+            args.extend(['-w', str(self.workers)])
+
         env = os.environ.copy()
         # Make sure we import the cherrypy package in which this module is defined.
         grandparentdir = os.path.abspath(os.path.join(thisdir, '..', '..'))
@@ -0,0 +1,248 @@
+"""CherryPy Microbenchmarks
+
+    Usage:
+        python -m cherrypy.test.microbench --number=N --help [benchmark ...]
+
+    --number=N: run each measurement N times (default 10000)
+    --help:     show this help message
+
+    Benchmarks run in-process, without an HTTP server, and print the
+    mean time taken by the code they measure in microseconds. By default,
+    all of them are run:
+
+    respond: the per-request overhead of Request.run for a handler with
+             several Tools on, before and after Request.reuse_config and
+             compiled dispatch.
+    bus:     the per-request overhead of publishing to the engine's
+             request channels with 0, 3 and 10 subscribers.
+    hooks:   the per-request cost of copying the class-level HookMap and
+             running every hook point, with and without attaching hooks.
+    head:    the per-request cost of reading and parsing a typical browser
+             request head in wsgiserver, one line at a time and in one scan.
+"""
+
+import getopt
+import sys
+import timeit
+
+import cherrypy
+from cherrypy import wsgiserver
+from cherrypy.process import wspbus
+from cherrypy._cpcompat import BytesIO, ntob
+from cherrypy.lib import httputil
+
+
+__all__ = ['bench_bus', 'bench_head', 'bench_hooks', 'bench_respond', 'print_report', 'run']
+
+
+def _time(func, number):
+    """Return the mean time of number calls to func, in microseconds."""
+    timer = timeit.default_timer
+    start = timer()
+    for i in range(number):
+        func()
+    return (timer() - start) * 1000000.0 / number
+
+
+def print_report(title, rows):
+    print("")
+    print(title)
+    for label, usecs in rows:
+        print("    %-40s %8.1f usec" % (label, usecs))
+
+
+class Root:
+
+    def index(self):
+        return "Hello, world"
+    index.exposed = True
+
+    def page(self, *args):
+        return "Hello, world"
+    page.exposed = True
+
+
+respond_conf = {
+    '/': {
+        'tools.encode.on': True,
+        'tools.gzip.on': True,
+        'tools.etags.on': True,
+        'tools.etags.autotags': True,
+        'tools.trailing_slash.on': True,
+        'tools.response_headers.on': True,
+        'tools.response_headers.headers': [('X-Bench', 'respond')],
+    },
+    '/page': {
+        'response.stream': False,
+    },
+}
+
+
+def bench_respond(number):
+    """Return rows of the mean time per request, before and after."""
+    local = httputil.Host('127.0.0.1', 8080, 'localhost')
+    remote = httputil.Host('127.0.0.1', 50000, '')
+    headers = [('Host', 'localhost'), ('Accept-Encoding', 'gzip')]
+
+    rows = []
+    for label, reuse, compiled in (
+            ("before", False, False),
+            ("reuse_config", True, False),
+            ("reuse_config + compiled dispatch", True, True)):
+        app = cherrypy.Application(Root(), '', respond_conf)
+        app.merge({'/': {
+            'request.reuse_config': reuse,
+            'request.dispatch': cherrypy.dispatch.Dispatcher(
+                compiled=compiled),
+            }})
+
+        def respond():
+            request, response = app.get_serving(local, remote,
+                                                'http', 'HTTP/1.1')
+            try:
+                response = request.run('GET', '/page/a/b', '', 'HTTP/1.1',
+                                       headers, BytesIO())
+                ntob('').join(response.body)
+            finally:
+                app.release_serving()
+
+        # Warm up any caches before timing.
+        respond()
+        rows.append((label, _time(respond, number)))
+    return rows
+
+
+def bench_bus(number):
+    """Return rows of the mean time per request of the bus publishes."""
+    channels = ('acquire_thread', 'before_request', 'after_request')
+
+    rows = []
+    for count in (0, 3, 10):
+        bus = wspbus.Bus()
+        for channel in channels:
+            bus.listeners[channel] = set()
+            for i in range(count):
+                bus.subscribe(channel, lambda: None, priority=i * 10)
+
+        def publish():
+            bus.publish('acquire_thread')
+            bus.publish('before_request')
+            bus.publish('after_request')
+
+        rows.append(("%d subscribers" % count, _time(publish, number)))
+    return rows
+
+
+def bench_hooks(number):
+    """Return rows of the mean time per request of the request hooks."""
+    from cherrypy._cprequest import hookpoints
+
+    def hook():
+        pass
+
+    rows = []
+    for count in (0, 3):
+        def respond():
+            hooks = cherrypy._cprequest.Request.hooks.copy()
+            for i in range(count):
+                hooks.attach('before_finalize', hook, priority=90 - i)
+            for point in hookpoints:
+                hooks.run(point)
+
+        rows.append(("%d hooks attached" % count, _time(respond, number)))
+    return rows
+
+
+browser_head = ntob('\r\n'.join([
+    'GET /search/results?q=cherrypy&page=2 HTTP/1.1',
+    'Host: www.example.com',
+    'User-Agent: Mozilla/5.0 (X11; Linux x86_64; rv:31.0) Gecko/20100101 Firefox/31.0',
+    'Accept: text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language: en-US,en;q=0.5',
+    'Accept-Encoding: gzip, deflate',
+    'Referer: http://www.example.com/search',
+    'Cookie: session_id=0123456789abcdef0123456789abcdef; theme=dark',
+    'Connection: keep-alive',
+    'Cache-Control: max-age=0',
+    '', '']))
+
+
+class _PipelinedSocket(object):
+    """A socket whose peer endlessly pipelines the same request."""
+
+    def __init__(self, head):
+        self.head = head
+
+    def recv(self, size):
+        return self.head
+
+    def recv_into(self, buf, nbytes=0):
+        n = len(self.head)
+        buf[:n] = self.head
+        return n
+
+    def readable(self):
+        return True
+
+
+class _HeadServer(object):
+    ssl_adapter = None
+    protocol = 'HTTP/1.1'
+    max_request_header_size = 500 * 1024
+    max_request_body_size = 0
+
+
+def bench_head(number):
+    """Return rows of the mean time to read and parse a request head."""
+    server = _HeadServer()
+    rows = []
+    for buffered, label in ((False, "readline and read_headers"),
+                            (True, "read_request_head and parse_headers")):
+        conn = wsgiserver.HTTPConnection(server, _PipelinedSocket(browser_head))
+
+        class Request(wsgiserver.HTTPRequest):
+            buffered_head = buffered
+
+        def parse():
+            req = Request(server, conn)
+            req.parse_request()
+            if not req.ready:
+                raise AssertionError("request was not parsed")
+
+        rows.append((label, _time(parse, number)))
+    return rows
+
+
+benchmarks = [
+    ('respond', "Request.run, per request", bench_respond),
+    ('bus', "Bus.publish, per request", bench_bus),
+    ('hooks', "HookMap copy and run, per request", bench_hooks),
+    ('head', "wsgiserver request head parsing, per request", bench_head),
+]
+
+
+def run(names=None, number=10000):
+    """Run (and print the results of) the named benchmarks, or all of them."""
+    cherrypy.log.screen = False
+    cherrypy.log.access_file = ''
+    cherrypy.log.error_file = ''
+    for name, title, bench in benchmarks:
+        if names and name not in names:
+            continue
+        print_report(title, bench(number))
+
+
+if __name__ == '__main__':
+    longopts = ['number=', 'help']
+    try:
+        switches, args = getopt.getopt(sys.argv[1:], "", longopts)
+        opts = dict(switches)
+    except getopt.GetoptError:
+        print(__doc__)
+        sys.exit(2)
+
+    if "--help" in opts:
+        print(__doc__)
+        sys.exit(0)
+
+    run(args, int(opts.get('--number', 10000)))
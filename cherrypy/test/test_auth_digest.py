@@ -2,6 +2,10 @@
 # -*- coding: utf-8 -*-
 # vim:ts=4:sw=4:expandtab:fileencoding=utf-8
 
+import os
+import tempfile
+import time
+import unittest
 
 import cherrypy
 from cherrypy.lib import auth_digest
@@ -30,10 +34,16 @@ class DigestAuthTest(helper.CPWebCase):
                             'tools.auth_digest.realm': 'localhost',
                             'tools.auth_digest.get_ha1': get_ha1,
                             'tools.auth_digest.key': 'a565c27146791cfb',
-                            'tools.auth_digest.debug': 'True'}}
+                            'tools.auth_digest.debug': 'True'},
+                '/digest2': {'tools.auth_digest.on': True,
+                             'tools.auth_digest.realm': 'localhost',
+                             'tools.auth_digest.get_ha1': get_ha1,
+                             'tools.auth_digest.key': 'a565c27146791cfb',
+                             'tools.auth_digest.nonces': auth_digest.NonceTable()}}
 
         root = Root()
         root.digest = DigestProtected()
+        root.digest2 = DigestProtected()
         cherrypy.tree.mount(root, config=conf)
     setup_server = staticmethod(setup_server)
 
@@ -113,3 +123,129 @@ class DigestAuthTest(helper.CPWebCase):
         self.assertStatus('200 OK')
         self.assertBody("Hello test, you've been authorized.")
 
+
+    def _challenge(self, path):
+        self.getPage(path)
+        self.assertStatus(401)
+        for k, v in self.headers:
+            if k.lower() == "www-authenticate" and v.startswith("Digest"):
+                return v
+        self._handlewebError("Digest authentification scheme was not found")
+
+    def _authorization(self, nonce, nc, uri='/digest2/'):
+        get_ha1 = auth_digest.get_ha1_dict_plain({'test' : 'test'})
+        base_auth = ('Digest username="test", realm="localhost", nonce="%s", '
+                     'uri="' + uri + '", algorithm=MD5, response="%s", qop=auth, '
+                     'nc=%s, cnonce="1522e61005789929"')
+        auth = auth_digest.HttpDigestAuthorization(
+            base_auth % (nonce, 'x', nc), 'GET')
+        response = auth.request_digest(get_ha1('localhost', 'test'))
+        return base_auth % (nonce, response, nc)
+
+    def testDigestNonceTable(self):
+        value = self._challenge("/digest2/")
+        nonce = value.split('nonce="', 1)[1].split('"', 1)[0]
+
+        for nc in ('00000001', '00000003', '00000002'):
+            self.getPage('/digest2/', [('Authorization',
+                                        self._authorization(nonce, nc))])
+            self.assertStatus('200 OK')
+            self.assertBody("Hello test, you've been authorized.")
+
+        # A replayed nonce count gets a fresh, stale challenge.
+        self.getPage('/digest2/', [('Authorization',
+                                    self._authorization(nonce, '00000002'))])
+        self.assertStatus(401)
+        value = self.assertHeader('WWW-Authenticate')
+        self.assertTrue('stale="true"' in value)
+        self.assertFalse(nonce in value)
+
+        # A nonce this process never issued is stale, though genuine.
+        nonce = auth_digest.synthesize_nonce('localhost', 'a565c27146791cfb')
+        self.getPage('/digest2/', [('Authorization',
+                                    self._authorization(nonce, '00000001'))])
+        self.assertStatus(401)
+        self.assertTrue('stale="true"' in self.assertHeader('WWW-Authenticate'))
+
+
+class NonceTableTest(unittest.TestCase):
+
+    def test_nonce_counts(self):
+        table = auth_digest.NonceTable(window=4)
+        nonce = table.issue('localhost', 'key')
+        self.assertTrue(nonce in table)
+        self.assertFalse('0:bogus' in table)
+        self.assertFalse(table.use('0:bogus', '00000001'))
+
+        self.assertTrue(table.use(nonce, '00000001'))
+        self.assertFalse(table.use(nonce, '00000001'))
+        self.assertTrue(table.use(nonce, '00000005'))
+        self.assertTrue(table.use(nonce, '00000003'))
+        self.assertFalse(table.use(nonce, '00000003'))
+        self.assertTrue(table.use(nonce, '00000002'))
+        # 1 is now outside the window, so it can't be told from a replay.
+        self.assertFalse(table.use(nonce, '00000001'))
+        self.assertTrue(table.use(nonce, '00000009'))
+        self.assertFalse(table.use(nonce, '00000005'))
+        self.assertTrue(table.use(nonce, '0000000f'))
+        self.assertFalse(table.use(nonce, '00000009'))
+        self.assertFalse(table.use(nonce, '0000000f'))
+        self.assertTrue(table.use(nonce, '0000000e'))
+        self.assertFalse(table.use(nonce, '00000000'))
+        self.assertFalse(table.use(nonce, 'zz'))
+        # Without qop there is no count to check.
+        self.assertTrue(table.use(nonce))
+
+    def test_bounds(self):
+        table = auth_digest.NonceTable(maxsize=2)
+        first = table.issue('localhost', 'key')
+        second = table.issue('localhost', 'key')
+        nonce = table.issue('localhost', 'key')
+        self.assertEqual(len(table), 2)
+        # The oldest nonce makes way for the new one.
+        self.assertFalse(first in table)
+        self.assertTrue(second in table)
+        self.assertTrue(nonce in table)
+
+        table.max_age = 0
+        self.assertFalse(nonce in table)
+        self.assertFalse(table.use(nonce, '00000001'))
+        table.issue('localhost', 'key')
+        self.assertEqual(len(table), 1)
+
+
+class HtdigestFileTest(unittest.TestCase):
+
+    def test_reload_on_change(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            f = open(path, 'w')
+            f.write('alice:wonderland:3238cdfe91a8b2ed8e39646921a02d4c\n'
+                    'alice:wonderland:ffffffffffffffffffffffffffffffff\n'
+                    'bob:oz:0123456789abcdef0123456789abcdef\n')
+            f.close()
+            get_ha1 = auth_digest.get_ha1_file_htdigest(path)
+            self.assertEqual(get_ha1('wonderland', 'alice'),
+                             '3238cdfe91a8b2ed8e39646921a02d4c')
+            self.assertEqual(get_ha1('oz', 'bob'),
+                             '0123456789abcdef0123456789abcdef')
+            self.assertEqual(get_ha1('oz', 'alice'), None)
+            self.assertEqual(get_ha1('wonderland', 'carol'), None)
+
+            store = get_ha1.__self__
+            users = store.users
+            get_ha1('oz', 'bob')
+            self.assertTrue(store.users is users)
+
+            f = open(path, 'w')
+            f.write('carol:wonderland:00000000000000000000000000000000\n')
+            f.close()
+            # Don't depend on the filesystem's timestamp resolution.
+            mtime = time.time() + 10
+            os.utime(path, (mtime, mtime))
+            self.assertEqual(get_ha1('wonderland', 'alice'), None)
+            self.assertEqual(get_ha1('wonderland', 'carol'),
+                             '00000000000000000000000000000000')
+        finally:
+            os.remove(path)
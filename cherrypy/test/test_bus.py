@@ -1,3 +1,4 @@
+import os
 import threading
 import time
 import unittest
@@ -69,6 +70,34 @@ class PublishSubscribeTests(unittest.TestCase):
 
         self.assertEqual(self.responses, expected)
 
+    def test_listener_changes(self):
+        b = wspbus.Bus()
+
+        self.responses = []
+        first = self.get_listener('hugh', 0)
+        b.subscribe('hugh', first, 60)
+        b.subscribe('hugh', self.get_listener('hugh', 1), 40)
+        b.publish('hugh')
+        b.unsubscribe('hugh', first)
+        b.subscribe('hugh', self.get_listener('hugh', 2), 10)
+        b.publish('hugh')
+        self.assertEqual(self.responses, [msg % (i, 'hugh', None)
+                                          for i in (1, 0, 2, 1)])
+
+        # Listeners set directly (as config does for SIGHUP) are published
+        # to, using their priority attribute if they have one.
+        self.responses = []
+        b.listeners['hugh'] = set([self.get_listener('hugh', 3)])
+        b.publish('hugh')
+        b.listeners['hugh'].add(self.get_listener('hugh', 4))
+        b.publish('hugh', 5)
+        del b.listeners['hugh']
+        self.assertEqual(b.publish('hugh'), [])
+        # Listeners 3 and 4 share a priority, so either may go first.
+        self.assertEqual(self.responses[0], msg % (3, 'hugh', None))
+        self.assertEqual(sorted(self.responses[1:]),
+                         [msg % (i, 'hugh', 5) for i in (3, 4)])
+
 
 class BusMethodTests(unittest.TestCase):
 
@@ -234,6 +263,58 @@ class BusMethodTests(unittest.TestCase):
         finally:
             b.exit()
 
+    def test_pass_fd(self):
+        if wspbus.fcntl is None:
+            return
+        fcntl = wspbus.fcntl
+        def cloexec(fd):
+            return bool(fcntl.fcntl(fd, fcntl.F_GETFD) & fcntl.FD_CLOEXEC)
+
+        r, w = os.pipe()
+        b = wspbus.Bus()
+        try:
+            self.assertEqual(b.pass_fd('127.0.0.1:8080', r), True)
+            passed = b.passed_fds['127.0.0.1:8080']
+            self.assertNotEqual(passed, r)
+
+            # _do_execv lists the passed fds for the new process,
+            # and leaves them open across execv.
+            b._pass_fds()
+            self.assertEqual(os.environ[wspbus.PASSED_FDS_ENV],
+                             '%d=127.0.0.1:8080' % passed)
+            fcntl.fcntl(w, fcntl.F_SETFD, 0)
+            b.max_cloexec_files = max(passed, w) + 1
+            b._set_cloexec()
+            self.assertEqual(cloexec(passed), False)
+            self.assertEqual(cloexec(w), True)
+
+            # The new process's bus picks them up (once).
+            b2 = wspbus.Bus()
+            self.assertEqual(wspbus.PASSED_FDS_ENV in os.environ, False)
+            self.assertEqual(b2.inherited_fd('127.0.0.1:8080'), passed)
+            self.assertEqual(b2.inherited_fd('127.0.0.1:8080'), None)
+
+            # Keys are escaped, so any string will do.
+            key = '/tmp/a,b=c%2C.sock'
+            b.pass_fd(key, w)
+            b._pass_fds()
+            b2 = wspbus.Bus()
+            self.assertEqual(sorted(b2.inherited_fds.items()),
+                             [(key, b.passed_fds[key]),
+                              ('127.0.0.1:8080', passed)])
+            os.close(b2.inherited_fd(key))
+
+            # Any nobody takes up are closed once the bus has started.
+            b2.inherited_fds['/tmp/nobody.sock'] = passed
+            self.log(b2)
+            b2.start()
+            b2.exit()
+            self.assertRaises(OSError, os.fstat, passed)
+        finally:
+            os.environ.pop(wspbus.PASSED_FDS_ENV, None)
+            for fd in (r, w):
+                os.close(fd)
+
     def test_log(self):
         b = wspbus.Bus()
         self.log(b)
@@ -3,9 +3,12 @@ import gzip
 from itertools import count
 import os
 curdir = os.path.join(os.getcwd(), os.path.dirname(__file__))
+import shutil
 import sys
+import tempfile
 import threading
 import time
+import unittest
 import urllib
 
 import cherrypy
@@ -31,6 +34,7 @@ class CacheTest(helper.CPWebCase):
             def __init__(self):
                 self.counter = 0
                 self.control_counter = 0
+                self.keyed_counter = 0
                 self.longlock = threading.Lock()
 
             def index(self):
@@ -44,6 +48,11 @@ class CacheTest(helper.CPWebCase):
                 return "visit #%s" % self.control_counter
             control.exposed = True
 
+            def keyed(self, key):
+                self.keyed_counter += 1
+                return "visit #%s" % self.keyed_counter
+            keyed.exposed = True
+
             def a_gif(self):
                 cherrypy.response.headers['Last-Modified'] = httputil.HTTPDate()
                 return gif_bytes
@@ -304,6 +313,52 @@ class CacheTest(helper.CPWebCase):
                               # for our thread/TCP overhead etc.
                               seconds=SECONDS + 2)
 
+    def test_eviction(self):
+        cache = cherrypy._cache
+        cache.clear()
+        cache.maxobjects = 2
+        try:
+            self.getPage("/keyed?key=a")
+            self.assertBody('visit #1')
+            self.getPage("/keyed?key=b")
+            self.assertBody('visit #2')
+            self.getPage("/keyed?key=a")
+            self.assertBody('visit #1')
+
+            # A full cache makes room by evicting the least recently used.
+            self.getPage("/keyed?key=c")
+            self.assertBody('visit #3')
+            self.getPage("/keyed?key=a")
+            self.assertBody('visit #1')
+            self.getPage("/keyed?key=b")
+            self.assertBody('visit #4')
+            self.assertEqual(cache.tot_evictions, 2)
+            self.assertEqual(len(cache.entries), 2)
+
+            # Deleting a resource releases its size.
+            size = cache.cursize
+            self.getPage("/keyed?key=b", method="POST")
+            self.assertEqual(len(cache.entries), 1)
+            self.assertEqual(cache.cursize < size, True)
+        finally:
+            del cache.maxobjects
+            cache.clear()
+
+    def test_expiry(self):
+        cache = cherrypy._cache
+        cache.clear()
+        cache.delay = 1
+        try:
+            self.getPage("/keyed?key=e")
+            self.assertEqual(len(cache.entries), 1)
+            time.sleep(1.5)
+            self.assertEqual(len(cache.entries), 0)
+            self.assertEqual(cache.tot_expires, 1)
+            self.assertEqual(cache.cursize, 0)
+        finally:
+            del cache.delay
+            cache.clear()
+
     def test_cache_control(self):
         self.getPage("/control")
         self.assertBody('visit #1')
@@ -326,3 +381,164 @@ class CacheTest(helper.CPWebCase):
         self.getPage("/control")
         self.assertBody('visit #4')
 
+
+
+shared_cache_file = os.path.join(curdir, 'test.cache')
+
+
+class SharedMemoryCacheTest(helper.CPWebCase):
+
+    def setup_server():
+
+        class Root:
+
+            _cp_config = {
+                'tools.caching.on': True,
+                'tools.caching.cache_class':
+                    cherrypy.lib.caching.SharedMemoryCache,
+                'tools.caching.filename': shared_cache_file,
+                'tools.caching.maxobjects': 64,
+                }
+
+            def __init__(self):
+                self.counter = count(1)
+
+            def index(self, key=None):
+                return "visit #%s" % next(self.counter)
+            index.exposed = True
+
+            def varying(self):
+                cherrypy.response.headers['Vary'] = 'Our-Varying-Header'
+                return "visit #%s" % next(self.counter)
+            varying.exposed = True
+
+        # The caching tool makes one cache per process; make a new one.
+        if hasattr(cherrypy, '_cache'):
+            del cherrypy._cache
+        cherrypy.tree.mount(Root())
+    setup_server = staticmethod(setup_server)
+
+    def teardown_class(cls):
+        super(SharedMemoryCacheTest, cls).teardown_class()
+        if hasattr(cherrypy, '_cache'):
+            del cherrypy._cache
+        if os.path.exists(shared_cache_file):
+            os.remove(shared_cache_file)
+    teardown_class = classmethod(teardown_class)
+
+    def other_process_cache(self):
+        # A second mapping of the same file sees what another process would.
+        cache = cherrypy.lib.caching.SharedMemoryCache()
+        cache.filename = shared_cache_file
+        cache.maxobjects = 64
+        return cache
+
+    def test_shared(self):
+        self.getPage("/?key=a")
+        first = self.body
+        self.getPage("/?key=a")
+        self.assertBody(first)
+
+        cache = cherrypy._cache
+        cherrypy._cache = self.other_process_cache()
+        try:
+            self.getPage("/?key=a")
+            self.assertBody(first)
+            self.assertEqual(cherrypy._cache.tot_hist, 1)
+
+            # Deleting the resource through one cache removes it from all.
+            self.getPage("/?key=a", method="POST")
+        finally:
+            cherrypy._cache = cache
+        self.getPage("/?key=a")
+        second = self.body
+        self.assertNotEqual(second, first)
+        self.getPage("/?key=a")
+        self.assertBody(second)
+
+        cache.clear()
+        self.getPage("/?key=a")
+        self.assertNotEqual(self.body, second)
+
+    def test_vary(self):
+        bodies = {}
+        for value in ('a', 'b', 'a', 'b'):
+            self.getPage("/varying", [('Our-Varying-Header', value)])
+            bodies.setdefault(value, self.body)
+            self.assertBody(bodies[value])
+        self.assertNotEqual(bodies['a'], bodies['b'])
+
+    def test_antistampede(self):
+        self.getPage("/?key=s")
+        cache = cherrypy._cache
+        other = self.other_process_cache()
+        other.antistampede_timeout = 1
+        digest = other._digest('stampede')
+
+        # The first cache to miss marks the variant as pending...
+        self.assertEqual(other._wait(digest), None)
+        # ...so the others wait for it (here, until the timeout).
+        start = time.time()
+        self.assertEqual(cache._wait(digest), None)
+        self.assertEqual(time.time() - start >= 0.9, True)
+
+
+class SharedMemoryCacheFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.caches = []
+
+    def tearDown(self):
+        for cache in self.caches:
+            if cache.mmap is not None:
+                cache.mmap.close()
+                os.close(cache.fd)
+        shutil.rmtree(self.dirname)
+
+    def cache(self, filename=None):
+        cache = cherrypy.lib.caching.SharedMemoryCache()
+        cache.filename = filename
+        cache.maxobjects = 4
+        cache.maxobj_size = 16
+        self.caches.append(cache)
+        return cache
+
+    def test_private_file(self):
+        if not hasattr(os, 'getuid'):
+            return
+        filename = os.path.join(self.dirname, 'test.cache')
+        self.cache(filename)._open()
+        self.assertEqual(os.stat(filename).st_mode & 511, 384)
+
+        # Pickles in a file which others can write could run anything.
+        os.chmod(filename, 420)
+        self.assertRaises(OSError, self.cache(filename)._open)
+
+        os.chmod(filename, 384)
+        link = os.path.join(self.dirname, 'link.cache')
+        os.symlink(filename, link)
+        self.assertRaises(OSError, self.cache(link)._open)
+
+    def test_default_file(self):
+        if not hasattr(os, 'getuid'):
+            return
+        tempdir = tempfile.tempdir
+        tempfile.tempdir = self.dirname
+        try:
+            self.cache()._open()
+            private = os.path.join(self.dirname, 'cherrypy-%d' % os.getuid())
+            self.assertEqual(os.stat(private).st_mode & 511, 448)
+            self.assertTrue(os.path.isfile(
+                os.path.join(private, 'cherrypy-cache')))
+
+            # A directory which others may use is refused...
+            os.chmod(private, 511)
+            self.assertRaises(OSError, self.cache()._open)
+            # ...as is a symlink in its place.
+            os.chmod(private, 448)
+            os.rename(private, private + '.real')
+            os.symlink(private + '.real', private)
+            self.assertRaises(OSError, self.cache()._open)
+        finally:
+            tempfile.tempdir = tempdir
@@ -93,6 +93,11 @@ def setup_server():
     cherrypy.config.update({
         'server.max_request_body_size': 1001,
         'server.socket_timeout': timeout,
+        # Server attributes outlive config.reset(); undo the classes below.
+        'server.thread_pool': 10,
+        'server.park_idle_connections': False,
+        'server.accepted_queue_size': 0,
+        'server.accepted_queue_timeout': 0,
         })
 
 
@@ -487,6 +492,122 @@ class PipelineTests(helper.CPWebCase):
         conn.close()
 
 
+def setup_parking_server():
+    setup_server()
+    cherrypy.config.update({'server.park_idle_connections': True})
+
+
+class KeepAliveParkingTests(PipelineTests):
+    setup_server = staticmethod(setup_parking_server)
+
+    def test_idle_conn_releases_worker(self):
+        if cherrypy.server.protocol_version != "HTTP/1.1":
+            return self.skip()
+        httpserver = cherrypy.server.httpserver
+        poller = getattr(httpserver, 'keepalive_poller', None)
+        if poller is None:
+            return self.skip("skipped (no keep-alive poller) ")
+
+        self.PROTOCOL = "HTTP/1.1"
+
+        def hello(conn):
+            conn.putrequest("GET", "/hello", skip_host=True)
+            conn.putheader("Host", self.HOST)
+            conn.endheaders()
+            response = conn.getresponse()
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.read(), ntob("Hello, world!"))
+
+        # Open two keep-alive connections and leave them both idle.
+        conns = [self.get_conn(), self.get_conn()]
+        for conn in conns:
+            hello(conn)
+
+        for trial in range(10):
+            if poller.parked == 2:
+                break
+            time.sleep(0.1)
+        self.assertEqual(poller.parked, 2)
+        # Idle connections must not pin any worker threads.
+        self.assertEqual(httpserver.requests.idle,
+                         len(httpserver.requests._threads))
+
+        # Parked connections are still usable.
+        for conn in conns:
+            hello(conn)
+            conn.close()
+
+
+def setup_shedding_server():
+    setup_server()
+    cherrypy.config.update({'server.thread_pool': 1,
+                            'server.accepted_queue_size': 2,
+                            'server.accepted_queue_timeout': 2,
+                            'server.shed_retry_after': 7,
+                            'server.socket_timeout': 10,
+                            })
+
+
+class LoadSheddingTests(helper.CPWebCase):
+    setup_server = staticmethod(setup_shedding_server)
+
+    def _hello(self, conn):
+        conn.putrequest("GET", "/hello", skip_host=True)
+        conn.putheader("Host", self.HOST)
+        conn.endheaders()
+        return conn.getresponse()
+
+    def _occupy_worker(self):
+        # Make a keep-alive request so the only worker blocks on this conn.
+        conn = self.get_conn()
+        response = self._hello(conn)
+        self.assertEqual(response.status, 200)
+        response.read()
+        return conn
+
+    def test_queue_full(self):
+        if cherrypy.server.protocol_version != "HTTP/1.1":
+            return self.skip()
+        self.PROTOCOL = "HTTP/1.1"
+
+        busy = self._occupy_worker()
+        # These fill the queue...
+        queued = [self.get_conn(), self.get_conn()]
+        time.sleep(0.2)
+        # ...so this one should be shed straight away.
+        shed = self.get_conn()
+        response = self._hello(shed)
+        self.assertEqual(response.status, 503)
+        self.assertEqual(response.getheader("Retry-After"), "7")
+        shed.close()
+
+        # Freeing the worker lets the queued connections proceed.
+        busy.close()
+        for conn in queued:
+            response = self._hello(conn)
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.read(), ntob("Hello, world!"))
+            conn.close()
+
+    def test_queue_timeout(self):
+        if cherrypy.server.protocol_version != "HTTP/1.1":
+            return self.skip()
+        self.PROTOCOL = "HTTP/1.1"
+
+        busy = self._occupy_worker()
+        late = self.get_conn()
+        late.putrequest("GET", "/hello", skip_host=True)
+        late.putheader("Host", self.HOST)
+        late.endheaders()
+        time.sleep(2.5)
+
+        busy.close()
+        response = late.getresponse()
+        self.assertEqual(response.status, 503)
+        self.assertEqual(response.getheader("Retry-After"), "7")
+        late.close()
+
+
 class ConnectionTests(helper.CPWebCase):
     setup_server = staticmethod(setup_server)
 
@@ -77,6 +77,12 @@ class EncodingTests(helper.CPWebCase):
             noshow_stream.exposed = True
             noshow_stream._cp_config = {'response.stream': True}
 
+            def etagged(self):
+                cherrypy.response.headers['ETag'] = '"stable"'
+                return "Hello, world"
+            etagged.exposed = True
+            etagged._cp_config = {'tools.gzip.cache': True}
+
         class Decode:
             def extra_charset(self, *args, **kwargs):
                 return ', '.join([": ".join((k, v))
@@ -357,6 +363,22 @@ class EncodingTests(helper.CPWebCase):
                               '/gzip/noshow_stream',
                               headers=[("Accept-Encoding", "gzip")])
 
+    def test_gzip_cache(self):
+        cache = cherrypy.lib.encoding.gzip_cache
+        cache.clear()
+        for i in range(3):
+            self.getPage('/gzip/etagged', headers=[("Accept-Encoding", "gzip")])
+            self.assertHeader("Content-Encoding", "gzip")
+            self.assertEqual(cherrypy.lib.encoding.decompress(self.body),
+                             ntob("Hello, world"))
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+        self.assertEqual(len(cache.store), 1)
+
+        # Responses without a validator aren't cached.
+        self.getPage('/gzip/', headers=[("Accept-Encoding", "gzip")])
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+        cache.clear()
+
     def test_UnicodeHeaders(self):
         self.getPage('/cookies_and_headers')
         self.assertBody('Any content')
@@ -166,6 +166,11 @@ class ObjectMappingTest(helper.CPWebCase):
                 return "milk"
 
         cherrypy.tree.mount(AnotherApp(), "/app", {'/': {'request.dispatch': d}})
+
+        compiled = cherrypy.dispatch.Dispatcher(compiled=True)
+        cherrypy.tree.mount(Root(), "/compiled",
+                            {'/': {'request.dispatch': compiled,
+                                   'user': 'compiled'}})
     setup_server = staticmethod(setup_server)
 
 
@@ -373,6 +378,33 @@ class ObjectMappingTest(helper.CPWebCase):
         self.getPage("/app")
         self.assertBody("milk")
 
+    def testCompiledDispatch(self):
+        app = cherrypy.tree.apps["/compiled"]
+        app.dispatch_cache.clear()
+        for trial in range(2):
+            self.getPage("/compiled/dir1/myMethod")
+            self.assertBody("myMethod from dir1, path_info is:'/dir1/myMethod'")
+            self.getPage("/compiled/dir1/dir2/posparam/18/24")
+            self.assertBody("18/24")
+            self.getPage("/compiled/dir1/some/param")
+            self.assertBody("default for dir1, param is:('some', 'param')")
+            self.getPage("/compiled/dir1")
+            self.assertStatus(301)
+            self.getPage("/compiled/confvalue")
+            self.assertBody("compiled")
+        self.assertEqual(len(app.dispatch_cache), 5)
+
+        # Merging config invalidates the memoized config.
+        app.merge({'/': {'user': 'merged'}})
+        self.assertEqual(len(app.dispatch_cache), 0)
+        self.getPage("/compiled/confvalue")
+        self.assertBody("merged")
+
+        # So does mounting the app again.
+        self.getPage("/compiled/dir1/myMethod")
+        cherrypy.tree.mount(app)
+        self.assertEqual(len(app.dispatch_cache), 0)
+
     def testTreeMounting(self):
         class Root(object):
             def hello(self):
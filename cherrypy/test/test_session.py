@@ -1,11 +1,16 @@
+import datetime
 import os
 localDir = os.path.dirname(__file__)
+import shutil
+import socket
 import sys
 import threading
 import time
+import unittest
 
 import cherrypy
 from cherrypy._cpcompat import copykeys, HTTPConnection, HTTPSConnection
+from cherrypy._cpcompat import ntob, pickle, py3k
 from cherrypy.lib import sessions
 from cherrypy.lib.httputil import response_codes
 
@@ -212,6 +217,27 @@ class SessionTest(helper.CPWebCase):
         self.getPage('/setsessiontype/file')
         self._test_Concurrency()
 
+    def test_8_Sqlite_Concurrency(self):
+        if sessions.sqlite3 is None:
+            return self.skip("sqlite3 not available ")
+        self.getPage('/setsessiontype/sqlite')
+        try:
+            self._test_Concurrency()
+            self.getPage('/length', self.cookies)
+            self.assertBody('1')
+        finally:
+            self.getPage('/setsessiontype/ram')
+            cls = sessions.SqliteSession
+            if cls.clean_thread:
+                cls.clean_thread.stop()
+                cls.clean_thread.unsubscribe()
+                del cls.clean_thread
+            cls.close_all()
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(cls.database + suffix):
+                    os.unlink(cls.database + suffix)
+            cls.database = None
+
     def _test_Concurrency(self):
         client_thread_count = 5
         request_count = 30
@@ -349,36 +375,848 @@ class SessionTest(helper.CPWebCase):
                 self.fail("Unknown session id in cache: %r", cache)
 
 
-import socket
-try:
-    import memcache
+class CountingSession(sessions.RamSession):
+
+    cache = sessions.RamStore(shards=2)
+    clean_freq = 0
+
+    def _save(self, expiration_time):
+        self.saves.append(expiration_time)
+        sessions.RamSession._save(self, expiration_time)
+
+    def _touch(self, expiration_time):
+        self.touches.append(expiration_time)
+        self.cache[self.id] = (self._data, expiration_time)
+
+
+class SessionChangeTrackingTest(unittest.TestCase):
+
+    def request(self, id=None, **kwargs):
+        sess = CountingSession(id, **kwargs)
+        sess.saves, sess.touches = [], []
+        sess.acquire_lock()
+        return sess
+
+    def test_unchanged_not_saved(self):
+        sess = self.request()
+        sess['cart'] = ['apple']
+        sess.save()
+        self.assertEqual(len(sess.saves), 1)
+
+        # Reads only: neither saved nor (within touch_interval) touched.
+        sess = self.request(sess.id)
+        self.assertEqual(sess['cart'], ['apple'])
+        sess.save()
+        self.assertEqual((sess.saves, sess.touches), ([], []))
+
+        # A mutated nested value is only saved once marked.
+        sess = self.request(sess.id)
+        sess['cart'].append('pear')
+        sess.mark_dirty()
+        sess.save()
+        self.assertEqual(len(sess.saves), 1)
+
+        for change in (lambda s: s.pop('cart'),
+                       lambda s: s.update({'a': 1}),
+                       lambda s: s.setdefault('b', []),
+                       lambda s: s.clear()):
+            sess = self.request(sess.id)
+            change(sess)
+            sess.save()
+            self.assertEqual(len(sess.saves), 1)
+
+        # Popping a missing key changes nothing.
+        sess = self.request(sess.id)
+        sess.pop('missing', None)
+        sess.save()
+        self.assertEqual(sess.saves, [])
+
+    def test_touch(self):
+        sess = self.request()
+        sess['a'] = 1
+        sess.save()
+
+        sess = self.request(sess.id, touch_interval=0)
+        sess.get('a')
+        sess.save()
+        self.assertEqual((len(sess.saves), len(sess.touches)), (0, 1))
+
+        # Never wait more than half the timeout to touch: stored data
+        # which expires in 30 seconds is touched if the timeout is 1 minute.
+        expires = sess.now() + datetime.timedelta(seconds=30)
+        CountingSession.cache[sess.id] = ({'a': 1}, expires)
+        sess = self.request(sess.id, timeout=1, touch_interval=3600)
+        sess.get('a')
+        sess.save()
+        self.assertEqual(len(sess.touches), 1)
+        sess = self.request(sess.id, timeout=1, touch_interval=3600)
+        sess.get('a')
+        sess.save()
+        self.assertEqual(sess.touches, [])
+
+    def test_track_changes_off(self):
+        sess = self.request()
+        sess['a'] = 1
+        sess.save()
+
+        sess = self.request(sess.id, track_changes=False)
+        sess.get('a')
+        sess.save()
+        self.assertEqual(len(sess.saves), 1)
+
+class SerializerTest(unittest.TestCase):
+
+    def session(self, **kwargs):
+        sess = CountingSession(None, **kwargs)
+        sess.saves, sess.touches = [], []
+        return sess
+
+    def test_serializers(self):
+        data = {'cart': [1, 2.5, 'three'], 'user': None, 'admin': True}
+        for name in ('pickle', 'marshal', 'json'):
+            sess = self.session(serializer=name)
+            s = sess._dumps(data)
+            self.assertEqual(sess._loads(s), data)
+            self.assertEqual(sess.bytes_saved, len(s))
+            self.assertEqual(sess.bytes_loaded, len(s))
+
+        # Data saved as a bare pickle (before serializers) still loads,
+        # but only if pickle is the serializer.
+        sess = self.session()
+        self.assertEqual(sess._loads(pickle.dumps(data)), data)
+        sess = self.session(serializer='json')
+        self.assertRaises(sessions._UnreadableData, sess._loads,
+                          pickle.dumps(data))
+
+        # Each serializer only loads its own data.
+        s = self.session(serializer='marshal')._dumps(data)
+        self.assertRaises(sessions._UnreadableData, sess._loads, s)
+        self.assertRaises(sessions._UnreadableData, sess._loads,
+                          ntob('rjson:{broken'))
+
+    def test_compression(self):
+        data = {'products': ['description %d' % i for i in range(100)]}
+        sess = self.session(compress_threshold=1000)
+        compressed = sess._dumps(data)
+        self.assertEqual(compressed[:1], ntob('z'))
+        self.assertEqual(sess._loads(compressed), data)
+
+        sess = self.session()
+        raw = sess._dumps(data)
+        self.assertEqual(raw[:1], ntob('r'))
+        self.assertTrue(len(compressed) < len(raw) / 2)
+
+        # Small data isn't compressed.
+        sess = self.session(compress_threshold=1000)
+        self.assertEqual(sess._dumps({'a': 1})[:1], ntob('r'))
+
+        # The statistics add up over all sessions.
+        stats = sessions.stats
+        saves, compressed_saves = stats['Saves'], stats['Compressed Saves']
+        sess._dumps(data)
+        self.assertEqual((stats['Saves'], stats['Compressed Saves']),
+                         (saves + 1, compressed_saves + 1))
+
+    def test_file_session(self):
+        sess = sessions.FileSession(None, storage_path=localDir,
+                                    serializer='json', compress_threshold=0,
+                                    clean_freq=0)
+        sess.acquire_lock()
+        try:
+            sess['a'] = [1, 2]
+            sess.save()
+            sess = sessions.FileSession(sess.id, storage_path=localDir,
+                                        serializer='json', clean_freq=0)
+            sess.acquire_lock()
+            self.assertEqual(sess['a'], [1, 2])
+            self.assertTrue(sess.bytes_loaded > 0)
+        finally:
+            sess.delete()
+            sess.release_lock()
+
+    def test_serializer_changed(self):
+        sess = sessions.FileSession(None, storage_path=localDir,
+                                    clean_freq=0)
+        sess.acquire_lock()
+        try:
+            sess['a'] = (1, 2)
+            sess.save()
+            # After a switch from pickle to json, the old data is discarded
+            # as if it had expired.
+            sess = sessions.FileSession(sess.id, storage_path=localDir,
+                                        serializer='json', clean_freq=0)
+            sess.acquire_lock()
+            self.assertEqual(sess.get('a'), None)
+            self.assertEqual(sess.dirty, True)
+        finally:
+            sess.delete()
+            sess.release_lock()
+
+
+class RamStoreTest(unittest.TestCase):
+
+    def test_expire(self):
+        store = sessions.RamStore(shards=4)
+        now = datetime.datetime.now()
+        minute = datetime.timedelta(minutes=1)
+        for i in range(20):
+            store['s%d' % i] = ({}, now + (i % 2 and minute or -minute))
+        # Saving again pushes back the expiration time.
+        store['s0'] = ({'a': 1}, now + minute)
+        store.pop('s2')
+        self.assertEqual(len(store), 19)
+
+        self.assertEqual(store.expire(now), 8)
+        self.assertEqual(sorted(store.keys()),
+                         sorted(['s0'] + ['s%d' % i for i in range(1, 20, 2)]))
+        self.assertEqual(store['s0'], ({'a': 1}, now + minute))
+        self.assertEqual(store.expire(now), 0)
+        self.assertEqual(store.expire(now + 2 * minute), 11)
+        self.assertEqual(len(store), 0)
+
+    def test_locks(self):
+        store = sessions.RamStore(shards=1)
+        shard = store.shards[0]
+        store.acquire('a')
+        store.acquire('a')
+        store.release('a')
+        self.assertEqual(list(shard.locks.keys()), ['a'])
+        store.release('a')
+        # Released locks are kept for reuse, not per session id.
+        self.assertEqual((shard.locks, len(shard.free_locks)), ({}, 1))
+        lock = shard.free_locks[0]
+        store.acquire('b')
+        self.assertTrue(shard.locks['b'][0] is lock)
+        store.release('b')
+
+        # The lock is exclusive between threads.
+        store.acquire('c')
+        acquired = []
+        def other():
+            store.acquire('c')
+            acquired.append(True)
+            store.release('c')
+        t = threading.Thread(target=other)
+        t.start()
+        time.sleep(0.1)
+        self.assertEqual(acquired, [])
+        store.release('c')
+        t.join()
+        self.assertEqual(acquired, [True])
+        self.assertEqual(shard.locks, {})
+
+class SessionStorageTest(object):
+    """Tests which every session storage class must pass.
+
+    Mix this into a unittest.TestCase which sets storage_class and the
+    storage_kwargs to make its sessions with, and overrides setup_storage
+    and teardown_storage as needed.
+    """
+
+    storage_class = None
+    storage_kwargs = {}
+
+    def setUp(self):
+        self.setup_storage()
 
-    host, port = '127.0.0.1', 11211
-    for res in socket.getaddrinfo(host, port, socket.AF_UNSPEC,
-                                  socket.SOCK_STREAM):
-        af, socktype, proto, canonname, sa = res
-        s = None
+    def tearDown(self):
+        self.teardown_storage()
+
+    def setup_storage(self):
+        pass
+
+    def teardown_storage(self):
+        pass
+
+    def session(self, id=None, lock=True, **kwargs):
+        for k, v in self.storage_kwargs.items():
+            kwargs.setdefault(k, v)
+        sess = self.storage_class(id, clean_freq=0, **kwargs)
+        if lock:
+            sess.acquire_lock()
+        return sess
+
+    def expire(self, sess):
+        """Make the stored data of the given (expired) session old."""
+        pass
+
+    def test_save_and_load(self):
+        sess = self.session()
+        sess['a'] = [1, 2]
+        sess.save()
+        self.assertFalse(sess.locked)
+
+        sess = self.session(sess.id)
+        self.assertEqual(sess.missing, False)
+        self.assertEqual(sess['a'], [1, 2])
+        sess.delete()
+        sess.release_lock()
+        sess = self.session(sess.id)
+        self.assertEqual(sess.missing, True)
+        sess.release_lock()
+
+    def test_clean_up(self):
+        sess = self.session(timeout=1)
+        sess['a'] = 1
+        sess._save(sess.now() - datetime.timedelta(minutes=1))
+        sess.release_lock()
+        self.expire(sess)
+        live = self.session(timeout=1)
+        live['a'] = 1
+        live.save()
+
+        live.clean_up()
+        sess = self.session(sess.id)
+        self.assertEqual(sess.missing, True)
+        sess.release_lock()
+        live = self.session(live.id)
+        self.assertEqual(live.missing, False)
+        live.release_lock()
+
+
+class FileStorageTest(SessionStorageTest):
+
+    storage_class = sessions.FileSession
+
+    def setup_storage(self):
+        os.mkdir(self.storage_kwargs['storage_path'])
+
+    def teardown_storage(self):
+        if os.path.isdir(self.storage_kwargs['storage_path']):
+            shutil.rmtree(self.storage_kwargs['storage_path'])
+
+    def expire(self, sess):
+        # Only files older than the timeout are even loaded by clean_up.
+        old = time.time() - 120
+        os.utime(sess._get_file_path(), (old, old))
+
+
+class FcntlFileSessionTest(FileStorageTest, unittest.TestCase):
+
+    storage_path = os.path.join(localDir, 'fcntl_sessions')
+    storage_kwargs = {'storage_path': storage_path, 'lock_method': 'fcntl',
+                      'hashed_dirs': True}
+
+    def setup_storage(self):
+        if sessions.fcntl is None:
+            return self.skipTest("fcntl is not available")
+        FileStorageTest.setup_storage(self)
+
+    def test_files(self):
+        sess = self.session()
+        path = sess._get_file_path()
+        self.assertEqual(len(os.path.relpath(path, self.storage_path)
+                             .split(os.sep)), 3)
+        sess['a'] = 1
+        sess.save()
+        self.assertEqual(len(sess), 1)
+        # No temporary or lock files are left over.
+        self.assertEqual(os.listdir(os.path.dirname(path)),
+                         [os.path.basename(path)])
+
+        # Locking a session which is then never saved leaves no file.
+        other = self.session()
+        other.release_lock()
+        self.assertFalse(os.path.exists(other._get_file_path()))
+        self.assertEqual(len(sess), 1)
+
+    def test_lock_survives_save(self):
+        sess = self.session()
+        sess['a'] = 1
+        sess.save()
+
+        sess = self.session(sess.id)
+        acquired = []
+        def other():
+            s = self.session(sess.id)
+            acquired.append(s['a'])
+            s.release_lock()
+        t = threading.Thread(target=other)
+        t.start()
+        time.sleep(0.1)
+        self.assertEqual(acquired, [])
+        # Saving replaces the file; the waiter must still be kept out.
+        sess['a'] = 2
+        sess._save(sess.now() + datetime.timedelta(minutes=60))
+        time.sleep(0.1)
+        self.assertEqual(acquired, [])
+        sess.release_lock()
+        t.join()
+        self.assertEqual(acquired, [2])
+
+    def test_clean_up_skips_recent(self):
+        sess = self.session(timeout=1)
+        sess._save(sess.now() - datetime.timedelta(minutes=1))
+        sess.release_lock()
+        self.expire(sess)
+        live = self.session(timeout=1)
+        live['a'] = 1
+        live.save()
+
+        # The recent file isn't even loaded.
+        loaded = []
+        def _read(path=None):
+            loaded.append(path)
+            return sessions.FileSession._read(live, path)
+        live._read = _read
+        live.clean_up()
+        self.assertEqual(loaded, [sess._get_file_path()])
+
+
+class LockfileFileSessionTest(FileStorageTest, unittest.TestCase):
+
+    storage_path = os.path.join(localDir, 'lockfile_sessions')
+    storage_kwargs = {'storage_path': storage_path, 'hashed_dirs': True}
+
+    def test_hashed_dirs(self):
+        sess = self.session(lock=False)
+        # Locking a new session makes its folder for the lock file.
+        t = threading.Thread(target=sess.acquire_lock)
+        t.setDaemon(True)
+        t.start()
+        t.join(5)
+        self.assertTrue(sess.locked)
+        path = sess._get_file_path()
+        self.assertEqual(os.listdir(os.path.dirname(path)),
+                         [os.path.basename(path) + sess.LOCK_SUFFIX])
+        sess['a'] = 1
+        sess.save()
+        self.assertEqual(os.listdir(os.path.dirname(path)),
+                         [os.path.basename(path)])
+        self.assertEqual(len(sess), 1)
+
+    def test_lock_error(self):
+        # Errors other than a held lock are raised, not waited out.
+        sess = self.session(lock=False, hashed_dirs=False,
+            storage_path=os.path.join(self.storage_path, 'missing'))
+        self.assertRaises(OSError, sess.acquire_lock)
+        self.assertFalse(sess.locked)
+
+
+class SqliteSessionTest(SessionStorageTest, unittest.TestCase):
+
+    storage_class = sessions.SqliteSession
+    database = os.path.join(localDir, 'sqlite_sessions.db')
+
+    def setup_storage(self):
+        if sessions.sqlite3 is None:
+            return self.skipTest("sqlite3 is not available")
+        sessions.SqliteSession.setup(database=self.database)
+
+    def teardown_storage(self):
+        cls = sessions.SqliteSession
+        cls.close_all()
+        self.unsubscribe()
+        cls.database = None
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.database + suffix):
+                os.unlink(self.database + suffix)
+
+    def unsubscribe(self):
+        # Leave the engine as it was before the first setup.
+        cls = sessions.SqliteSession
+        for channel in ('stop_thread', 'stop'):
+            for listener in list(cherrypy.engine.listeners.get(channel, ())):
+                if getattr(listener, '__self__', None) is cls:
+                    cherrypy.engine.unsubscribe(channel, listener)
+        cls._subscribed = False
+
+    def test_setup(self):
+        cls = sessions.SqliteSession
+        stop = len(cherrypy.engine.listeners['stop'])
+        cls.setup(database=self.database)
+        self.assertEqual(len(cherrypy.engine.listeners['stop']), stop)
+        self.assertEqual(cls._subscribed, True)
+
+        db = sessions.sqlite3.connect(self.database)
         try:
-            s = socket.socket(af, socktype, proto)
-            # See http://groups.google.com/group/cherrypy-users/
-            #        browse_frm/thread/bbfe5eb39c904fe0
-            s.settimeout(1.0)
-            s.connect((host, port))
-            s.close()
-        except socket.error:
-            if s:
+            mode = db.execute('pragma journal_mode').fetchone()[0]
+        finally:
+            db.close()
+        self.assertEqual(mode, 'wal')
+
+    def test_clean_batch(self):
+        for i in range(6):
+            sess = self.session(timeout=1)
+            sess['a'] = 1
+            sess.save()
+        self.assertEqual(len(sess), 6)
+
+        sess.clean_batch = 4
+        sess.now = lambda: datetime.datetime.now() + datetime.timedelta(
+            minutes=5)
+        sess.clean_up()
+        self.assertEqual(len(sess), 0)
+
+    def test_locks(self):
+        sess = self.session()
+        sess['a'] = 1
+        sess.save()
+
+        # Locked by another process.
+        sess.db.execute('insert into session_lock values (?, ?, ?)',
+                        (sess.id, 'other', time.time()))
+        acquired = []
+        def other():
+            s = self.session(sess.id)
+            acquired.append(s['a'])
+            s.release_lock()
+        t = threading.Thread(target=other)
+        t.start()
+        time.sleep(0.2)
+        self.assertEqual(acquired, [])
+        sess.db.execute('delete from session_lock')
+        t.join()
+        self.assertEqual(acquired, [1])
+
+        # Stale locks are broken.
+        sess.db.execute('insert into session_lock values (?, ?, ?)',
+                        (sess.id, 'dead', time.time() - 3600))
+        sess = self.session(sess.id)
+        self.assertEqual(sess.locked, True)
+        sess.release_lock()
+
+    def test_stop_thread(self):
+        # A request thread which started before the first session request
+        # (which calls setup) still has its connection closed as it stops.
+        cls = sessions.SqliteSession
+        cls.close_all()
+        # As before the first session request, none of ours are subscribed.
+        self.unsubscribe()
+        dbs = []
+        acquired = threading.Event()
+        go = threading.Event()
+        def request_thread():
+            cherrypy.engine.publish('acquire_thread')
+            acquired.set()
+            go.wait()
+            sess = self.session()
+            dbs.append(sess.db)
+            sess.release_lock()
+            cherrypy.engine.publish('release_thread')
+        t = threading.Thread(target=request_thread)
+        t.start()
+        acquired.wait()
+        cls.setup(database=self.database)
+        go.set()
+        t.join()
+        self.assertEqual(len(dbs), 1)
+        self.assertEqual(cls.connections, {})
+        self.assertRaises(sessions.sqlite3.ProgrammingError,
+                          dbs[0].execute, 'select 1')
+
+
+class ClientPoolTest(unittest.TestCase):
+
+    def pool(self, **kwargs):
+        self.created, self.closed = [], []
+        def create():
+            client = len(self.created)
+            self.created.append(client)
+            return client
+        return sessions.ClientPool(create, close=self.closed.append,
+                                   **kwargs)
+
+    def test_reuse(self):
+        pool = self.pool()
+        a = pool.checkout()
+        b = pool.checkout()
+        pool.checkin(a)
+        self.assertEqual(pool.checkout(), a)
+        pool.checkin(a)
+        pool.checkin(b)
+        # The most recently used client is reused first.
+        self.assertEqual(pool.checkout(), b)
+        self.assertEqual((self.created, pool.size), ([0, 1], 2))
+
+    def test_bounded(self):
+        pool = self.pool(maxsize=1, timeout=0.1)
+        a = pool.checkout()
+        self.assertRaises(RuntimeError, pool.checkout)
+
+        got = []
+        def other():
+            got.append(pool.checkout())
+        pool.timeout = None
+        t = threading.Thread(target=other)
+        t.start()
+        time.sleep(0.1)
+        self.assertEqual(got, [])
+        pool.checkin(a)
+        t.join()
+        self.assertEqual((got, self.created), ([a], [0]))
+
+    def test_health(self):
+        pool = self.pool(max_idle=60)
+        a = pool.checkout()
+        b = pool.checkout()
+        pool.checkin(a)
+        pool.checkin(b)
+        # Idle for too long.
+        pool.idle[0] = (a, time.time() - 120)
+        self.assertEqual(pool.checkout(), b)
+        self.assertEqual((self.closed, pool.size), ([a], 1))
+
+        # Failed health check.
+        pool.checkin(b)
+        pool.check = lambda client: client != b
+        self.assertEqual(pool.checkout(), 2)
+        self.assertEqual((self.closed, pool.size), ([a, b], 1))
+
+        # Broken, or failed to connect.
+        pool.discard(2)
+        self.assertEqual(pool.size, 0)
+        def create():
+            raise ValueError()
+        pool.create = create
+        self.assertRaises(ValueError, pool.checkout)
+        self.assertEqual(pool.size, 0)
+
+
+class FakePostgresConnection(object):
+    """A stand-in for a DB-API connection to PostgreSQL, using SQLite."""
+
+    def __init__(self, database):
+        self.db = sessions.sqlite3.connect(
+            database, detect_types=sessions.sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False)
+        if not py3k:
+            self.db.text_factory = str
+        self.closed = False
+
+    def cursor(self):
+        return FakePostgresCursor(self.db.cursor())
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+        self.closed = True
+
+
+class FakePostgresCursor(object):
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, args=()):
+        sql = sql.replace('%s', '?').replace(' for update', '')
+        self._cursor.execute(sql, args)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def rowcount(self):
+        return self._cursor.rowcount
+    rowcount = property(rowcount)
+
+    def close(self):
+        self._cursor.close()
+
+
+class PostgresqlSessionTest(SessionStorageTest, unittest.TestCase):
+
+    storage_class = sessions.PostgresqlSession
+    database = os.path.join(localDir, 'postgresql_sessions.db')
+
+    def setup_storage(self):
+        if sessions.sqlite3 is None:
+            return self.skipTest("sqlite3 is not available")
+        db = FakePostgresConnection(self.database)
+        # The schema in PostgresqlSession's docstring.
+        db.cursor().execute('create table session (id varchar(40), '
+                            'data bytea, expiration_time timestamp)')
+        db.close()
+        self.connections = []
+        def get_db():
+            self.connections.append(FakePostgresConnection(self.database))
+            return self.connections[-1]
+        sessions.PostgresqlSession.setup(get_db=get_db, pool_size=2)
+
+    def teardown_storage(self):
+        cls = sessions.PostgresqlSession
+        cls.pool.clear()
+        cls.pool = None
+        del cls.get_db
+        if os.path.exists(self.database):
+            os.unlink(self.database)
+
+    def test_pooled(self):
+        pool = sessions.PostgresqlSession.pool
+        sess = self.session()
+        sess['a'] = 1
+        sess.save()
+        # Releasing the lock commits and checks the connection in.
+        self.assertEqual((pool.size, len(pool.idle)), (1, 1))
+
+        sess = self.session(sess.id)
+        self.assertEqual(sess.missing, False)
+        self.assertEqual(sess['a'], 1)
+        other = self.session()
+        self.assertEqual((pool.size, len(pool.idle)), (2, 0))
+        other.release_lock()
+        sess.release_lock()
+        self.assertEqual((pool.size, len(pool.idle)), (2, 2))
+        self.assertEqual(len(self.connections), 2)
+
+        # Closed connections are not checked out again.
+        self.connections[0].close()
+        self.connections[1].close()
+        sess = self.session(sess.id)
+        self.assertEqual(sess['a'], 1)
+        sess.release_lock()
+        self.assertEqual((pool.size, len(self.connections)), (1, 3))
+
+    def test_clean_up_connection(self):
+        # Cleaning up (in another thread) while a request holds the lock
+        # doesn't touch the request's connection.
+        sess = self.session()
+        db = sess._db
+        t = threading.Thread(target=sess.clean_up)
+        t.start()
+        t.join()
+        self.assertTrue(sess._db is db)
+        pool = sessions.PostgresqlSession.pool
+        self.assertEqual((pool.size, len(pool.idle)), (2, 1))
+        self.assertFalse(db in [c for c, t in pool.idle])
+        sess.release_lock()
+        self.assertEqual((pool.size, len(pool.idle)), (2, 2))
+
+
+class MemcachedStandIn(threading.Thread):
+    """A stand-in memcached server, speaking enough of its text protocol
+    (get, set and delete) for MemcachedSession."""
+
+    def __init__(self):
+        threading.Thread.__init__(self)
+        self.setDaemon(True)
+        self.data = {}
+        self.lock = threading.Lock()
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.bind(('127.0.0.1', 0))
+        self.socket.listen(5)
+        self.port = self.socket.getsockname()[1]
+
+    def run(self):
+        while True:
+            try:
+                conn, addr = self.socket.accept()
+            except socket.error:
+                return
+            t = threading.Thread(target=self.handle, args=(conn,))
+            t.setDaemon(True)
+            t.start()
+
+    def stop(self):
+        self.socket.close()
+
+    def handle(self, conn):
+        rfile = conn.makefile('rb')
+        try:
+            while True:
+                line = rfile.readline()
+                if not line:
+                    return
+                words = line.split()
+                if not words:
+                    continue
+                command, args = words[0], words[1:]
+                if command == ntob('get'):
+                    response = []
+                    for key in args:
+                        self.lock.acquire()
+                        try:
+                            item = self.data.get(key)
+                            if item is not None and 0 < item[1] < time.time():
+                                del self.data[key]
+                                item = None
+                        finally:
+                            self.lock.release()
+                        if item is not None:
+                            flags, exptime, value = item
+                            response.append(ntob('VALUE ') + key +
+                                            ntob(' %d %d\r\n' % (flags, len(value)))
+                                            + value + ntob('\r\n'))
+                    conn.sendall(ntob('').join(response) + ntob('END\r\n'))
+                elif command == ntob('set'):
+                    key, flags, exptime, length = args[:4]
+                    value = rfile.read(int(length) + 2)[:-2]
+                    self.lock.acquire()
+                    try:
+                        self.data[key] = (int(flags), int(exptime), value)
+                    finally:
+                        self.lock.release()
+                    conn.sendall(ntob('STORED\r\n'))
+                elif command == ntob('delete'):
+                    self.lock.acquire()
+                    try:
+                        found = self.data.pop(args[0], None)
+                    finally:
+                        self.lock.release()
+                    if found is None:
+                        conn.sendall(ntob('NOT_FOUND\r\n'))
+                    else:
+                        conn.sendall(ntob('DELETED\r\n'))
+                else:
+                    conn.sendall(ntob('ERROR\r\n'))
+        finally:
+            rfile.close()
+            conn.close()
+
+
+class MemcachedStandInTest(unittest.TestCase):
+
+    def test_protocol(self):
+        server = MemcachedStandIn()
+        server.start()
+        try:
+            s = socket.create_connection(('127.0.0.1', server.port))
+            f = s.makefile('rb')
+            try:
+                s.sendall(ntob('set k 3 0 5\r\nhello\r\n'))
+                self.assertEqual(f.readline(), ntob('STORED\r\n'))
+                s.sendall(ntob('get k missing\r\n'))
+                self.assertEqual(f.readline(), ntob('VALUE k 3 5\r\n'))
+                self.assertEqual(f.readline(), ntob('hello\r\n'))
+                self.assertEqual(f.readline(), ntob('END\r\n'))
+                s.sendall(ntob('delete k 0\r\ndelete k\r\n'))
+                self.assertEqual(f.readline(), ntob('DELETED\r\n'))
+                self.assertEqual(f.readline(), ntob('NOT_FOUND\r\n'))
+            finally:
+                f.close()
                 s.close()
-            raise
-        break
-except (ImportError, socket.error):
+        finally:
+            server.stop()
+
+
+try:
+    import memcache
+except ImportError:
     class MemcachedSessionTest(helper.CPWebCase):
         setup_server = staticmethod(setup_server)
 
         def test(self):
-            return self.skip("memcached not reachable ")
+            return self.skip("memcache not installed ")
 else:
+    def setup_memcached_server():
+        # Use a real memcached if there is one; else, the stand-in.
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.settimeout(1.0)
+        try:
+            try:
+                s.connect(('127.0.0.1', 11211))
+            except socket.error:
+                server = MemcachedStandIn()
+                server.start()
+                sessions.MemcachedSession.servers = [
+                    '127.0.0.1:%d' % server.port]
+        finally:
+            s.close()
+        setup_server()
+
     class MemcachedSessionTest(helper.CPWebCase):
-        setup_server = staticmethod(setup_server)
+        setup_server = staticmethod(setup_memcached_server)
 
         def test_0_Session(self):
             self.getPage('/setsessiontype/memcached')
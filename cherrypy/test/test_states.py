@@ -322,6 +322,50 @@ class PluginTests(helper.CPWebCase):
             self.fail("Daemonized parent process failed to exit cleanly.")
 
 
+    def test_worker_processes(self):
+        if not hasattr(os, 'fork'):
+            return self.skip("skipped (no os.fork) ")
+        try:
+            from signal import SIGKILL, SIGTERM
+        except ImportError:
+            return self.skip("skipped (no SIGKILL) ")
+
+        p = helper.CPProcess(ssl=(self.scheme.lower()=='https'), workers=2)
+        p.write_conf(
+             extra='test_case_name: "test_worker_processes"')
+        p.start(imports='cherrypy.test._test_states_demo')
+        try:
+            # Pages are served by the workers, never by the master.
+            pids = set()
+            for trial in range(20):
+                self.getPage("/pid")
+                self.assertStatus(200)
+                pids.add(int(self.body))
+                self.getPage("/late_start")
+                self.assertBody("True")
+            self.assertNotEqual(p.get_pid() in pids, True)
+            self.assertEqual(len(pids) in (1, 2), True)
+
+            # A dead worker is replaced.
+            dead = pids.pop()
+            os.kill(dead, SIGKILL)
+            time.sleep(3)
+            for trial in range(20):
+                self.getPage("/pid")
+                self.assertStatus(200)
+                self.assertNotEqual(int(self.body), dead)
+                # The new worker ran the start listeners which follow
+                # the WorkerProcesses plugin's, as the first ones did.
+                self.getPage("/late_start")
+                self.assertBody("True")
+        finally:
+            # Stopping the master stops the workers.
+            os.kill(p.get_pid(), SIGTERM)
+            p.join()
+        for pid in pids:
+            self.assertRaises(OSError, os.kill, pid, 0)
+
+
 class SignalHandlingTests(helper.CPWebCase):
     def test_SIGHUP_tty(self):
         # When not daemonized, SIGHUP should shut down the server.
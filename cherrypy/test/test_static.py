@@ -1,13 +1,16 @@
 from cherrypy._cpcompat import HTTPConnection, HTTPSConnection, ntob
 from cherrypy._cpcompat import BytesIO
 
+import gzip
 import os
 curdir = os.path.join(os.getcwd(), os.path.dirname(__file__))
 has_space_filepath = os.path.join(curdir, 'static', 'has space.html')
 bigfile_filepath = os.path.join(curdir, "static", "bigfile.log")
+gzfile_filepath = os.path.join(curdir, "static", "index.html.gz")
 BIGFILE_SIZE = 1024 * 1024
 
 import cherrypy
+from cherrypy import wsgiserver
 from cherrypy.lib import static
 from cherrypy.test import helper
 
@@ -19,6 +22,10 @@ class StaticTest(helper.CPWebCase):
             open(has_space_filepath, 'wb').write(ntob('Hello, world\r\n'))
         if not os.path.exists(bigfile_filepath):
             open(bigfile_filepath, 'wb').write(ntob("x" * BIGFILE_SIZE))
+        if not os.path.exists(gzfile_filepath):
+            gz = gzip.GzipFile(gzfile_filepath, 'wb')
+            gz.write(ntob('Hello, world\r\n'))
+            gz.close()
 
         class Root:
 
@@ -75,6 +82,12 @@ class StaticTest(helper.CPWebCase):
                 'tools.staticdir.dir': 'static',
                 'tools.staticdir.index': 'index.html',
             },
+            '/gzstatic': {
+                'tools.staticdir.on': True,
+                'tools.staticdir.root': curdir,
+                'tools.staticdir.dir': 'static',
+                'tools.staticdir.precompressed': True,
+            },
             '/error': {
                 'tools.staticdir.on': True,
                 'request.show_tracebacks': True,
@@ -100,7 +113,7 @@ class StaticTest(helper.CPWebCase):
 
 
     def teardown_server():
-        for f in (has_space_filepath, bigfile_filepath):
+        for f in (has_space_filepath, bigfile_filepath, gzfile_filepath):
             if os.path.exists(f):
                 try:
                     os.unlink(f)
@@ -160,6 +173,46 @@ class StaticTest(helper.CPWebCase):
         self.assertMatchesBody("This resource .* <a href='%s/docroot/'>"
                                "%s/docroot/</a>." % (self.base(), self.base()))
 
+    def test_precompressed(self):
+        stats = static.precompressed_stats
+        hits, misses = stats['hits'], stats['misses']
+
+        self.getPage("/gzstatic/index.html",
+                     headers=[('Accept-Encoding', 'gzip')])
+        self.assertStatus('200 OK')
+        self.assertHeader('Content-Type', 'text/html')
+        self.assertHeader('Content-Encoding', 'gzip')
+        self.assertHeader('Vary', 'Accept-Encoding')
+        self.assertHeader('Content-Length', os.path.getsize(gzfile_filepath))
+        self.assertEqual(cherrypy.lib.encoding.decompress(self.body),
+                         ntob('Hello, world\r\n'))
+        self.assertEqual(stats['hits'], hits + 1)
+
+        # Clients which don't accept gzip get the original file.
+        self.getPage("/gzstatic/index.html")
+        self.assertNoHeader('Content-Encoding')
+        self.assertHeader('Vary', 'Accept-Encoding')
+        self.assertBody('Hello, world\r\n')
+
+        # So do those which do, when there is no .gz file...
+        self.getPage("/gzstatic/has%20space.html",
+                     headers=[('Accept-Encoding', 'gzip')])
+        self.assertNoHeader('Content-Encoding')
+        self.assertBody('Hello, world\r\n')
+        self.assertEqual(stats['misses'], misses + 1)
+
+        # ...or when it is older than the original.
+        mtime = os.path.getmtime(os.path.join(curdir, 'static', 'index.html'))
+        os.utime(gzfile_filepath, (mtime - 60, mtime - 60))
+        try:
+            self.getPage("/gzstatic/index.html",
+                         headers=[('Accept-Encoding', 'gzip')])
+            self.assertNoHeader('Content-Encoding')
+            self.assertBody('Hello, world\r\n')
+            self.assertEqual(stats['misses'], misses + 2)
+        finally:
+            os.utime(gzfile_filepath, None)
+
     def test_config_errors(self):
         # Check that we get an error if no .file or .dir
         self.getPage("/error/thing.html")
@@ -208,6 +261,37 @@ class StaticTest(helper.CPWebCase):
         self.assertHeader('Content-Length', 14)
         self.assertMatchesBody('Fee\nfie\nfo\nfum')
 
+    def test_sendfile(self):
+        calls = []
+        sendfile = getattr(os, 'sendfile', None)
+        if sendfile is not None:
+            def counting_sendfile(*args):
+                calls.append(args)
+                return sendfile(*args)
+            os.sendfile = counting_sendfile
+        try:
+            self.getPage("/static/bigfile.log")
+            self.assertStatus('200 OK')
+            self.assertHeader('Content-Length', BIGFILE_SIZE)
+            if self.body != ntob("x" * BIGFILE_SIZE):
+                self.fail("Body != 'x' * %d. Got %r instead (%d bytes)." %
+                          (BIGFILE_SIZE, self.body[:50], len(self.body)))
+
+            # A single range is sent the same way.
+            self.getPage("/static/has%20space.html",
+                         headers=[('Range', 'bytes=7-11')])
+            self.assertStatus('206 Partial Content')
+            self.assertHeader('Content-Range', 'bytes 7-11/14')
+            self.assertBody('world')
+        finally:
+            if sendfile is not None:
+                os.sendfile = sendfile
+
+        if (sendfile is not None and self.scheme == 'http' and
+            isinstance(cherrypy.server.httpserver,
+                       wsgiserver.CherryPyWSGIServer)):
+            self.assertEqual(len(calls) >= 2, True)
+
     def test_file_stream(self):
         if cherrypy.server.protocol_version != "HTTP/1.1":
             return self.skip()
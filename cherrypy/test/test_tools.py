@@ -57,6 +57,18 @@ class ToolTests(helper.CPWebCase):
 
         tools.numerify = NumTool('before_finalize', numerify)
 
+        class CountingTool(cherrypy.Tool):
+            _setup_hooks_only = True
+            setups = 0
+
+            def _setup(self):
+                self.setups += 1
+                cherrypy.Tool._setup(self)
+
+        def counted(value):
+            cherrypy.response.headers['X-Counted'] = value
+        tools.counted = CountingTool('on_start_resource', counted)
+
         # It's not mandatory to inherit from cherrypy.Tool.
         class NadsatTool:
 
@@ -117,6 +129,19 @@ class ToolTests(helper.CPWebCase):
                 return "Howdy earth!"
             index.exposed = True
 
+            def counted(self):
+                return "counted"
+            counted.exposed = True
+            counted._cp_config = {'tools.counted.on': True,
+                                  'tools.counted.value': 'yes'}
+
+            def counted_fresh(self):
+                return "counted"
+            counted_fresh.exposed = True
+            counted_fresh._cp_config = {'tools.counted.on': True,
+                                        'tools.counted.value': 'fresh',
+                                        'request.reuse_config': False}
+
             def tarfile(self):
                 cherrypy.response.output.write(ntob('I am '))
                 cherrypy.response.output.write(ntob('a tarfile'))
@@ -369,6 +394,27 @@ class ToolTests(helper.CPWebCase):
                      method="POST", body=content)
         self.assertBody(content)
 
+    def testReuseConfig(self):
+        app = cherrypy.tree.apps['']
+        app.config_cache.clear()
+        setups = tools.counted.setups
+        for trial in range(3):
+            self.getPage("/counted")
+            self.assertHeader('X-Counted', 'yes')
+        # The tool was set up once; later requests reused its hooks.
+        self.assertEqual(tools.counted.setups, setups + 1)
+
+        # Merging config clears the cache.
+        app.merge({'/counted': {'tools.counted.value': 'merged'}})
+        self.getPage("/counted")
+        self.assertHeader('X-Counted', 'merged')
+        self.assertEqual(tools.counted.setups, setups + 2)
+
+        for trial in range(2):
+            self.getPage("/counted_fresh")
+            self.assertHeader('X-Counted', 'fresh')
+        self.assertEqual(tools.counted.setups, setups + 4)
+
     def testHandlerWrapperTool(self):
         self.getPage("/tarfile")
         self.assertBody("I am a tarfile")
@@ -408,3 +454,47 @@ class SessionAuthTest(unittest.TestCase):
         res = sa.login_screen(None, username=unicodestr('nobody'),
             password=unicodestr('anypass'))
         self.assertIsInstance(res, bytestr)
+
+
+class HookMapTest(unittest.TestCase):
+
+    def test_copy_on_attach(self):
+        from cherrypy._cprequest import HookMap
+        calls = []
+        def hook(name):
+            return lambda: calls.append(name)
+
+        base = HookMap(['on_start_resource'])
+        base.attach('on_start_resource', hook('base'), priority=60)
+        request_hooks = base.copy()
+        # Nothing attached yet: the lists are shared.
+        self.assertTrue(dict.__getitem__(request_hooks, 'on_start_resource')
+                        is dict.__getitem__(base, 'on_start_resource'))
+
+        request_hooks.attach('on_start_resource', hook('late'), priority=60)
+        request_hooks.attach('on_start_resource', hook('early'), priority=10)
+        request_hooks.run('on_start_resource')
+        self.assertEqual(calls, ['early', 'base', 'late'])
+
+        # The original map was left alone, and stays copy-on-write itself.
+        del calls[:]
+        base.run('on_start_resource')
+        self.assertEqual(calls, ['base'])
+        other = base.copy()
+        base.attach('on_start_resource', hook('global'))
+        del calls[:]
+        other.run('on_start_resource')
+        self.assertEqual(calls, ['base'])
+
+    def test_run_sorts_appended_hooks(self):
+        from cherrypy._cprequest import Hook, HookMap
+        calls = []
+        def hook(name):
+            return lambda: calls.append(name)
+
+        hooks = HookMap(['on_end_request'])
+        hooks.attach('on_end_request', hook('b'), priority=50)
+        hooks['on_end_request'].append(Hook(hook('a'), priority=10))
+        hooks['on_end_request'].append(Hook(hook('c'), priority=50))
+        hooks.run('on_end_request')
+        self.assertEqual(calls, ['a', 'b', 'c'])
@@ -0,0 +1,689 @@
+"""Unit tests for components of cherrypy.wsgiserver."""
+
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+try:
+    import ssl
+except ImportError:
+    ssl = None
+
+from cherrypy._cpcompat import BytesIO, ntob
+from cherrypy import wsgiserver
+from cherrypy.process import servers, wspbus
+
+# The wsgiserver2 or wsgiserver3 module, for what it doesn't export.
+server_module = sys.modules[wsgiserver.HTTPRequest.__module__]
+
+
+class FakeWorker(object):
+
+    def __init__(self, busy=False, alive=True):
+        self.conn = busy and object() or None
+        self.alive = alive
+
+    def isAlive(self):
+        return self.alive
+
+
+class FakePool(object):
+
+    def __init__(self, size, busy=0, qsize=0, min=2, max=10):
+        self._threads = ([FakeWorker(True) for i in range(busy)] +
+                         [FakeWorker() for i in range(size - busy)])
+        self.qsize = qsize
+        self.min = min
+        self.max = max
+
+    def _get_idle(self):
+        return len([t for t in self._threads if t.conn is None])
+    idle = property(_get_idle)
+
+    def grow(self, amount):
+        budget = max(self.max - len(self._threads), 0)
+        self._threads.extend([FakeWorker() for i in range(min(amount, budget))])
+
+    def shrink(self, amount):
+        del self._threads[-amount:]
+
+
+class FakeServer(object):
+
+    def __init__(self, pool):
+        self.requests = pool
+        self.stats = {'Enabled': False}
+
+
+class ThreadPoolAutoscalerTests(unittest.TestCase):
+
+    def scaler(self, pool, **kwargs):
+        return wsgiserver.ThreadPoolAutoscaler(FakeServer(pool), **kwargs)
+
+    def test_grow_on_backlog(self):
+        pool = FakePool(4, busy=4, qsize=3)
+        scaler = self.scaler(pool)
+        scaler.sample()
+        # 4 threads at 100% want ceil(4 / .75) = 6, plus the 3 queued conns.
+        self.assertEqual(len(pool._threads), 9)
+        self.assertEqual(scaler.grown, 5)
+
+    def test_grow_respects_max(self):
+        pool = FakePool(8, busy=8, qsize=20, max=10)
+        scaler = self.scaler(pool)
+        scaler.sample()
+        self.assertEqual(len(pool._threads), 10)
+        self.assertEqual(scaler.grown, 2)
+
+    def test_hysteresis(self):
+        # Utilization between target * hysteresis and target: no change.
+        pool = FakePool(10, busy=5)
+        scaler = self.scaler(pool, cooldown=0)
+        scaler.sample()
+        self.assertEqual(len(pool._threads), 10)
+        self.assertEqual((scaler.grown, scaler.shrunk), (0, 0))
+
+    def test_shrink_after_cooldown(self):
+        pool = FakePool(10, busy=1, min=2)
+        scaler = self.scaler(pool, cooldown=3600)
+        scaler.last_resize = 0
+        scaler.sample()
+        # ceil(10 * .1 / .75) = 2 threads.
+        self.assertEqual(len(pool._threads), 2)
+        self.assertEqual(scaler.shrunk, 8)
+
+        # A second idle sample inside the cooldown leaves the pool alone.
+        pool._threads.extend([FakeWorker() for i in range(4)])
+        scaler.sample()
+        self.assertEqual(len(pool._threads), 6)
+
+    def test_dead_threads(self):
+        # Threads which have exited aren't idle capacity: 4 busy live
+        # threads are 100% utilized, however many dead ones there are.
+        pool = FakePool(4, busy=4)
+        pool._threads.extend([FakeWorker(alive=False) for i in range(4)])
+        scaler = self.scaler(pool, cooldown=0)
+        scaler.sample()
+        self.assertEqual(scaler.shrunk, 0)
+        self.assertEqual(scaler.grown, 2)
+
+    def test_idle(self):
+        pool = wsgiserver.ThreadPool(None)
+        pool._threads = [FakeWorker(), FakeWorker(True),
+                         FakeWorker(alive=False)]
+        self.assertEqual(pool.idle, 1)
+
+    def test_shrink_respects_min(self):
+        pool = FakePool(10, busy=0, min=4)
+        scaler = self.scaler(pool, cooldown=0)
+        scaler.sample()
+        self.assertEqual(len(pool._threads), 4)
+
+
+class FileWrapperTests(unittest.TestCase):
+
+    def test_blocks(self):
+        wrapper = wsgiserver.FileWrapper(BytesIO(ntob('abcdefg')), 3)
+        self.assertEqual(list(wrapper), [ntob('abc'), ntob('def'), ntob('g')])
+
+    def test_count(self):
+        f = BytesIO(ntob('abcdefg'))
+        f.seek(1)
+        wrapper = wsgiserver.FileWrapper(f, 2, count=3)
+        self.assertEqual(list(wrapper), [ntob('bc'), ntob('d')])
+        self.assertEqual(f.tell(), 4)
+
+    def test_fileno(self):
+        # In-memory files have no descriptor to hand to os.sendfile.
+        wrapper = wsgiserver.FileWrapper(BytesIO(ntob('abc')))
+        self.assertEqual(wrapper.fileno(), None)
+        wrapper.close()
+        self.assertEqual(wrapper.filelike.closed, True)
+
+
+class FakeSocket(object):
+    """A socket which returns the given chunks, one per recv, then EOF."""
+
+    def __init__(self, *chunks):
+        self.chunks = [ntob(c) for c in chunks]
+
+    def recv(self, size):
+        if not self.chunks:
+            return ntob('')
+        chunk = self.chunks.pop(0)
+        if len(chunk) > size:
+            self.chunks.insert(0, chunk[size:])
+            chunk = chunk[:size]
+        return chunk
+
+    def recv_into(self, buf, nbytes=0):
+        chunk = self.recv(nbytes or len(buf))
+        buf[:len(chunk)] = chunk
+        return len(chunk)
+
+    def readable(self):
+        return True
+
+    def _decref_socketios(self):
+        pass
+
+
+class FakeHTTPServer(object):
+
+    ssl_adapter = None
+    protocol = 'HTTP/1.1'
+    max_request_header_size = 0
+    max_request_body_size = 0
+    coalesce_size = 0
+    server_name = 'localhost'
+
+
+class RequestHeadTests(unittest.TestCase):
+
+    def request(self, *chunks, **kwargs):
+        server = FakeHTTPServer()
+        server.max_request_header_size = kwargs.get('maxlen', 0)
+        self.sock = FakeSocket(*chunks)
+        conn = wsgiserver.HTTPConnection(server, self.sock)
+        return wsgiserver.HTTPRequest(server, conn)
+
+    def test_one_chunk(self):
+        req = self.request('GET / HTTP/1.1\r\nHost: a\r\n\r\nGET /next')
+        self.assertEqual(req.read_request_head(),
+                         ntob('GET / HTTP/1.1\r\nHost: a\r\n\r\n'))
+        self.assertTrue(req.started_request)
+        # Pipelined bytes are left for the next request.
+        self.assertEqual(req.conn.rfile.read(9), ntob('GET /next'))
+
+    def test_split_chunks(self):
+        # The empty line straddles two reads.
+        req = self.request('GET / HTTP/1.1\r\nHo', 'st: a\r\n\r', '\nbody')
+        self.assertEqual(req.read_request_head(),
+                         ntob('GET / HTTP/1.1\r\nHost: a\r\n\r\n'))
+        self.assertEqual(req.conn.rfile.read(4), ntob('body'))
+
+        req = self.request('GET / HTTP/1.1\r', '\n\r\n')
+        self.assertEqual(req.read_request_head(),
+                         ntob('GET / HTTP/1.1\r\n\r\n'))
+
+    def test_end_of_stream(self):
+        req = self.request()
+        self.assertEqual(req.read_request_head(), None)
+        self.assertFalse(req.started_request)
+
+        req = self.request('GET / HTTP/1.1\r\nHost: a\r\n')
+        self.assertEqual(req.read_request_head(),
+                         ntob('GET / HTTP/1.1\r\nHost: a\r\n'))
+
+    def test_bare_lf(self):
+        # Don't wait for an empty line which will never come.
+        req = self.request('GET / HTTP/1.1\nHost: a\n', '\n')
+        self.assertEqual(req.read_request_head(),
+                         ntob('GET / HTTP/1.1\nHost: a\n'))
+        self.assertEqual(len(self.sock.chunks), 1)
+
+    def test_max_size(self):
+        req = self.request('GET / HTTP/1.1\r\n', 'From: xxxxxxxxxx\r\n\r\n',
+                           maxlen=20)
+        try:
+            req.read_request_head()
+        except wsgiserver.MaxSizeExceeded:
+            self.assertEqual(sys.exc_info()[1].args[0],
+                             ntob('GET / HTTP/1.1\r\nFrom'))
+        else:
+            self.fail("MaxSizeExceeded not raised")
+
+        # A head of exactly maxlen bytes is allowed.
+        req = self.request('GET / HTTP/1.1\r\nA: b\r\n\r\n', maxlen=24)
+        self.assertEqual(len(req.read_request_head()), 24)
+
+    def test_parse_request_head(self):
+        req = self.request('\r\nGET /a%20b?x=1 HTTP/1.1\r\n'
+                           'host: a\r\nAccept: x\r\nACCEPT: y\r\n'
+                           'X-Custom-thing:  v \r\n\r\n')
+        req.parse_request()
+        self.assertTrue(req.ready)
+        self.assertEqual(req.method, ntob('GET'))
+        self.assertEqual(req.path, ntob('/a b'))
+        self.assertEqual(req.qs, ntob('x=1'))
+        self.assertEqual(req.inheaders, {ntob('Host'): ntob('a'),
+                                         ntob('Accept'): ntob('x, y'),
+                                         ntob('X-Custom-Thing'): ntob('v')})
+
+
+class ParseHeadersTests(unittest.TestCase):
+
+    def test_same_as_read_headers(self):
+        block = ntob('Host: a\r\nacCept: text/html\r\nAccept: */*\r\n'
+                     'content-type: text/plain\r\nX-Thing : 1\r\n'
+                     'Cookie: a=b; c=d\r\n\r\n')
+        self.assertEqual(server_module.parse_headers(block),
+                         server_module.read_headers(BytesIO(block)))
+
+    def test_continuation(self):
+        block = ntob('Accept: a\r\n b\r\nX-Y: 1\r\n\t2\r\n\r\n')
+        self.assertEqual(server_module.parse_headers(block),
+                         {ntob('Accept'): ntob('a, b'), ntob('X-Y'): ntob('2')})
+
+    def test_errors(self):
+        parse = server_module.parse_headers
+        for block, msg in [
+                ('A: b\r\n\n', "HTTP requires CRLF terminators"),
+                ('A: b\r\nC: d', "HTTP requires CRLF terminators"),
+                ('A: b\r\n', "Illegal end of headers."),
+                ('', "Illegal end of headers."),
+                ('A b\r\n\r\n', "Illegal header line."),
+                (' b\r\n\r\n', "Illegal continuation line."),
+                ]:
+            try:
+                parse(ntob(block))
+            except ValueError:
+                self.assertEqual(sys.exc_info()[1].args[0], msg)
+            else:
+                self.fail("%r parsed" % block)
+        self.assertEqual(parse(ntob('\r\n')), {})
+
+
+class FakeWFile(object):
+
+    def __init__(self):
+        self.sends = []
+
+    def sendall(self, data):
+        self.sends.append(data)
+    write = sendall
+
+
+class FakeGatherSocket(object):
+    """A socket with sendmsg, which sends at most limit bytes per call."""
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.sends = []
+
+    def sendmsg(self, buffers):
+        data = ntob('').join(buffers)[:self.limit]
+        self.sends.append(data)
+        return len(data)
+
+
+class FakeConn(object):
+
+    def __init__(self, socket=None):
+        self.wfile = FakeWFile()
+        self.socket = socket
+
+
+class ResponseWriteTests(unittest.TestCase):
+
+    def request(self, coalesce_size=0, socket=None):
+        server = FakeHTTPServer()
+        server.coalesce_size = coalesce_size
+        req = wsgiserver.HTTPRequest(server, FakeConn(socket))
+        req.status = ntob('200 OK')
+        req.method = ntob('GET')
+        req.response_protocol = 'HTTP/1.1'
+        req.outheaders = [(ntob('Content-Length'), ntob('10'))]
+        req.rfile = BytesIO()
+        req.sent_headers = True
+        req.send_headers()
+        return req
+
+    def sends(self, req):
+        if req.conn.socket is not None:
+            return req.conn.socket.sends + req.conn.wfile.sends
+        return req.conn.wfile.sends
+
+    def test_headers_go_with_first_chunk(self):
+        req = self.request()
+        self.assertEqual(self.sends(req), [])
+        req.write(ntob('hello'))
+        self.assertEqual(len(self.sends(req)), 1)
+        self.assertTrue(self.sends(req)[0].endswith(ntob('\r\n\r\nhello')))
+        req.write(ntob('world'))
+        self.assertEqual(self.sends(req)[1:], [ntob('world')])
+
+    def test_coalesce(self):
+        req = self.request(coalesce_size=8192)
+        for i in range(5):
+            req.write(ntob('ab'))
+        self.assertEqual(self.sends(req), [])
+        req.flush()
+        self.assertEqual(len(self.sends(req)), 1)
+        self.assertTrue(self.sends(req)[0].endswith(ntob('\r\n\r\nababababab')))
+        req.flush()
+        self.assertEqual(len(self.sends(req)), 1)
+
+        # A chunk which fills the buffer sends it all.
+        req.write(ntob('x'))
+        req.write(ntob('y' * 8192))
+        self.assertEqual(self.sends(req)[1:], [ntob('x') + ntob('y' * 8192)])
+
+        # So does an empty chunk.
+        req.write(ntob('z'))
+        req.write(ntob(''))
+        self.assertEqual(self.sends(req)[2:], [ntob('z')])
+
+    def test_chunked(self):
+        req = self.request(coalesce_size=8192)
+        req.chunked_write = True
+        req.write(ntob('abc'))
+        req.write(ntob('0123456789abcdef'))
+        req.flush()
+        self.assertTrue(self.sends(req)[0].endswith(
+            ntob('\r\n\r\n3\r\nabc\r\n10\r\n0123456789abcdef\r\n')))
+
+    def test_gather(self):
+        if not hasattr(socket.socket, 'sendmsg'):
+            return
+        req = self.request(socket=FakeGatherSocket(limit=4))
+        req.write(ntob('hello'))
+        sends = self.sends(req)
+        if req.conn.socket.sends:
+            # Python 3 gathers the pieces with sendmsg, and sends what
+            # it didn't take with wfile.
+            self.assertEqual(len(sends[0]), 4)
+            self.assertEqual(len(sends), 2)
+        self.assertTrue(ntob('').join(sends).endswith(ntob('\r\n\r\nhello')))
+
+
+class FakeSSLAdapter(object):
+    """An ssl_adapter which records each socket it wraps, and returns it."""
+
+    def __init__(self, error=None, environ=None):
+        self.error = error
+        self.environ = environ or {'HTTPS': 'on'}
+        self.wrapped = []
+
+    def wrap(self, sock):
+        self.wrapped.append((sock, sock.gettimeout()))
+        if self.error is not None:
+            raise self.error
+        return sock, self.environ.copy()
+
+    def makefile(self, sock, mode='r', bufsize=-1):
+        makefile = getattr(server_module, 'CP_makefile', None)
+        if makefile is None:
+            makefile = server_module.CP_fileobject
+        return makefile(sock, mode, bufsize)
+
+
+class FakeListener(object):
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def accept(self):
+        return self.sock, ('127.0.0.1', 54321)
+
+
+class FakeQueue(list):
+
+    qsize = 0
+    put = list.append
+
+
+class HandshakeTests(unittest.TestCase):
+
+    def setUp(self):
+        import socket
+        self.sock, self.client = socket.socketpair()
+
+    def tearDown(self):
+        self.sock.close()
+        self.client.close()
+
+    def server(self, adapter):
+        server = wsgiserver.HTTPServer(('127.0.0.1', 0), None,
+                                       server_name='localhost')
+        server.ssl_adapter = adapter
+        server.socket = FakeListener(self.sock)
+        server.requests = FakeQueue()
+        server.ready = True
+        return server
+
+    def test_tick_does_not_wrap(self):
+        adapter = FakeSSLAdapter()
+        server = self.server(adapter)
+        server.ssl_handshake_timeout = 3
+        server.tick()
+        self.assertEqual(adapter.wrapped, [])
+        conn = server.requests[0]
+        self.assertEqual(conn.handshake_pending, True)
+        self.assertEqual(conn.remote_addr, '127.0.0.1')
+
+        self.assertEqual(conn.handshake(), True)
+        self.assertEqual(adapter.wrapped, [(self.sock, 3)])
+        self.assertEqual(conn.handshake_pending, False)
+        self.assertEqual(conn.ssl_env, {'HTTPS': 'on'})
+        self.assertEqual(self.sock.gettimeout(), server.timeout)
+
+    def test_plain_http(self):
+        server = self.server(FakeSSLAdapter(server_module.NoSSLError()))
+        server.tick()
+        conn = server.requests[0]
+        self.assertEqual(conn.handshake(), False)
+        self.assertEqual(conn.linger, True)
+        conn.wfile.flush()
+        self.assertTrue(self.client.recv(1024).startswith(
+            ntob('HTTP/1.1 400 Bad Request\r\n')))
+
+    def test_failed(self):
+        import socket
+        server = self.server(FakeSSLAdapter(socket.timeout('timed out')))
+        server.tick()
+        conn = server.requests[0]
+        self.assertEqual(conn.handshake(), False)
+        self.assertEqual(conn.ssl_env, None)
+
+    def test_stats(self):
+        for resumed in ('Initial', 'Resumed', 'Resumed', None):
+            environ = {'HTTPS': 'on'}
+            if resumed:
+                environ['SSL_SESSION_RESUMED'] = resumed
+            server = self.server(FakeSSLAdapter(environ=environ))
+            server.stats['Enabled'] = True
+            server.tick()
+            self.assertEqual(server.requests[0].handshake(), True)
+            self.assertEqual(server.stats['SSL Full Handshakes'],
+                             int(resumed == 'Initial'))
+            self.assertEqual(server.stats['SSL Resumed Handshakes'],
+                             int(resumed == 'Resumed'))
+
+    def test_no_adapter(self):
+        server = self.server(None)
+        server.tick()
+        self.assertEqual(server.requests[0].handshake_pending, False)
+
+
+def make_certificate(dirname):
+    """Make a self-signed cert and key with the openssl command.
+
+    Return their filenames, or None if there's no openssl to do it.
+    """
+    cert = os.path.join(dirname, 'cert.pem')
+    key = os.path.join(dirname, 'key.pem')
+    try:
+        p = subprocess.Popen(['openssl', 'req', '-x509', '-newkey', 'rsa:2048',
+                              '-nodes', '-keyout', key, '-out', cert,
+                              '-days', '2', '-subj', '/CN=localhost'],
+                             stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    except OSError:
+        return None
+    p.communicate()
+    if p.returncode:
+        return None
+    return cert, key
+
+
+class BuiltinSSLAdapterTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.files = None
+        if ssl is not None and hasattr(ssl, 'SSLContext'):
+            self.files = make_certificate(self.dirname)
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def adapter(self, **kwargs):
+        from cherrypy.wsgiserver.ssl_builtin import BuiltinSSLAdapter
+        adapter = BuiltinSSLAdapter(*self.files, **kwargs)
+        adapter.bind(None)
+        return adapter
+
+    def test_context(self):
+        if self.files is None:
+            return
+        no_ticket = getattr(ssl, 'OP_NO_TICKET', 0x4000)
+        context = self.adapter().context
+        self.assertTrue(isinstance(context, ssl.SSLContext))
+        self.assertFalse(context.options & no_ticket)
+
+        context = self.adapter(ciphers='ECDHE+AESGCM', ecdh_curve='prime256v1',
+                               session_tickets=False).context
+        self.assertTrue(context.options & no_ticket)
+        if hasattr(context, 'get_ciphers'):
+            # The TLS 1.3 suites (TLS_*) aren't set by the cipher list.
+            names = [c['name'] for c in context.get_ciphers()
+                     if not c['name'].startswith('TLS_')]
+            self.assertTrue(names)
+            for name in names:
+                self.assertTrue(name.startswith('ECDHE-'), name)
+                self.assertTrue('GCM' in name, name)
+
+        self.assertRaises(ValueError, self.adapter, ecdh_curve='no-such-curve')
+
+    def test_resumption(self):
+        if self.files is None or not hasattr(ssl.SSLSocket, 'session'):
+            # Clients can only offer a session on Python 3.6+.
+            return
+        # With no tickets, the client resumes from the server's session id
+        # cache, which drops sessions that weren't closed with close_notify.
+        adapter = self.adapter(session_tickets=False)
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(1)
+        server = wsgiserver.HTTPServer(listener.getsockname(), None,
+                                       server_name='localhost')
+        server.ssl_adapter = adapter
+        server.socket = listener
+        server.requests = FakeQueue()
+        server.ready = True
+        server.stats['Enabled'] = True
+
+        environs = []
+        def serve():
+            server.tick()
+            conn = server.requests.pop()
+            if conn.handshake():
+                environs.append(conn.ssl_env)
+            conn.close()
+
+        client_context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+        # TLS 1.3 resumes with tickets only.
+        client_context.options |= getattr(ssl, 'OP_NO_TLSv1_3', 0)
+        session = None
+        try:
+            for i in range(2):
+                t = threading.Thread(target=serve)
+                t.start()
+                client = client_context.wrap_socket(
+                    socket.create_connection(listener.getsockname()),
+                    session=session)
+                session = client.session
+                client.close()
+                t.join(5)
+                self.assertFalse(t.isAlive())
+        finally:
+            listener.close()
+
+        self.assertEqual([e['SSL_SESSION_RESUMED'] for e in environs],
+                         ['Initial', 'Resumed'])
+        self.assertEqual(server.stats['SSL Full Handshakes'], 1)
+        self.assertEqual(server.stats['SSL Resumed Handshakes'], 1)
+
+
+class AdoptTests(unittest.TestCase):
+
+    def test_adopt(self):
+        for family, host in ((socket.AF_INET, '127.0.0.1'),
+                             (socket.AF_INET6, '::1')):
+            try:
+                sock = socket.socket(family, socket.SOCK_STREAM)
+                sock.bind((host, 0))
+            except socket.error:
+                # No IPv6 here.
+                continue
+            sock.listen(1)
+            server = wsgiserver.HTTPServer(sock.getsockname()[:2], None,
+                                           server_name='localhost')
+            server.adopt(os.dup(sock.fileno()))
+            self.assertEqual(server.bind_fd, None)
+            self.assertEqual(server.socket.family, family)
+            self.assertEqual(server.socket.getsockname(), sock.getsockname())
+            server.socket.close()
+            sock.close()
+
+    def test_server_adapter(self):
+        if wspbus.fcntl is None:
+            return
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        bind_addr = sock.getsockname()
+        sock.close()
+
+        def app(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [ntob('hello')]
+
+        bus = wspbus.Bus()
+        bus.execv = True
+        adapter = servers.ServerAdapter(
+            bus, wsgiserver.CherryPyWSGIServer(bind_addr, app), bind_addr)
+        adapter.start()
+        adapter.stop()
+        key = '%s:%s' % bind_addr
+        self.assertTrue(key in bus.passed_fds)
+        fd = bus.passed_fds[key]
+
+        # Between the processes, clients queue up in the socket's backlog.
+        client = socket.create_connection(bind_addr)
+        try:
+            client.sendall(ntob('GET / HTTP/1.0\r\n\r\n'))
+
+            # The new process's adapter serves from the passed socket.
+            bus._pass_fds()
+            bus2 = wspbus.Bus()
+            logs = []
+            bus2.subscribe('log', lambda msg, level: logs.append(msg))
+            adapter2 = servers.ServerAdapter(
+                bus2, wsgiserver.CherryPyWSGIServer(bind_addr, app), bind_addr)
+            adapter2.start()
+            try:
+                self.assertTrue("Taking over the listening socket (fd %s)"
+                                % fd in logs)
+                self.assertEqual(bus2.inherited_fds, {})
+                response = ntob('')
+                while True:
+                    data = client.recv(1024)
+                    if not data:
+                        break
+                    response += data
+                self.assertTrue(response.startswith(ntob('HTTP/1.1 200 OK')))
+                self.assertTrue(response.endswith(ntob('\r\n\r\nhello')))
+            finally:
+                adapter2.stop()
+        finally:
+            client.close()
+            os.environ.pop(wspbus.PASSED_FDS_ENV, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
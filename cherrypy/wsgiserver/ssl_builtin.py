@@ -4,6 +4,22 @@ The ssl module must be importable for SSL functionality.
 
 To use this module, set ``CherryPyWSGIServer.ssl_adapter`` to an instance of
 ``BuiltinSSLAdapter``.
+
+Where the ssl module has ``SSLContext`` (Python 2.7.9+ and 3.2+), the adapter
+makes one context when the server binds and wraps every connection with it,
+so clients can resume their TLS sessions (by session id or session ticket)
+instead of paying for a full handshake each time they reconnect. These
+config entries tune it:
+
+ * ``server.ssl_ciphers``: an OpenSSL cipher list string.
+ * ``server.ssl_ecdh_curve``: the name of the curve for ECDH key exchange,
+   such as 'prime256v1'.
+ * ``server.ssl_session_tickets``: if False, don't issue session tickets
+   (session ids are still cached). Default True.
+
+On Python 3.6+, each request's environ has ``SSL_SESSION_RESUMED`` set to
+'Initial' or 'Resumed', as in mod_ssl, and the server stats count both kinds
+of handshake.
 """
 import socket, errno
 
@@ -69,14 +85,36 @@ class BuiltinSSLAdapter(wsgiserver.SSLAdapter):
     private_key = None
     """The filename of the server's private key file."""
 
+    context = None
+    """The ssl.SSLContext which wraps each connection. If None, bind() makes
+    one with get_context(). Python versions without SSLContext wrap each
+    socket on its own, and can't resume sessions."""
+
+    ciphers = None
+    """The OpenSSL cipher list to offer, or None for the ssl module default."""
+
+    ecdh_curve = None
+    """The name of the curve to use for ECDH key exchange, or None for the
+    OpenSSL default."""
+
+    session_tickets = True
+    """If False, the server doesn't issue TLS session tickets, and clients
+    can only resume sessions from the server's session id cache."""
+
     def __init__(self, certificate, private_key, certificate_chain=None,
-                 client_CA=None):
+                 client_CA=None, ciphers=None, ecdh_curve=None,
+                 session_tickets=None):
         if ssl is None:
             raise ImportError("You must install the ssl module to use HTTPS.")
         self.certificate = certificate
         self.private_key = private_key
         self.certificate_chain = certificate_chain
         self.client_CA = client_CA or config.get("server.ssl_client_CA")
+        self.ciphers = ciphers or config.get("server.ssl_ciphers")
+        self.ecdh_curve = ecdh_curve or config.get("server.ssl_ecdh_curve")
+        if session_tickets is None:
+            session_tickets = config.get("server.ssl_session_tickets", True)
+        self.session_tickets = session_tickets
 
         self.check_host = config.get("server.ssl_client_check_host", False)
         check = config.get("server.ssl_client_check", "ignore")
@@ -92,12 +130,35 @@ class BuiltinSSLAdapter(wsgiserver.SSLAdapter):
 
     def bind(self, sock):
         """Wrap and return the given socket."""
+        if self.context is None and hasattr(ssl, 'SSLContext'):
+            self.context = self.get_context()
         return sock
 
+    def get_context(self):
+        """Return an ssl.SSLContext to share among all connections."""
+        c = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+        c.options |= getattr(ssl, 'OP_NO_SSLv2', 0)
+        c.options |= getattr(ssl, 'OP_NO_SSLv3', 0)
+        if not self.session_tickets:
+            # Python 2 doesn't export SSL_OP_NO_TICKET.
+            c.options |= getattr(ssl, 'OP_NO_TICKET', 0x4000)
+        c.load_cert_chain(self.certificate, self.private_key)
+        if self.client_CA:
+            c.load_verify_locations(self.client_CA)
+            c.verify_mode = self.check
+        if self.ciphers:
+            c.set_ciphers(self.ciphers)
+        if self.ecdh_curve:
+            c.set_ecdh_curve(self.ecdh_curve)
+        return c
+
     def wrap(self, sock):
         """Wrap and return the given socket, plus WSGI environ entries."""
         try:
-            if self.client_CA:
+            if self.context is not None:
+                s = self.context.wrap_socket(sock, do_handshake_on_connect=True,
+                                             server_side=True)
+            elif self.client_CA:
                 s = ssl.wrap_socket(sock, do_handshake_on_connect=True,
                                     server_side=True,
                                     certfile=self.certificate,
@@ -119,10 +180,11 @@ class BuiltinSSLAdapter(wsgiserver.SSLAdapter):
                 # the 'ping' isn't SSL.
                 return None, {}
             elif e.errno == ssl.SSL_ERROR_SSL:
-                if e.args[1].endswith('http request'):
+                # Newer Pythons append the source location to the message.
+                if 'http request' in e.args[1]:
                     # The client is speaking HTTP to an HTTPS server.
                     raise wsgiserver.NoSSLError
-                elif e.args[1].endswith('unknown protocol'):
+                elif 'unknown protocol' in e.args[1]:
                     # The client is speaking some non-HTTP protocol.
                     # Drop the conn.
                     return None, {}
@@ -141,6 +203,10 @@ class BuiltinSSLAdapter(wsgiserver.SSLAdapter):
 ##            SSL_VERSION_INTERFACE 	string 	The mod_ssl program version
 ##            SSL_VERSION_LIBRARY 	string 	The OpenSSL program version
             }
+        if hasattr(sock, 'session_reused'):
+            # Python 3.6+
+            ssl_environ['SSL_SESSION_RESUMED'] = (sock.session_reused
+                                                  and 'Resumed' or 'Initial')
         
         client_cert = sock.getpeercert()
         if self.client_CA and (client_cert or self.check == ssl.CERT_REQUIRED):
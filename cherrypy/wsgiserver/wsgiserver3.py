@@ -52,9 +52,10 @@ number of requests and their responses, so we run a nested loop::
         ->  while True:
                 req = HTTPRequest(...)
                 req.parse_request()
-                ->  # Read the Request-Line, e.g. "GET /page HTTP/1.1"
-                    req.rfile.readline()
-                    read_headers(req.rfile, req.inheaders)
+                ->  # Read the Request-Line, e.g. "GET /page HTTP/1.1",
+                    # and the headers, up to the first empty line
+                    head = req.read_request_head()
+                    parse_headers(head, req.inheaders)
                 req.respond()
                 ->  response = app(...)
                     try:
@@ -72,8 +73,9 @@ __all__ = ['HTTPRequest', 'HTTPConnection', 'HTTPServer',
            'SizeCheckWrapper', 'KnownLengthRFile', 'ChunkedRFile',
            'CP_makefile',
            'MaxSizeExceeded', 'NoSSLError', 'FatalSSLAlert',
-           'WorkerThread', 'ThreadPool', 'SSLAdapter',
-           'CherryPyWSGIServer',
+           'WorkerThread', 'ThreadPool', 'ThreadPoolAutoscaler',
+           'KeepAlivePoller', 'SSLAdapter',
+           'CherryPyWSGIServer', 'FileWrapper',
            'Gateway', 'WSGIGateway', 'WSGIGateway_10', 'WSGIGateway_u0',
            'WSGIPathInfoDispatcher', 'get_ssl_adapter_class']
 
@@ -83,6 +85,7 @@ try:
 except:
     import Queue as queue
 import re
+import select
 import email.utils
 import socket
 import sys
@@ -131,9 +134,11 @@ NUMBER_SIGN = ntob('#')
 QUESTION_MARK = ntob('?')
 ASTERISK = ntob('*')
 FORWARD_SLASH = ntob('/')
+CRLFCRLF = ntob('\r\n\r\n')
 quoted_slash = re.compile(ntob("(?i)%2F"))
 
 import errno
+import math
 
 def plat_specific_errors(*errnames):
     """Return error numbers for all errors in errnames on this platform.
@@ -175,6 +180,25 @@ comma_separated_headers = [ntob(h) for h in
      'Trailer', 'Transfer-Encoding', 'Upgrade', 'Vary', 'Via', 'Warning',
      'WWW-Authenticate']]
 
+# Header names as clients commonly send them, mapped to the title-cased
+# names read_headers produces, so parse_headers can skip title() for them
+# and every request shares the same name objects.
+header_names = {}
+for _name in ['Accept', 'Accept-Charset', 'Accept-Encoding',
+              'Accept-Language', 'Authorization', 'Cache-Control',
+              'Connection', 'Content-Encoding', 'Content-Length',
+              'Content-Type', 'Cookie', 'DNT', 'Expect', 'From', 'Host',
+              'If-Match', 'If-Modified-Since', 'If-None-Match', 'If-Range',
+              'If-Unmodified-Since', 'Keep-Alive', 'Max-Forwards', 'Origin',
+              'Pragma', 'Proxy-Authorization', 'Range', 'Referer', 'TE',
+              'Trailer', 'Transfer-Encoding', 'Upgrade', 'User-Agent', 'Via',
+              'Warning', 'X-Forwarded-For', 'X-Forwarded-Host',
+              'X-Forwarded-Proto', 'X-Real-IP', 'X-Requested-With']:
+    _title = ntob(_name).title()
+    for _variant in (ntob(_name), _title, ntob(_name.lower())):
+        header_names[_variant] = _title
+del _name, _title, _variant
+
 
 import logging
 if not hasattr(logging, 'statistics'): logging.statistics = {}
@@ -229,6 +253,60 @@ def read_headers(rfile, hdict=None):
     return hdict
 
 
+def parse_headers(block, hdict=None):
+    """Parse a block of header lines into the given header dict.
+
+    The block is everything after the Request-Line, up to and including the
+    empty line which ends the headers. If hdict is None, a new header dict is
+    created. Returns the populated header dict.
+
+    This gives the same result as read_headers, but splits the whole block in
+    one pass and looks common names up in header_names instead of title-casing
+    each one.
+
+    This function raises ValueError when the block violates the HTTP spec,
+    including when it was cut short by the end of the stream.
+    """
+    if hdict is None:
+        hdict = {}
+
+    if block.count(LF) != block.count(CRLF):
+        raise ValueError("HTTP requires CRLF terminators")
+    lines = block.split(CRLF)
+    if lines.pop():
+        # A partial line, cut short by the end of the stream.
+        raise ValueError("HTTP requires CRLF terminators")
+    if not lines or lines.pop():
+        # No more data--illegal end of headers
+        raise ValueError("Illegal end of headers.")
+
+    names = header_names
+    hname = None
+    for line in lines:
+        if line[:1] in (SPACE, TAB):
+            # It's a continuation line.
+            if hname is None:
+                raise ValueError("Illegal continuation line.")
+            v = line.strip()
+        else:
+            try:
+                k, v = line.split(COLON, 1)
+            except ValueError:
+                raise ValueError("Illegal header line.")
+            hname = names.get(k)
+            if hname is None:
+                hname = k.strip().title()
+            v = v.strip()
+
+        if hname in comma_separated_headers:
+            existing = hdict.get(hname)
+            if existing:
+                v = b", ".join((existing, v))
+        hdict[hname] = v
+
+    return hdict
+
+
 class MaxSizeExceeded(Exception):
     pass
 
@@ -542,6 +620,12 @@ class HTTPRequest(object):
 
     This value is set automatically inside send_headers."""
 
+    buffered_head = True
+    """If True (and the connection's rfile has a peek method), the
+    Request-Line and headers are read together by scanning the receive buffer
+    for the empty line which ends them (see read_request_head), and parsed in
+    one pass. If False, they are read one line at a time."""
+
     def __init__(self, server, conn):
         self.server= server
         self.conn = conn
@@ -561,9 +645,16 @@ class HTTPRequest(object):
         self.close_connection = self.__class__.close_connection
         self.chunked_read = False
         self.chunked_write = self.__class__.chunked_write
+        # Response bytes queued by send_headers and write, which flush sends.
+        self.outbuf = []
+        self.outbuf_size = 0
 
     def parse_request(self):
         """Parse the next HTTP request start-line and message-headers."""
+        if self.buffered_head and hasattr(self.conn.rfile, 'peek'):
+            self.parse_request_head()
+            return
+
         self.rfile = SizeCheckWrapper(self.conn.rfile,
                                       self.server.max_request_header_size)
         try:
@@ -590,6 +681,126 @@ class HTTPRequest(object):
 
         self.ready = True
 
+    def read_request_head(self):
+        """Read the Request-Line and headers from the connection.
+
+        Returns the head, up to and including the empty line which ends it,
+        consuming no more of the stream than that. Returns None if the stream
+        ended before any of it arrived, and whatever did arrive if it ended
+        part way, or if a line ended without a CR, for the caller to reject.
+        Raises MaxSizeExceeded, with the first max_request_header_size bytes
+        as its argument, if the head is longer than that.
+        """
+        rfile = self.conn.rfile
+        maxlen = self.server.max_request_header_size
+        chunks = []
+        size = 0
+        tail = EMPTY
+        while True:
+            # HTTP/1.1 connections are persistent by default. If a client
+            # requests a page, then idles (leaves the connection open),
+            # then rfile.peek() will raise socket.error("timed out").
+            # Note that it does this based on the value given to settimeout(),
+            # and doesn't need the client to request or acknowledge the close
+            # (although your TCP stack might suffer for it: cf Apache's history
+            # with FIN_WAIT_2).
+            data = rfile.peek(1)
+            if not data:
+                if chunks:
+                    self.started_request = True
+                    return EMPTY.join(chunks)
+                return None
+
+            # Set started_request to True once a line has arrived so
+            # communicate() knows to send 408 from here on out.
+            if not self.started_request and LF in data:
+                self.started_request = True
+
+            end = -1
+            if tail:
+                # The empty line may straddle the previous chunk and this one.
+                end = (tail + data[:3]).find(CRLFCRLF)
+                if end >= 0:
+                    end += 4 - len(tail)
+            if end < 0:
+                end = data.find(CRLFCRLF)
+                if end >= 0:
+                    end += 4
+
+            n = len(data)
+            if end >= 0:
+                n = end
+            if maxlen and size + n > maxlen:
+                chunks.append(rfile.read(maxlen - size))
+                raise MaxSizeExceeded(EMPTY.join(chunks))
+            if end >= 0:
+                chunks.append(rfile.read(end))
+                break
+
+            chunks.append(rfile.read(n))
+            size += n
+            lfs = data.count(LF) - data.count(CRLF)
+            if data[:1] == LF and tail[-1:] == CRLF[:1]:
+                lfs -= 1
+            if lfs:
+                # A line ended without a CR. Don't wait for more.
+                break
+            tail = (tail + data[-3:])[-3:]
+
+        if len(chunks) == 1:
+            return chunks[0]
+        return EMPTY.join(chunks)
+
+    def parse_request_head(self):
+        """Parse the head returned by read_request_head. Set self.ready."""
+        too_large = False
+        try:
+            head = self.read_request_head()
+        except MaxSizeExceeded:
+            head = sys.exc_info()[1].args[0]
+            too_large = True
+        if head is None:
+            return
+
+        if head[:2] == CRLF:
+            # RFC 2616 sec 4.1: "...if the server is reading the protocol
+            # stream at the beginning of a message and receives a CRLF
+            # first, it should ignore the CRLF."
+            # But only ignore one leading line! else we enable a DoS.
+            head = head[2:]
+            if not head:
+                return
+
+        i = head.find(CRLF)
+        if i < 0 or LF in head[:i]:
+            if too_large:
+                self.simple_response("414 Request-URI Too Long",
+                    "The Request-URI sent with the request exceeds the maximum "
+                    "allowed bytes.")
+            else:
+                self.simple_response("400 Bad Request",
+                                     "HTTP requires CRLF terminators")
+            return
+
+        if not self.parse_request_line(head[:i]):
+            return
+
+        if too_large:
+            self.simple_response("413 Request Entity Too Large",
+                "The headers sent with the request exceed the maximum "
+                "allowed bytes.")
+            return
+
+        try:
+            parse_headers(head[i + 2:], self.inheaders)
+        except ValueError:
+            ex = sys.exc_info()[1]
+            self.simple_response("400 Bad Request", ex.args[0])
+            return
+
+        if self.process_request_headers():
+            self.ready = True
+
     def read_request_line(self):
         # HTTP/1.1 connections are persistent by default. If a client
         # requests a page, then idles (leaves the connection open),
@@ -619,6 +830,10 @@ class HTTPRequest(object):
             self.simple_response("400 Bad Request", "HTTP requires CRLF terminators")
             return False
 
+        return self.parse_request_line(request_line)
+
+    def parse_request_line(self, request_line):
+        """Parse the given Request-Line into self. Return success."""
         try:
             method, uri, req_protocol = request_line.strip().split(SPACE, 2)
             # The [x:y] slicing is necessary for byte strings to avoid getting ord's
@@ -698,6 +913,10 @@ class HTTPRequest(object):
             self.simple_response("400 Bad Request", ex.args[0])
             return False
 
+        return self.process_request_headers()
+
+    def process_request_headers(self):
+        """Act on the parsed self.inheaders. Return success."""
         mrbs = self.server.max_request_body_size
         if mrbs and int(self.inheaders.get(b"Content-Length", 0)) > mrbs:
             self.simple_response("413 Request Entity Too Large",
@@ -829,13 +1048,18 @@ class HTTPRequest(object):
                 return
             self.rfile = KnownLengthRFile(self.conn.rfile, cl)
 
-        self.server.gateway(self).respond()
+        try:
+            self.server.gateway(self).respond()
 
-        if (self.ready and not self.sent_headers):
-            self.sent_headers = True
-            self.send_headers()
-        if self.chunked_write:
-            self.conn.wfile.write(b"0\r\n\r\n")
+            if (self.ready and not self.sent_headers):
+                self.sent_headers = True
+                self.send_headers()
+            if self.chunked_write:
+                self.outbuf.append(b"0\r\n\r\n")
+        finally:
+            # Send whatever is queued, even if the application failed part
+            # way through its output.
+            self.flush()
 
     def simple_response(self, status, msg=""):
         """Write a simple response back to the client."""
@@ -872,12 +1096,41 @@ class HTTPRequest(object):
                 raise
 
     def write(self, chunk):
-        """Write unbuffered data to the client."""
-        if self.chunked_write and chunk:
-            buf = [bytes(hex(len(chunk)), 'ASCII')[2:], CRLF, chunk, CRLF]
-            self.conn.wfile.write(EMPTY.join(buf))
+        """Write data to the client.
+
+        The chunk is queued behind any response headers not yet sent, and the
+        queue is sent at once unless it is still smaller than the server's
+        coalesce_size. An empty chunk sends the queue regardless.
+        """
+        if chunk:
+            if self.chunked_write:
+                size = bytes(hex(len(chunk)), 'ASCII')[2:]
+                self.outbuf.extend((size, CRLF, chunk, CRLF))
+                self.outbuf_size += len(size) + len(chunk) + 4
+            else:
+                self.outbuf.append(chunk)
+                self.outbuf_size += len(chunk)
+            if self.outbuf_size < self.server.coalesce_size:
+                return
+        self.flush()
+
+    def flush(self):
+        """Send any queued response data to the client."""
+        buf = self.outbuf
+        if not buf:
+            return
+        self.outbuf = []
+        self.outbuf_size = 0
+        if len(buf) == 1:
+            self.conn.wfile.write(buf[0])
+        elif (len(buf) <= 512 and self.server.ssl_adapter is None
+              and hasattr(self.conn.socket, 'sendmsg')):
+            # Gather the pieces in one writev() rather than copying them.
+            sent = self.conn.socket.sendmsg(buf)
+            if sent < sum([len(b) for b in buf]):
+                self.conn.wfile.write(EMPTY.join(buf)[sent:])
         else:
-            self.conn.wfile.write(chunk)
+            self.conn.wfile.write(EMPTY.join(buf))
 
     def send_headers(self):
         """Assert, process, and send the HTTP response message-headers.
@@ -945,7 +1198,11 @@ class HTTPRequest(object):
         for k, v in self.outheaders:
             buf.append(k + COLON + SPACE + v + CRLF)
         buf.append(CRLF)
-        self.conn.wfile.write(EMPTY.join(buf))
+        # The header block waits for the first body bytes (see write), so
+        # that a small response goes out in one send.
+        header_block = EMPTY.join(buf)
+        self.outbuf.append(header_block)
+        self.outbuf_size += len(header_block)
 
 
 class NoSSLError(Exception):
@@ -1004,6 +1261,18 @@ class HTTPConnection(object):
     wbufsize = DEFAULT_BUFFER_SIZE
     RequestHandlerClass = HTTPRequest
 
+    idle_since = None
+    """When communicate() returns a keep-alive connection to the server's
+    KeepAlivePoller, the time at which it went idle; otherwise None."""
+
+    queued_at = None
+    """The time at which the server queued this newly-accepted connection,
+    if the server has an accepted_queue_timeout; otherwise None."""
+
+    handshake_pending = False
+    """If True, the socket has not been wrapped by the server's ssl_adapter
+    yet; communicate() calls handshake() before reading any request."""
+
     def __init__(self, server, sock, makefile=CP_makefile):
         self.server = server
         self.socket = sock
@@ -1013,7 +1282,12 @@ class HTTPConnection(object):
 
     def communicate(self):
         """Read each request and respond appropriately."""
-        request_seen = False
+        # A connection resumed from the keep-alive poller has already
+        # served at least one request.
+        request_seen = self.idle_since is not None
+        self.idle_since = None
+        if self.handshake_pending and not self.handshake():
+            return
         try:
             while True:
                 # (re)set req to None so that if something goes wrong in
@@ -1036,6 +1310,11 @@ class HTTPConnection(object):
                 req.respond()
                 if req.close_connection:
                     return
+                if self._can_park():
+                    # Hand the idle socket to the server's keep-alive
+                    # poller instead of blocking this worker in readline().
+                    self.idle_since = time.time()
+                    return
         except socket.error:
             e = sys.exc_info()[1]
             errnum = e.args[0]
@@ -1090,6 +1369,89 @@ class HTTPConnection(object):
                     # Close the connection.
                     return
 
+    def _can_park(self):
+        """Return True if this idle connection may wait in the poller."""
+        poller = self.server.keepalive_poller
+        if poller is None or not poller.ready:
+            return False
+        # Pipelined requests which we have already read off the socket
+        # would never wake the poller, so keep serving those here.
+        return not self._has_buffered_input()
+
+    def handshake(self):
+        """Wrap the socket with the server's ssl_adapter. Return success.
+
+        This runs in the worker thread which picked up the connection, with
+        the socket timeout set to the server's ssl_handshake_timeout, so a
+        client which is slow to negotiate TLS holds up only that thread.
+        """
+        self.handshake_pending = False
+        server = self.server
+        s = self.socket
+        timeout = server.ssl_handshake_timeout
+        if timeout is None:
+            timeout = server.timeout
+        if hasattr(s, 'settimeout'):
+            s.settimeout(timeout)
+
+        try:
+            s, ssl_env = server.ssl_adapter.wrap(s)
+        except NoSSLError:
+            msg = ("The client sent a plain HTTP request, but "
+                   "this server only speaks HTTPS on this port.")
+            buf = ["%s 400 Bad Request\r\n" % server.protocol,
+                   "Content-Length: %s\r\n" % len(msg),
+                   "Content-Type: text/plain\r\n\r\n",
+                   msg]
+            try:
+                self.wfile.write("".join(buf).encode('ISO-8859-1'))
+            except socket.error:
+                x = sys.exc_info()[1]
+                if x.args[0] not in socket_errors_to_ignore:
+                    raise
+            self.linger = True
+            return False
+        except socket.timeout:
+            return False
+        except socket.error:
+            x = sys.exc_info()[1]
+            if (x.args and x.args[0] not in socket_errors_to_ignore
+                and 'timed out' not in str(x)):
+                server.error_log("SSL handshake failed", level=logging.INFO,
+                                 traceback=True)
+            return False
+        if not s:
+            return False
+
+        # Re-apply our timeout since we have a new socket object
+        if hasattr(s, 'settimeout'):
+            s.settimeout(server.timeout)
+        if server.stats['Enabled']:
+            # Only adapters which know how the handshake went say so.
+            resumed = ssl_env.get('SSL_SESSION_RESUMED')
+            if resumed == 'Resumed':
+                server.stats['SSL Resumed Handshakes'] += 1
+            elif resumed == 'Initial':
+                server.stats['SSL Full Handshakes'] += 1
+        self.socket = s
+        self.ssl_env = ssl_env
+        makefile = server.ssl_adapter.makefile
+        self.rfile = makefile(s, "rb", self.rbufsize)
+        self.wfile = makefile(s, "wb", self.wbufsize)
+        return True
+
+    def _has_buffered_input(self):
+        """Return True if request bytes are waiting in a userspace buffer."""
+        pending = getattr(self.socket, 'pending', None)
+        if pending is not None and pending():
+            # SSL records already decrypted but not yet read.
+            return True
+        try:
+            return len(self.rfile._read_buf) > self.rfile._read_pos
+        except AttributeError:
+            # Not a _pyio.BufferedReader; we can't tell, so assume so.
+            return True
+
     linger = False
 
     def close(self):
@@ -1097,6 +1459,15 @@ class HTTPConnection(object):
         self.rfile.close()
 
         if not self.linger:
+            if hasattr(self.socket, 'unwrap'):
+                # Send the TLS close_notify, without waiting for the client's.
+                # OpenSSL drops sessions from its cache if we don't, and the
+                # client would then need a full handshake next time.
+                try:
+                    self.socket.settimeout(0)
+                    self.socket.unwrap()
+                except (socket.error, ValueError):
+                    pass
             # Python's socket module does NOT call close on the kernel socket
             # when you call socket.close(). We do so manually here because we
             # want this server to send a FIN TCP segment immediately. Note this
@@ -1175,20 +1546,43 @@ class WorkerThread(threading.Thread):
                 if conn is _SHUTDOWNREQUEST:
                     return
 
+                if conn.queued_at is not None:
+                    waited = time.time() - conn.queued_at
+                    conn.queued_at = None
+                    if waited > self.server.accepted_queue_timeout:
+                        # The client has waited too long already; tell it
+                        # to come back later rather than serve it late.
+                        if self.server.stats['Enabled']:
+                            self.server.stats['Queue Timeouts'] += 1
+                        if not conn.handshake_pending:
+                            self.server.send_overload(conn.wfile)
+                        conn.close()
+                        continue
+
                 self.conn = conn
                 if self.server.stats['Enabled']:
                     self.start_time = time.time()
                 try:
                     conn.communicate()
                 finally:
-                    conn.close()
+                    parked = conn.idle_since is not None
+                    if not parked:
+                        conn.close()
                     if self.server.stats['Enabled']:
                         self.requests_seen += self.conn.requests_seen
                         self.bytes_read += self.conn.rfile.bytes_read
                         self.bytes_written += self.conn.wfile.bytes_written
                         self.work_time += time.time() - self.start_time
                         self.start_time = None
+                        if parked:
+                            # The next worker to pick up this connection
+                            # must not count our share a second time.
+                            conn.requests_seen = 0
+                            conn.rfile.bytes_read = 0
+                            conn.wfile.bytes_written = 0
                     self.conn = None
+                    if parked:
+                        self.server.keepalive_poller.park(conn)
         except (KeyboardInterrupt, SystemExit):
             exc = sys.exc_info()[1]
             self.server.interrupt = exc
@@ -1221,8 +1615,9 @@ class ThreadPool(object):
                 time.sleep(.1)
 
     def _get_idle(self):
-        """Number of worker threads which are idle. Read-only."""
-        return len([t for t in self._threads if t.conn is None])
+        """Number of live worker threads which are idle. Read-only."""
+        return len([t for t in self._threads
+                    if t.conn is None and t.isAlive()])
     idle = property(_get_idle, doc=_get_idle.__doc__)
 
     def put(self, obj):
@@ -1255,7 +1650,7 @@ class ThreadPool(object):
         """Kill off worker threads (not below self.min)."""
         # Grow/shrink the pool if necessary.
         # Remove any dead threads from our list
-        for t in self._threads:
+        for t in self._threads[:]:
             if not t.isAlive():
                 self._threads.remove(t)
                 amount -= 1
@@ -1314,6 +1709,319 @@ class ThreadPool(object):
     qsize = property(_get_qsize)
 
 
+class ThreadPoolAutoscaler(object):
+    """Grows and shrinks a ThreadPool to track its utilization.
+
+    ThreadPool.grow() and shrink() are never called by the pool itself, so
+    without an autoscaler the pool stays at its minimum size. Every
+    ``interval`` seconds, sample() measures utilization (the fraction of
+    worker time spent on connections, from the 'Work Time' statistics when
+    they are enabled, or else the fraction of busy workers) and the queue
+    backlog. The pool grows at once, up to pool.max, to the size at which the
+    current load would run at ``target`` utilization; it shrinks (never below
+    pool.min) only when utilization falls under ``target * hysteresis`` and
+    at least ``cooldown`` seconds have passed since the last resize.
+    """
+
+    interval = 1
+    """The number of seconds between samples."""
+
+    target = 0.75
+    """The worker utilization (0 to 1) at which the pool should run."""
+
+    hysteresis = 0.5
+    """The pool only shrinks below ``target * hysteresis`` utilization."""
+
+    cooldown = 30
+    """The minimum number of seconds between a resize and a shrink."""
+
+    def __init__(self, server, target=None, cooldown=None, interval=None):
+        self.server = server
+        if target is not None:
+            self.target = target
+        if cooldown is not None:
+            self.cooldown = cooldown
+        if interval is not None:
+            self.interval = interval
+        self.last_resize = 0
+        self.grown = 0
+        self.shrunk = 0
+        self._last_sample = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start sampling the server's pool in a new thread."""
+        self._stopped.clear()
+        self._last_sample = None
+        self._thread = threading.Thread(target=self.run)
+        self._thread.setName("CP Server Autoscaler " + self._thread.getName())
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling."""
+        self._stopped.set()
+        if self._thread is not None:
+            if self._thread is not threading.currentThread():
+                self._thread.join()
+            self._thread = None
+
+    def run(self):
+        while True:
+            self._stopped.wait(self.interval)
+            if self._stopped.isSet():
+                return
+            try:
+                self.sample()
+            except Exception:
+                self.server.error_log("Error in ThreadPoolAutoscaler",
+                                      level=logging.ERROR, traceback=True)
+
+    def utilization(self, pool, threads):
+        """Return the fraction of worker capacity in use since last sample.
+
+        threads is the list of the pool's live worker threads.
+        """
+        size = len(threads) or 1
+        now = time.time()
+        stats = self.server.stats
+        if stats['Enabled']:
+            work_time = stats['Work Time'](stats)
+            last, self._last_sample = self._last_sample, (now, work_time)
+            if last is not None and now > last[0]:
+                busy = (work_time - last[1]) / (now - last[0])
+                return min(busy / size, 1.0)
+        busy = len([t for t in threads if t.conn is not None])
+        return float(busy) / size
+
+    def sample(self):
+        """Grow or shrink the pool once, based on its current load."""
+        pool = self.server.requests
+        # Size and (without stats) utilization count the same live threads.
+        threads = [t for t in pool._threads if t.isAlive()]
+        size = len(threads) or 1
+        util = self.utilization(pool, threads)
+        backlog = pool.qsize
+        now = time.time()
+
+        # The pool size at which the current load would run at target.
+        wanted = int(math.ceil(size * util / self.target)) + backlog
+        if pool.max > 0:
+            wanted = min(wanted, pool.max)
+
+        if backlog or util > self.target:
+            if wanted > size:
+                before = len(pool._threads)
+                pool.grow(wanted - size)
+                self.grown += len(pool._threads) - before
+                self.last_resize = now
+        elif (util < self.target * self.hysteresis and
+              now - self.last_resize >= self.cooldown):
+            wanted = max(wanted, pool.min)
+            if wanted < size:
+                pool.shrink(size - wanted)
+                self.shrunk += size - wanted
+                self.last_resize = now
+
+
+class KeepAlivePoller(object):
+    """Holds idle keep-alive connections until their sockets are readable.
+
+    Without a poller, each WorkerThread loops over the requests of its
+    connection, blocking in readline() until the client either sends the
+    next request or times out. When HTTPServer.park_idle_connections is
+    True, HTTPConnection.communicate() instead returns after each response
+    and the worker hands the connection to park(). A single thread then
+    waits (via epoll or poll) on all parked sockets and puts a connection
+    back on the ThreadPool queue as soon as its socket becomes readable,
+    so the number of busy workers tracks in-flight requests rather than
+    open sockets. Connections which stay idle longer than server.timeout
+    are closed, just as a blocked worker would have closed them.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.ready = False
+        self._lock = threading.Lock()
+        self._conns = {}
+        self._pending = []
+        self._expirations = None
+        self._thread = None
+
+    def supported(cls):
+        """Return True if this platform has a usable poll implementation."""
+        return hasattr(select, 'epoll') or hasattr(select, 'poll')
+    supported = classmethod(supported)
+
+    def _get_parked(self):
+        """Number of connections currently parked. Read-only."""
+        return len(self._conns) + len(self._pending)
+    parked = property(_get_parked, doc=_get_parked.__doc__)
+
+    def start(self):
+        """Create the poll object and start the polling thread."""
+        if hasattr(select, 'epoll'):
+            self._poll = select.epoll()
+            # epoll.poll takes its timeout in seconds.
+            self._poll_scale = 1
+        else:
+            self._poll = select.poll()
+            # poll.poll takes its timeout in milliseconds.
+            self._poll_scale = 1000
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        for fd in (self._wakeup_r, self._wakeup_w):
+            flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+            fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+            fcntl.fcntl(fd, fcntl.F_SETFD, fcntl.FD_CLOEXEC)
+        self._poll.register(self._wakeup_r, select.POLLIN)
+        # Connections are parked in time order and share one timeout,
+        # so the oldest idle connection is always at the front.
+        self._expirations = []
+
+        self.ready = True
+        self._thread = threading.Thread(target=self.run)
+        self._thread.setName("CP Server KeepAlive " + self._thread.getName())
+        self._thread.start()
+
+    def park(self, conn):
+        """Wait for the given idle connection to send its next request."""
+        self._lock.acquire()
+        try:
+            if self.ready:
+                self._pending.append(conn)
+                conn = None
+        finally:
+            self._lock.release()
+
+        if conn is not None:
+            # We're shutting down.
+            conn.close()
+            return
+        self._wakeup()
+
+    def _wakeup(self):
+        try:
+            os.write(self._wakeup_w, b'x')
+        except (IOError, OSError):
+            # The pipe is full, which means a wakeup is already pending.
+            pass
+
+    def run(self):
+        """Poll parked connections until stop() is called."""
+        try:
+            while self.ready:
+                self._register_pending()
+                try:
+                    events = self._poll.poll(self._next_timeout())
+                except (select.error, IOError, OSError):
+                    if sys.exc_info()[1].args[0] in socket_error_eintr:
+                        continue
+                    raise
+                for fd, event in events:
+                    if fd == self._wakeup_r:
+                        try:
+                            os.read(self._wakeup_r, 4096)
+                        except (IOError, OSError):
+                            pass
+                        continue
+
+                    conn = self._conns.pop(fd, None)
+                    if conn is None:
+                        continue
+                    self._poll.unregister(fd)
+                    if event & select.POLLIN:
+                        self.server.requests.put(conn)
+                    else:
+                        # POLLHUP/POLLERR without data: the client is gone.
+                        conn.close()
+                self._expire()
+        except Exception:
+            self.server.error_log("Error in KeepAlivePoller",
+                                  level=logging.ERROR, traceback=True)
+        finally:
+            self._close_all()
+
+    def _register_pending(self):
+        self._lock.acquire()
+        try:
+            pending, self._pending = self._pending, []
+        finally:
+            self._lock.release()
+
+        for conn in pending:
+            try:
+                fd = conn.socket.fileno()
+                self._poll.register(fd, select.POLLIN | select.POLLPRI)
+            except (IOError, OSError, socket.error, ValueError):
+                conn.close()
+                continue
+            self._conns[fd] = conn
+            self._expirations.append((conn.idle_since, fd, conn))
+
+    def _next_timeout(self):
+        """Return the poll timeout until the oldest parked conn expires."""
+        wait = 1.0
+        if self._expirations:
+            expires = self._expirations[0][0] + self.server.timeout
+            wait = max(min(wait, expires - time.time()), 0)
+        return wait * self._poll_scale
+
+    def _expire(self):
+        """Close connections which have been idle for server.timeout."""
+        expirations = self._expirations
+        cutoff = time.time() - self.server.timeout
+        i = 0
+        while i < len(expirations):
+            idle_since, fd, conn = expirations[i]
+            if self._conns.get(fd) is not conn or conn.idle_since != idle_since:
+                # Already resumed (and perhaps parked again later).
+                i += 1
+                continue
+            if idle_since > cutoff:
+                break
+            del self._conns[fd]
+            self._poll.unregister(fd)
+            conn.close()
+            i += 1
+        if i:
+            del expirations[:i]
+
+    def _close_all(self):
+        self._lock.acquire()
+        try:
+            self.ready = False
+            conns = list(self._conns.values()) + self._pending
+            self._conns = {}
+            self._pending = []
+        finally:
+            self._lock.release()
+
+        for conn in conns:
+            try:
+                conn.close()
+            except (IOError, OSError, socket.error):
+                pass
+        self._expirations = []
+        self._poll.close()
+        os.close(self._wakeup_r)
+        os.close(self._wakeup_w)
+
+    def stop(self, timeout=5):
+        """Stop polling and close all parked connections."""
+        self._lock.acquire()
+        try:
+            self.ready = False
+        finally:
+            self._lock.release()
+
+        if self._thread is not None:
+            self._wakeup()
+            if self._thread is not threading.currentThread():
+                self._thread.join(timeout)
+            self._thread = None
+
+
 
 try:
     import fcntl
@@ -1345,6 +2053,12 @@ else:
         fcntl.fcntl(fd, fcntl.F_SETFD, old_flags | fcntl.FD_CLOEXEC)
 
 
+SO_REUSEPORT = getattr(socket, 'SO_REUSEPORT', None)
+if SO_REUSEPORT is None and sys.platform.startswith('linux'):
+    # Older Pythons don't export it, but Linux has had it since 3.9.
+    SO_REUSEPORT = 15
+
+
 class SSLAdapter(object):
     """Base class for SSL driver library adapters.
 
@@ -1424,6 +2138,10 @@ class HTTPServer(object):
     timeout = 10
     """The timeout in seconds for accepted connections (default 10)."""
 
+    ssl_handshake_timeout = None
+    """The timeout in seconds for a worker thread to complete the TLS
+    handshake on a new connection (default None: use the timeout)."""
+
     version = "CherryPy/3.2.4"
     """A version string for the HTTPServer."""
 
@@ -1444,6 +2162,55 @@ class HTTPServer(object):
     nodelay = True
     """If True (the default since 3.1), sets the TCP_NODELAY socket option."""
 
+    bind_fd = None
+    """The file descriptor of a listening socket, already bound to bind_addr,
+    to take over when the server starts instead of binding a new one. The
+    process bus passes one along when it restarts the process with execv."""
+
+    reuse_port = False
+    """If True, sets the SO_REUSEPORT socket option, so that several processes
+    may bind the same address and the kernel spreads connections among them
+    (default False)."""
+
+    coalesce_size = 0
+    """The number of bytes of small response chunks to collect before sending
+    them together (default 0: send each chunk as it is written). The rest is
+    sent when the response ends, or when a WSGI application yields an empty
+    string. Note PEP 333 asks servers not to delay the chunks an application
+    yields, so only raise this for applications which don't need each chunk
+    to reach the client on its own. The response headers always go out with
+    the first body chunk."""
+
+    use_sendfile = True
+    """If True (the default), WSGI responses which are a wsgi.file_wrapper of
+    a real file are sent with os.sendfile over plain (non-SSL) sockets, where
+    the platform provides it."""
+
+    park_idle_connections = False
+    """If True, idle keep-alive connections wait in a KeepAlivePoller between
+    requests instead of holding a worker thread (default False). Requires
+    select.epoll or select.poll; ignored on platforms without them."""
+
+    keepalive_poller = None
+    """The KeepAlivePoller for this server while running, or None."""
+
+    autoscaler = None
+    """An instance of ThreadPoolAutoscaler, or None (the default) for a
+    worker pool which stays at minthreads."""
+
+    accepted_queue_size = 0
+    """The maximum number of accepted connections waiting for a worker
+    thread, or 0 for no limit. When the queue is full, further connections
+    are answered with "503 Service Unavailable" by the accept thread."""
+
+    accepted_queue_timeout = 0
+    """The maximum number of seconds an accepted connection may wait for a
+    worker thread, or 0 for no limit. Connections which waited longer are
+    answered with "503 Service Unavailable" instead of being served."""
+
+    shed_retry_after = 5
+    """The Retry-After value, in seconds, sent with shed connections."""
+
     ConnectionClass = HTTPConnection
     """The class to use for handling HTTP connections."""
 
@@ -1476,7 +2243,14 @@ class HTTPServer(object):
             'Queue': lambda s: getattr(self.requests, "qsize", None),
             'Threads': lambda s: len(getattr(self.requests, "_threads", [])),
             'Threads Idle': lambda s: getattr(self.requests, "idle", None),
+            'Threads Grown': lambda s: getattr(self.autoscaler, "grown", 0),
+            'Threads Shrunk': lambda s: getattr(self.autoscaler, "shrunk", 0),
+            'Parked Connections': lambda s: getattr(self.keepalive_poller, "parked", 0),
             'Socket Errors': 0,
+            'Shed Connections': 0,
+            'Queue Timeouts': 0,
+            'SSL Full Handshakes': 0,
+            'SSL Resumed Handshakes': 0,
             'Requests': lambda s: (not s['Enabled']) and -1 or sum([w['Requests'](w) for w
                                        in s['Worker Threads'].values()], 0),
             'Bytes Read': lambda s: (not s['Enabled']) and -1 or sum([w['Bytes Read'](w) for w
@@ -1546,49 +2320,52 @@ class HTTPServer(object):
         if self.software is None:
             self.software = "%s Server" % self.version
 
-        # Select the appropriate socket
-        if isinstance(self.bind_addr, basestring):
-            # AF_UNIX socket
+        if self.bind_fd is not None:
+            self.adopt(self.bind_fd)
+        else:
+            # Select the appropriate socket
+            if isinstance(self.bind_addr, basestring):
+                # AF_UNIX socket
 
-            # So we can reuse the socket...
-            try: os.unlink(self.bind_addr)
-            except: pass
+                # So we can reuse the socket...
+                try: os.unlink(self.bind_addr)
+                except: pass
 
-            # So everyone can access the socket...
-            try: os.chmod(self.bind_addr, 511) # 0777
-            except: pass
+                # So everyone can access the socket...
+                try: os.chmod(self.bind_addr, 511) # 0777
+                except: pass
 
-            info = [(socket.AF_UNIX, socket.SOCK_STREAM, 0, "", self.bind_addr)]
-        else:
-            # AF_INET or AF_INET6 socket
-            # Get the correct address family for our host (allows IPv6 addresses)
-            host, port = self.bind_addr
-            try:
-                info = socket.getaddrinfo(host, port, socket.AF_UNSPEC,
-                                          socket.SOCK_STREAM, 0, socket.AI_PASSIVE)
-            except socket.gaierror:
-                if ':' in self.bind_addr[0]:
-                    info = [(socket.AF_INET6, socket.SOCK_STREAM,
-                             0, "", self.bind_addr + (0, 0))]
-                else:
-                    info = [(socket.AF_INET, socket.SOCK_STREAM,
-                             0, "", self.bind_addr)]
+                info = [(socket.AF_UNIX, socket.SOCK_STREAM, 0, "", self.bind_addr)]
+            else:
+                # AF_INET or AF_INET6 socket
+                # Get the correct address family for our host (allows IPv6 addresses)
+                host, port = self.bind_addr
+                try:
+                    info = socket.getaddrinfo(host, port, socket.AF_UNSPEC,
+                                              socket.SOCK_STREAM, 0, socket.AI_PASSIVE)
+                except socket.gaierror:
+                    if ':' in self.bind_addr[0]:
+                        info = [(socket.AF_INET6, socket.SOCK_STREAM,
+                                 0, "", self.bind_addr + (0, 0))]
+                    else:
+                        info = [(socket.AF_INET, socket.SOCK_STREAM,
+                                 0, "", self.bind_addr)]
 
-        self.socket = None
-        msg = "No socket could be created"
-        for res in info:
-            af, socktype, proto, canonname, sa = res
-            try:
-                self.bind(af, socktype, proto)
-            except socket.error as serr:
-                msg = "%s -- (%s: %s)" % (msg, sa, serr)
-                if self.socket:
-                    self.socket.close()
-                self.socket = None
-                continue
-            break
-        if not self.socket:
-            raise socket.error(msg)
+            self.socket = None
+            msg = "No socket could be created"
+            for res in info:
+                af, socktype, proto, canonname, sa = res
+                try:
+                    self.bind(af, socktype, proto)
+                except socket.error as serr:
+                    msg = "%s -- (%s: %s)" % (msg, sa, serr)
+                    if self.socket:
+                        self.socket.close()
+                    self.socket = None
+                    continue
+                break
+            if not self.socket:
+                raise socket.error(msg)
 
         # Timeout so KeyboardInterrupt can be caught on Win32
         self.socket.settimeout(1)
@@ -1597,6 +2374,13 @@ class HTTPServer(object):
         # Create worker threads
         self.requests.start()
 
+        if self.park_idle_connections and KeepAlivePoller.supported():
+            self.keepalive_poller = KeepAlivePoller(self)
+            self.keepalive_poller.start()
+
+        if self.autoscaler is not None:
+            self.autoscaler.start()
+
         self.ready = True
         self._start_time = time.time()
         while self.ready:
@@ -1623,6 +2407,28 @@ class HTTPServer(object):
             sys.stderr.write(tblines)
             sys.stderr.flush()
 
+    def adopt(self, fd):
+        """Use the already-bound socket with the given file descriptor."""
+        self.bind_fd = None
+        # fromfd needs an address family, but whichever we give it,
+        # getsockname returns an address of the socket's real family.
+        sock = socket.fromfd(fd, socket.AF_INET, socket.SOCK_STREAM)
+        os.close(fd)
+        if isinstance(self.bind_addr, basestring):
+            family = socket.AF_UNIX
+        elif len(sock.getsockname()) == 4:
+            family = socket.AF_INET6
+        else:
+            family = None
+        if family is not None:
+            s = socket.fromfd(sock.fileno(), family, socket.SOCK_STREAM)
+            sock.close()
+            sock = s
+        self.socket = sock
+        prevent_socket_inheritance(self.socket)
+        if self.ssl_adapter is not None:
+            self.socket = self.ssl_adapter.bind(self.socket)
+
     def bind(self, family, type, proto=0):
         """Create (or recreate) the actual socket object."""
         self.socket = socket.socket(family, type, proto)
@@ -1630,6 +2436,11 @@ class HTTPServer(object):
         self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         if self.nodelay and not isinstance(self.bind_addr, str):
             self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.reuse_port and not isinstance(self.bind_addr, str):
+            if SO_REUSEPORT is None:
+                raise socket.error("SO_REUSEPORT is not available on this "
+                                   "platform.")
+            self.socket.setsockopt(socket.SOL_SOCKET, SO_REUSEPORT, 1)
 
         if self.ssl_adapter is not None:
             self.socket = self.ssl_adapter.bind(self.socket)
@@ -1660,36 +2471,28 @@ class HTTPServer(object):
             if hasattr(s, 'settimeout'):
                 s.settimeout(self.timeout)
 
-            makefile = CP_makefile
-            ssl_env = {}
-            # if ssl cert and key are set, we try to be a secure HTTP server
-            if self.ssl_adapter is not None:
-                try:
-                    s, ssl_env = self.ssl_adapter.wrap(s)
-                except NoSSLError:
-                    msg = ("The client sent a plain HTTP request, but "
-                           "this server only speaks HTTPS on this port.")
-                    buf = ["%s 400 Bad Request\r\n" % self.protocol,
-                           "Content-Length: %s\r\n" % len(msg),
-                           "Content-Type: text/plain\r\n\r\n",
-                           msg]
-
-                    wfile = makefile(s, "wb", DEFAULT_BUFFER_SIZE)
-                    try:
-                        wfile.write("".join(buf).encode('ISO-8859-1'))
-                    except socket.error:
-                        x = sys.exc_info()[1]
-                        if x.args[0] not in socket_errors_to_ignore:
-                            raise
-                    return
-                if not s:
-                    return
-                makefile = self.ssl_adapter.makefile
-                # Re-apply our timeout since we may have a new socket object
-                if hasattr(s, 'settimeout'):
-                    s.settimeout(self.timeout)
+            if (self.accepted_queue_size and
+                self.requests.qsize >= self.accepted_queue_size):
+                # Every worker is busy and the backlog is full. Shed this
+                # connection now, rather than let it wait until it times out
+                # and slow down everyone else in the queue. We don't spend
+                # a TLS handshake on it; SSL clients just see the close.
+                if self.stats['Enabled']:
+                    self.stats['Shed Connections'] += 1
+                if self.ssl_adapter is None:
+                    wfile = CP_makefile(s, "wb", DEFAULT_BUFFER_SIZE)
+                    self.send_overload(wfile)
+                    wfile.close()
+                s.close()
+                return
 
-            conn = self.ConnectionClass(self, s, makefile)
+            conn = self.ConnectionClass(self, s)
+            if self.ssl_adapter is not None:
+                # Leave the TLS handshake to the worker thread which picks
+                # up this connection, so a slow client can't stall accept().
+                conn.handshake_pending = True
+            if self.accepted_queue_timeout:
+                conn.queued_at = time.time()
 
             if not isinstance(self.bind_addr, basestring):
                 # optional values
@@ -1705,8 +2508,6 @@ class HTTPServer(object):
                 conn.remote_addr = addr[0]
                 conn.remote_port = addr[1]
 
-            conn.ssl_env = ssl_env
-
             self.requests.put(conn)
         except socket.timeout:
             # The only reason for the timeout in start() is so we can
@@ -1733,6 +2534,21 @@ class HTTPServer(object):
                 return
             raise
 
+    def send_overload(self, wfile):
+        """Write a "503 Service Unavailable" response for a shed connection."""
+        msg = "The server is too busy to handle this request."
+        buf = ["%s 503 Service Unavailable\r\n" % self.protocol,
+               "Content-Length: %s\r\n" % len(msg),
+               "Content-Type: text/plain\r\n",
+               "Retry-After: %s\r\n" % self.shed_retry_after,
+               "Connection: close\r\n\r\n",
+               msg]
+        try:
+            wfile.write("".join(buf).encode('ISO-8859-1'))
+        except (socket.error, NoSSLError, FatalSSLAlert):
+            # We're only doing this as a courtesy; the conn is closing anyway.
+            pass
+
     def _get_interrupt(self):
         return self._interrupt
     def _set_interrupt(self, interrupt):
@@ -1785,6 +2601,11 @@ class HTTPServer(object):
                 sock.close()
             self.socket = None
 
+        if self.autoscaler is not None:
+            self.autoscaler.stop()
+        if self.keepalive_poller is not None:
+            # Any connection parked after this is closed instead.
+            self.keepalive_poller.stop(self.shutdown_timeout)
         self.requests.stop(self.shutdown_timeout)
 
 
@@ -1799,6 +2620,46 @@ class Gateway(object):
         raise NotImplemented
 
 
+class FileWrapper(object):
+    """The wsgi.file_wrapper: an iterable over a file-like object.
+
+    Iterating reads 'filelike' in blocks of 'blksize' bytes. If 'count' is
+    given, no more than that many bytes (from the current file position) are
+    produced. A WSGIGateway may bypass iteration and send the file directly.
+    """
+
+    def __init__(self, filelike, blksize=65536, count=None):
+        self.filelike = filelike
+        self.blksize = blksize
+        self.count = count
+        if hasattr(filelike, 'close'):
+            self.close = filelike.close
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        size = self.blksize
+        if self.count is not None:
+            if self.count <= 0:
+                raise StopIteration()
+            size = min(size, self.count)
+        data = self.filelike.read(size)
+        if not data:
+            raise StopIteration()
+        if self.count is not None:
+            self.count -= len(data)
+        return data
+    next = __next__
+
+    def fileno(self):
+        """Return the OS file descriptor of the wrapped file (or None)."""
+        try:
+            return self.filelike.fileno()
+        except (AttributeError, IOError, ValueError):
+            return None
+
+
 # These may either be wsgiserver.SSLAdapter subclasses or the string names
 # of such classes (in which case they will be lazily loaded).
 ssl_adapters = {
@@ -1879,6 +2740,14 @@ class WSGIGateway(Gateway):
         """Process the current request."""
         response = self.req.server.wsgi_app(self.env, self.start_response)
         try:
+            # An application iterable which merely relays a FileWrapper
+            # may expose it as its 'file_wrapper' attribute.
+            wrapper = response
+            if not isinstance(wrapper, FileWrapper):
+                wrapper = getattr(response, 'file_wrapper', None)
+            if isinstance(wrapper, FileWrapper) and self.sendfile(wrapper):
+                return
+
             for chunk in response:
                 # "The start_response callable must not actually transmit
                 # the response headers. Instead, it must store them for the
@@ -1890,6 +2759,10 @@ class WSGIGateway(Gateway):
                     if isinstance(chunk, unicodestr):
                         chunk = chunk.encode('ISO-8859-1')
                     self.write(chunk)
+                elif self.req.sent_headers:
+                    # An empty chunk asks for what was written so far to be
+                    # sent (see HTTPServer.coalesce_size).
+                    self.req.flush()
         finally:
             if hasattr(response, "close"):
                 response.close()
@@ -1931,6 +2804,73 @@ class WSGIGateway(Gateway):
 
         return self.write
 
+    def sendfile(self, wrapper):
+        """Send the given FileWrapper with os.sendfile. Return True if sent.
+
+        Only plain sockets qualify (SSL must encrypt in user space), and the
+        response must declare a Content-Length (so no chunked transfer-coding
+        is needed). Otherwise, return False so the caller iterates instead.
+        """
+        req = self.req
+        if (not req.server.use_sendfile or not hasattr(os, 'sendfile')
+            or req.server.ssl_adapter is not None
+            or not self.started_response or self.remaining_bytes_out is None
+            or req.method == b'HEAD'):
+            return False
+
+        fd = wrapper.fileno()
+        if fd is None:
+            return False
+        try:
+            offset = wrapper.filelike.tell()
+        except (AttributeError, IOError, ValueError):
+            return False
+
+        count = self.remaining_bytes_out
+        if wrapper.count is not None:
+            count = min(count, wrapper.count)
+
+        if not req.sent_headers:
+            req.sent_headers = True
+            req.send_headers()
+        req.flush()
+
+        sock = req.conn.socket
+        timeout = sock.gettimeout()
+        sent = 0
+        try:
+            while sent < count:
+                try:
+                    n = os.sendfile(sock.fileno(), fd, offset + sent,
+                                    count - sent)
+                except OSError:
+                    x = sys.exc_info()[1]
+                    if x.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+                        # The socket has a timeout, so it is non-blocking.
+                        r, w, e = select.select([], [sock], [], timeout)
+                        if not w:
+                            raise socket.timeout("timed out")
+                        continue
+                    if sent == 0 and x.args[0] in (errno.EINVAL, errno.ENOSYS):
+                        # This file (or filesystem) can't be sendfile'd.
+                        return False
+                    raise
+                if n == 0:
+                    # The file is shorter than promised.
+                    break
+                sent += n
+        finally:
+            wrapper.filelike.seek(offset + sent)
+            if wrapper.count is not None:
+                wrapper.count -= sent
+            self.remaining_bytes_out -= sent
+
+        if self.remaining_bytes_out:
+            # The client is still waiting for the rest of the declared
+            # Content-Length, which we cannot provide.
+            req.close_connection = True
+        return True
+
     def write(self, chunk):
         """WSGI callable to write unbuffered data to the client.
 
@@ -1989,6 +2929,7 @@ class WSGIGateway_10(WSGIGateway):
             'SERVER_PROTOCOL': req.request_protocol.decode('ISO-8859-1'),
             'SERVER_SOFTWARE': req.server.software,
             'wsgi.errors': sys.stderr,
+            'wsgi.file_wrapper': FileWrapper,
             'wsgi.input': req.rfile,
             'wsgi.multiprocess': False,
             'wsgi.multithread': True,